@@ -0,0 +1,158 @@
+"""
+Batched in-graph data augmentation
+
+Applies the ImageDataGenerator augmentations used by the training scripts
+(rotation_range, width_shift_range, height_shift_range, zoom_range,
+horizontal_flip) to a whole batch at once. The per-image random parameters
+are folded into one affine matrix each, and the batch is warped by a single
+projective-transform op with bilinear sampling and 'nearest' fill, like
+ImageDataGenerator(fill_mode='nearest').
+
+Parameter semantics follow ImageDataGenerator.get_random_transform:
+    rotation_range      angle in degrees, uniform in [-r, r]
+    *_shift_range       fraction of the image size if < 1, else pixels
+    zoom_range          float z -> zx, zy independently in [1 - z, 1 + z],
+                        or an explicit [lower, upper] pair
+    horizontal_flip     flips half of the images
+
+Random draws use stateless ops, so a given seed always produces the same
+augmentations.
+"""
+
+import math
+
+import tensorflow as tf
+
+
+def _zoom_bounds(zoom_range):
+    if isinstance(zoom_range, (int, float)):
+        return 1.0 - zoom_range, 1.0 + zoom_range
+    return float(zoom_range[0]), float(zoom_range[1])
+
+
+def _shift_scale(shift_range, size):
+    """Shift amplitude in pixels for a fractional or absolute range"""
+    return shift_range * size if shift_range < 1 else float(shift_range)
+
+
+def random_transforms(augmentation, batch_size, height, width, seed):
+    """Draw per-image transform parameters for a batch
+
+    Returns a dict of [batch_size] float32 tensors: theta (radians),
+    shift_x / shift_y (pixels), zx, zy and flip (0 or 1).
+    """
+    seeds = tf.random.experimental.stateless_split(seed, num=6)
+
+    def uniform(i, low, high):
+        return tf.random.stateless_uniform([batch_size], seeds[i], low, high)
+
+    zeros = tf.zeros([batch_size])
+    ones = tf.ones([batch_size])
+
+    rotation = augmentation.get('rotation_range', 0)
+    width_shift = augmentation.get('width_shift_range', 0)
+    height_shift = augmentation.get('height_shift_range', 0)
+    zoom_low, zoom_high = _zoom_bounds(augmentation.get('zoom_range', 0.0))
+
+    theta = uniform(0, -rotation, rotation) * (math.pi / 180.0) if rotation else zeros
+    if width_shift:
+        shift_x = uniform(1, -1.0, 1.0) * _shift_scale(width_shift, width)
+    else:
+        shift_x = zeros
+    if height_shift:
+        shift_y = uniform(2, -1.0, 1.0) * _shift_scale(height_shift, height)
+    else:
+        shift_y = zeros
+    if zoom_low == 1 and zoom_high == 1:
+        zx = zy = ones
+    else:
+        zx = uniform(3, zoom_low, zoom_high)
+        zy = uniform(4, zoom_low, zoom_high)
+    if augmentation.get('horizontal_flip'):
+        flip = tf.cast(uniform(5, 0.0, 1.0) < 0.5, tf.float32)
+    else:
+        flip = zeros
+
+    return {'theta': theta, 'shift_x': shift_x, 'shift_y': shift_y,
+            'zx': zx, 'zy': zy, 'flip': flip}
+
+
+def transform_matrices(params, height, width):
+    """Build [batch, 8] projective transforms from transform parameters
+
+    Composes rotation @ shift @ zoom about the image centre in (x, y)
+    coordinates, as ImageDataGenerator.apply_transform does, followed by
+    the horizontal flip. Each matrix maps output to input pixels.
+    """
+    cos = tf.cos(params['theta'])
+    sin = tf.sin(params['theta'])
+    zx, zy = params['zx'], params['zy']
+    shift_x, shift_y = params['shift_x'], params['shift_y']
+
+    a0, a1 = cos * zx, -sin * zy
+    b0, b1 = sin * zx, cos * zy
+    a2 = cos * shift_x - sin * shift_y
+    b2 = sin * shift_x + cos * shift_y
+
+    # Rotate and zoom about the centre like transform_matrix_offset_center
+    o_x = width / 2.0 - 0.5
+    o_y = height / 2.0 - 0.5
+    a2 = a2 + o_x - (a0 * o_x + a1 * o_y)
+    b2 = b2 + o_y - (b0 * o_x + b1 * o_y)
+
+    # Flip applied after the warp: output column x reads column W-1-x
+    flip = params['flip']
+    a2 = a2 + flip * a0 * (width - 1)
+    b2 = b2 + flip * b0 * (width - 1)
+    a0 = a0 * (1.0 - 2.0 * flip)
+    b0 = b0 * (1.0 - 2.0 * flip)
+
+    zeros = tf.zeros_like(a0)
+    return tf.stack([a0, a1, a2, b0, b1, b2, zeros, zeros], axis=1)
+
+
+def augment_batch(images, augmentation, seed):
+    """Augment a [batch, height, width, channels] float batch in one op"""
+    shape = tf.shape(images)
+    height = tf.cast(shape[1], tf.float32)
+    width = tf.cast(shape[2], tf.float32)
+
+    params = random_transforms(augmentation, shape[0], height, width, seed)
+    transforms = transform_matrices(params, height, width)
+
+    return tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=shape[1:3],
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode='NEAREST'
+    )
+
+
+def has_augmentation(augmentation):
+    if not augmentation:
+        return False
+    zoom_low, zoom_high = _zoom_bounds(augmentation.get('zoom_range', 0.0))
+    return bool(
+        augmentation.get('rotation_range') or augmentation.get('width_shift_range')
+        or augmentation.get('height_shift_range') or augmentation.get('horizontal_flip')
+        or zoom_low != 1 or zoom_high != 1
+    )
+
+
+def augment_dataset(ds, augmentation, seed=None):
+    """Augment every batch of an (images, labels) dataset
+
+    Each batch gets its own stateless seed from a seeded random stream, so
+    the augmentations are reproducible for a given seed and still differ
+    from epoch to epoch.
+    """
+    if not has_augmentation(augmentation):
+        return ds
+
+    seeds = tf.data.Dataset.random(seed=seed, rerandomize_each_iteration=True).batch(2)
+    return tf.data.Dataset.zip((ds, seeds)).map(
+        lambda batch, batch_seed: (augment_batch(batch[0], augmentation, batch_seed), batch[1]),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
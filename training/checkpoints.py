@@ -0,0 +1,232 @@
+"""
+Resumable training state
+
+Periodically saves everything needed to continue an interrupted run from
+the same epoch and step:
+
+    <checkpoint_dir>/ckpt-N.npz         all model variables (weights, BatchNorm
+                                        statistics, dropout seed state) and
+                                        optimizer variables (slots, iteration
+                                        count, learning rate)
+    <checkpoint_dir>/state.json         epoch, step within the epoch, batch size,
+                                        history so far, EarlyStopping /
+                                        ReduceLROnPlateau / ModelCheckpoint state
+    <checkpoint_dir>/best_weights.npz   EarlyStopping's best weights
+
+The shuffle and augmentation of the tf.data pipelines are seeded per
+iteration, so on resume the training dataset is fast-forwarded to the saved
+epoch (fast_forward) and the batches already trained in it are skipped.
+
+SIGTERM (pre-emption) and the first Ctrl+C save a checkpoint at the end of
+the current step and raise TrainingPreempted. Multi-worker runs (see
+distributed.py) keep the default handlers, since one worker cannot stop
+alone, and resume from the last periodic checkpoint.
+"""
+
+import os
+import json
+import time
+import signal
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+from tensorflow import keras
+
+STATE_FILE = 'state.json'
+BEST_WEIGHTS_FILE = 'best_weights.npz'
+MAX_TO_KEEP = 2
+
+# Callback attributes carried across a resume
+CALLBACK_STATE = ('wait', 'best', 'best_epoch', 'stopped_epoch', 'cooldown_counter')
+
+
+class TrainingPreempted(Exception):
+    """Training stopped by a signal after saving a checkpoint"""
+
+
+def load_state(checkpoint_dir):
+    """state.json of a checkpoint directory, or None"""
+    state_path = Path(checkpoint_dir) / STATE_FILE
+    if not state_path.exists():
+        return None
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+
+def clear(checkpoint_dir):
+    """Remove a checkpoint directory"""
+    if Path(checkpoint_dir).exists():
+        shutil.rmtree(checkpoint_dir)
+
+
+def fast_forward(dataset, epochs):
+    """Advance a dataset's per-iteration shuffle/augmentation seeds by `epochs`
+
+    Creating an iterator draws the next seeds without reading any data, so
+    the next full pass is the one an uninterrupted run would see.
+    """
+    for _ in range(epochs):
+        iter(dataset)
+
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """Saves the full training state every `every_steps` steps and each epoch
+
+    `callbacks` are the other callbacks of the run; their counters and best
+    values are saved and restored, so this callback must come after them.
+    `meta` is stored in state.json (e.g. the settings that must match on
+    resume). With `write=False` (non-chief workers) the state is tracked but
+    nothing is written.
+    """
+
+    def __init__(self, checkpoint_dir, batch_size, every_steps=None, callbacks=(), meta=None,
+                 write=True, handle_signals=True):
+        super().__init__()
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.batch_size = batch_size
+        self.every_steps = every_steps
+        self.callbacks = list(callbacks)
+        self.meta = meta or {}
+        self.write = write
+        self.handle_signals = handle_signals
+        self.epoch = 0
+        self.step = 0
+        self.history = {}
+        self.callback_state = {}
+        self.best_weights = None
+        self.previous_time = 0.0
+        self.saves = 0
+        self._started = None
+        self._stop_requested = False
+        self._previous_handlers = {}
+
+    def _variables(self):
+        """Everything that changes during training, in a fixed order"""
+        return list(self.model.variables) + list(self.model.optimizer.variables)
+
+    def restore(self, model):
+        """Load the saved state into `model`; returns False if there is none"""
+        state = load_state(self.checkpoint_dir)
+        if state is None:
+            return False
+
+        self.set_model(model)
+        # Optimizer slots must exist before their values can be restored
+        model.optimizer.build(model.trainable_variables)
+        variables = self._variables()
+        with np.load(self.checkpoint_dir / state['checkpoint']) as data:
+            if len(data.files) != len(variables):
+                raise ValueError(f"Checkpoint has {len(data.files)} variables, the model {len(variables)}")
+            for i, variable in enumerate(variables):
+                variable.assign(data[f'arr_{i}'])
+
+        self.saves = int(state['checkpoint'].split('-')[1].split('.')[0])
+        self.epoch = state['epoch']
+        self.step = state['step']
+        self.history = state['history']
+        self.callback_state = state['callbacks']
+        self.previous_time = state['training_time_seconds']
+        best_path = self.checkpoint_dir / BEST_WEIGHTS_FILE
+        if best_path.exists():
+            with np.load(best_path) as data:
+                self.best_weights = [data[f'arr_{i}'] for i in range(len(data.files))]
+        return True
+
+    @property
+    def training_time(self):
+        """Seconds spent training, including the runs before any resume"""
+        return self.previous_time + (time.perf_counter() - self._started if self._started else 0.0)
+
+    def save(self):
+        """Write the variables, then the state that points to them"""
+        if not self.write:
+            return
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.saves += 1
+        name = f"ckpt-{self.saves}.npz"
+        tmp_path = self.checkpoint_dir / f"{name}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, *[np.asarray(v) for v in self._variables()])
+        os.replace(tmp_path, self.checkpoint_dir / name)
+
+        for i, callback in enumerate(self.callbacks):
+            values = {attr: getattr(callback, attr) for attr in CALLBACK_STATE if hasattr(callback, attr)}
+            self.callback_state[f"{i}:{type(callback).__name__}"] = {
+                attr: float(v) if isinstance(v, (float, np.floating)) else int(v)
+                for attr, v in values.items() if v is not None
+            }
+
+        state = {
+            'epoch': self.epoch,
+            'step': self.step,
+            'batch_size': self.batch_size,
+            'training_time_seconds': round(self.training_time, 2),
+            'checkpoint': name,
+            'history': self.history,
+            'callbacks': self.callback_state,
+            **self.meta,
+        }
+        tmp_path = self.checkpoint_dir / f"{STATE_FILE}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_dir / STATE_FILE)
+
+        # Keep the last few in case the newest one is damaged
+        stale = self.checkpoint_dir / f"ckpt-{self.saves - MAX_TO_KEEP}.npz"
+        if stale.exists():
+            stale.unlink()
+
+    def _request_stop(self, signum, frame):
+        print(f"\n⚠ Signal {signum} received - saving a checkpoint after this step "
+              "(repeat to stop immediately)")
+        self._stop_requested = True
+        self._restore_handlers()
+
+    def _restore_handlers(self):
+        for signum, handler in self._previous_handlers.items():
+            signal.signal(signum, handler)
+        self._previous_handlers = {}
+
+    def on_train_begin(self, logs=None):
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        # Other callbacks reset their counters here; put back the saved ones
+        for i, callback in enumerate(self.callbacks):
+            for attr, value in self.callback_state.get(f"{i}:{type(callback).__name__}", {}).items():
+                setattr(callback, attr, value)
+            if self.best_weights is not None and hasattr(callback, 'best_weights'):
+                callback.best_weights = self.best_weights
+
+        if self.handle_signals and threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self._previous_handlers[signum] = signal.signal(signum, self._request_stop)
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.step += 1
+        if self._stop_requested:
+            self.save()
+            raise TrainingPreempted(
+                f"Stopped at epoch {self.epoch + 1}, step {self.step}; state saved in {self.checkpoint_dir}")
+        if self.every_steps and self.step % self.every_steps == 0:
+            self.save()
+
+    def on_epoch_end(self, epoch, logs=None):
+        for key, value in (logs or {}).items():
+            self.history.setdefault(key, []).append(float(value))
+        self.epoch = epoch + 1
+        self.step = 0
+
+        best_weights = next((cb.best_weights for cb in self.callbacks
+                             if getattr(cb, 'best_weights', None) is not None), None)
+        if best_weights is not None and best_weights is not self.best_weights:
+            self.best_weights = best_weights
+            if self.write:
+                self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+                np.savez(self.checkpoint_dir / BEST_WEIGHTS_FILE, *best_weights)
+        self.save()
+
+    def on_train_end(self, logs=None):
+        self._restore_handlers()
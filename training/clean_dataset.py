@@ -1,74 +1,258 @@
 """
 Clean dataset by removing corrupted or invalid image files
+
+Images are checked in parallel over a process pool. Results are kept in a
+manifest of (path, size, mtime, status) so re-runs only check files that are
+new or changed since the last scan.
+
+Usage:
+    python training/clean_dataset.py                # full check, delete corrupted
+    python training/clean_dataset.py --dry-run      # report only, delete nothing
+    python training/clean_dataset.py --quick        # header/end-marker check only
+    python training/clean_dataset.py --dry-run --report clean_report.json
 """
 import os
+import sys
+import json
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
-import shutil
+
+from dataset_manifest import dataset_key
 
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+CACHE_ROOT = PROJECT_ROOT / "data" / ".cache"
+
+# 3: full checks are decided by Image.verify() and load(), not the end markers;
+# results of older versions are checked again
+MANIFEST_VERSION = 3
+
+JPEG_START = b'\xff\xd8\xff'
+JPEG_END = b'\xff\xd9'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_END = b'IEND\xaeB`\x82'
+
+# How far from the end of a file to look for the end marker; some encoders
+# pad JPEGs with a few trailing bytes after EOI
+TAIL_BYTES = 64
+
+
+def manifest_path_for(data_dir):
+    return CACHE_ROOT / f"clean_manifest_{dataset_key(data_dir)}.json"
+
+
+def check_markers(path):
+    """Cheap structural check of JPEG/PNG start and end markers
+
+    Returns an error message, or None if the markers look right (or the
+    format is not one we know the markers of).
+    """
+    with open(path, 'rb') as f:
+        head = f.read(8)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+
+    if size == 0:
+        return "empty file"
+    if head.startswith(JPEG_START):
+        if JPEG_END not in tail:
+            return "truncated JPEG (missing end-of-image marker)"
+    elif head.startswith(PNG_SIGNATURE):
+        if PNG_END not in tail:
+            return "truncated PNG (missing IEND chunk)"
+    elif path.lower().endswith(('.jpg', '.jpeg', '.png')):
+        return "file header does not match its extension"
+    return None
+
 
-print("="*60)
-print("  Cleaning Dataset - Removing Corrupted Images")
-print("="*60)
-print()
-
-corrupted_files = []
-valid_images = 0
-total_files = 0
-
-# Check all images in all class folders
-for class_dir in DATA_DIR.iterdir():
-    if not class_dir.is_dir():
-        continue
-    
-    print(f"Checking class: {class_dir.name}")
-    
-    for img_file in class_dir.iterdir():
-        if not img_file.is_file():
+def check_image(path, quick=False):
+    """Check one image; returns (path, status, error)
+
+    With `quick`, only the start and end markers are checked. Otherwise the
+    image is verified (PNG chunk CRCs, truncation) and fully decoded, and
+    that alone decides: a JPEG with metadata appended after its end marker
+    decodes fine, so a marker problem only annotates a decode error.
+    """
+    try:
+        hint = check_markers(path)
+        if quick:
+            return (path, 'corrupted', hint) if hint else (path, 'ok-quick', None)
+
+        with Image.open(path) as img:
+            img.verify()  # Structure and checksums, which load() does not check
+
+        # verify() leaves the image unusable, so reopen it to decode
+        with Image.open(path) as img:
+            img.load()  # Actually decode the image data
+        return path, 'ok', None
+
+    except Exception as e:
+        error = f"{hint}: {e}" if hint else str(e)
+        return path, 'corrupted', error[:200]
+
+
+def load_manifest(manifest_path):
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(manifest_path, files):
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': files}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def list_files(data_dir):
+    """Yield (relative path, stat) for every file in every class folder"""
+    for class_dir in sorted(Path(data_dir).iterdir()):
+        if not class_dir.is_dir():
             continue
-        
-        total_files += 1
-        
-        try:
-            # Try to open and verify the image
-            with Image.open(img_file) as img:
-                img.verify()  # Verify it's a valid image
-            
-            # If verification passed, try to load it
-            with Image.open(img_file) as img:
-                img.load()  # Actually load the image data
-            
-            valid_images += 1
-            
-        except Exception as e:
-            print(f"  ✗ Corrupted: {img_file.name} - {str(e)[:50]}")
-            corrupted_files.append(img_file)
-
-print()
-print("="*60)
-print("  Scan Complete")
-print("="*60)
-print(f"Total files scanned: {total_files}")
-print(f"Valid images: {valid_images}")
-print(f"Corrupted images: {len(corrupted_files)}")
-print()
-
-if corrupted_files:
-    print("Removing corrupted files...")
-    for file_path in corrupted_files:
+        for entry in os.scandir(class_dir):
+            if entry.is_file():
+                yield f"{class_dir.name}/{entry.name}", entry.stat()
+
+
+def needs_check(entry, stat, quick):
+    """Whether a manifest entry is stale for the current file"""
+    if entry is None:
+        return True
+    if entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+        return True
+    # Quick verdicts, good or bad, do not stand in for a full decode
+    return entry['quick'] and not quick
+
+
+def scan_dataset(data_dir, quick=False, workers=None, rescan=False):
+    """Scan data_dir, checking only new or changed files
+
+    Returns (files, checked) where files is the updated manifest dict keyed by
+    relative path and checked is how many files were actually opened.
+    """
+    data_dir = Path(data_dir)
+    manifest_path = manifest_path_for(data_dir)
+    previous = {} if rescan else load_manifest(manifest_path)
+
+    files = {}
+    to_check = []
+    for rel_path, stat in list_files(data_dir):
+        entry = previous.get(rel_path)
+        if needs_check(entry, stat, quick):
+            entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'status': None, 'error': None}
+            to_check.append(rel_path)
+        files[rel_path] = entry
+
+    print(f"Total files: {len(files)} ({len(to_check)} new or changed)")
+
+    if to_check:
+        mode = "header check" if quick else "full decode"
+        print(f"Checking {len(to_check)} files ({mode}, {workers or os.cpu_count()} workers)...")
+        paths = [str(data_dir / rel_path) for rel_path in to_check]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(check_image, paths, [quick] * len(paths), chunksize=64)
+            for rel_path, (_, status, error) in zip(to_check, results):
+                files[rel_path]['status'] = status
+                files[rel_path]['error'] = error
+                files[rel_path]['quick'] = quick
+                if status == 'corrupted':
+                    print(f"  ✗ Corrupted: {rel_path} - {error[:50]}")
+
+    save_manifest(manifest_path, files)
+    return files, len(to_check)
+
+
+def remove_files(data_dir, rel_paths, files):
+    """Delete corrupted files and drop them from the manifest"""
+    removed = 0
+    for rel_path in rel_paths:
         try:
-            file_path.unlink()
-            print(f"  ✓ Removed: {file_path.name}")
+            (Path(data_dir) / rel_path).unlink()
+            del files[rel_path]
+            removed += 1
+            print(f"  ✓ Removed: {rel_path}")
         except Exception as e:
-            print(f"  ✗ Failed to remove {file_path.name}: {e}")
-    
+            print(f"  ✗ Failed to remove {rel_path}: {e}")
+    save_manifest(manifest_path_for(data_dir), files)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and remove corrupted dataset images")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--quick', action='store_true',
+                        help="Only check JPEG/PNG headers and end markers, skip full decode")
+    parser.add_argument('--dry-run', action='store_true', help="Report corrupted files without deleting")
+    parser.add_argument('--report', default=None, help="Write a JSON report of corrupted files")
+    parser.add_argument('--rescan', action='store_true', help="Ignore the manifest and check every file")
+    args = parser.parse_args()
+
+    data_dir = Path(args.data_dir)
+
+    print("="*60)
+    print("  Cleaning Dataset - Removing Corrupted Images")
+    print("="*60)
+    print()
+
+    if not data_dir.exists():
+        print(f"✗ Data directory not found: {data_dir}")
+        sys.exit(1)
+
+    files, checked = scan_dataset(data_dir, quick=args.quick, workers=args.workers, rescan=args.rescan)
+    corrupted = sorted(p for p, entry in files.items() if entry['status'] == 'corrupted')
+    valid_images = len(files) - len(corrupted)
+
     print()
-    print(f"✓ Cleaned {len(corrupted_files)} corrupted files")
-else:
-    print("✓ No corrupted files found!")
+    print("="*60)
+    print("  Scan Complete")
+    print("="*60)
+    print(f"Total files scanned: {len(files)} ({checked} checked this run)")
+    print(f"Valid images: {valid_images}")
+    print(f"Corrupted images: {len(corrupted)}")
+    print()
+
+    if args.report:
+        report = {
+            'data_dir': str(data_dir),
+            'mode': 'quick' if args.quick else 'full',
+            'total_files': len(files),
+            'checked': checked,
+            'corrupted': [{'path': p, 'error': files[p]['error']} for p in corrupted],
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report saved: {args.report}")
+        print()
+
+    if corrupted and args.dry_run:
+        print(f"⚠ Dry run: {len(corrupted)} corrupted files were not removed")
+        for rel_path in corrupted:
+            print(f"  - {rel_path}")
+    elif corrupted:
+        print("Removing corrupted files...")
+        removed = remove_files(data_dir, corrupted, files)
+        valid_images = len(files) - (len(corrupted) - removed)
+
+        print()
+        print(f"✓ Cleaned {removed} corrupted files")
+    else:
+        print("✓ No corrupted files found!")
+
+    if not args.dry_run:
+        print()
+        print("Dataset is now clean and ready for training!")
+        print(f"Total valid images: {valid_images}")
+
 
-print()
-print("Dataset is now clean and ready for training!")
-print(f"Total valid images: {valid_images}")
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,28 @@
 Convert trained Keras model to TensorFlow Lite format
 
 This script converts the trained .h5 model to .tflite for mobile deployment.
+
+With --int8 it also writes a full-integer model: weights and activations
+are int8, calibrated on images from the training split, and the input and
+output tensors are uint8 (or int8 with --io-type int8). Its accuracy is
+checked against the float model on the validation split, and the
+quantization parameters are recorded in tflite_metadata.json.
+
+tflite_metadata.json also records, under 'sources', which Keras model
+(name and SHA-1) every TFLite file next to it was exported from; qat.py and
+pruning.py add their exports there too, and parity.py checks each export
+against its own source.
+
+Usage:
+    python training/convert_to_tflite.py
+    python training/convert_to_tflite.py --int8 --calibration-samples 300
 """
 
 import tensorflow as tf
 import json
+import time
+import hashlib
+import argparse
 import numpy as np
 from pathlib import Path
 
@@ -15,6 +33,7 @@ MODEL_DIR = PROJECT_ROOT / "model"
 INPUT_MODEL = MODEL_DIR / "isl_model.h5"
 OUTPUT_MODEL = MODEL_DIR / "isl_model.tflite"
 OUTPUT_MODEL_QUANTIZED = MODEL_DIR / "isl_model_quantized.tflite"
+OUTPUT_MODEL_INT8 = MODEL_DIR / "isl_model_int8.tflite"
 
 def check_model_exists():
     """Check if trained model exists"""
@@ -80,7 +99,7 @@ def save_tflite_model(tflite_model, output_path):
     print(f"  Size: {size_mb:.2f} MB")
 
 def test_tflite_model(tflite_path, original_model):
-    """Test the TFLite model with random input"""
+    """Test the TFLite model with random input (parity.py checks real data)"""
     
     print(f"\n🧪 Testing TFLite model...")
     
@@ -123,7 +142,174 @@ def test_tflite_model(tflite_path, original_model):
     else:
         print(f"  ⚠ Models may have significant differences (max diff >= 0.1)")
 
-def create_model_metadata():
+def benchmark_tflite(tflite_model, runs=50, warmup=5, num_threads=1):
+    """Mean single-image inference time (ms) of a TFLite model, given as bytes or a path"""
+    
+    if isinstance(tflite_model, (str, Path)):
+        interpreter = tf.lite.Interpreter(model_path=str(tflite_model), num_threads=num_threads)
+    else:
+        interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    
+    input_details = interpreter.get_input_details()[0]
+    test_input = np.random.random(input_details['shape']).astype(input_details['dtype'])
+    
+    for _ in range(warmup):
+        interpreter.set_tensor(input_details['index'], test_input)
+        interpreter.invoke()
+    
+    start = time.perf_counter()
+    for _ in range(runs):
+        interpreter.set_tensor(input_details['index'], test_input)
+        interpreter.invoke()
+    return 1000 * (time.perf_counter() - start) / runs
+
+def split_dataset(subset, img_size, batch_size=256, limit=None, seed=42, data_dir=None, class_names=None):
+    """Batches of (images, one-hot labels) of a split subset, read from the decode cache
+    
+    data_dir should be the dataset the model was trained on (see
+    test_model.model_data_dir; default: data/ISL). With `class_names` (the
+    model's labels.json order) the labels follow the model's class indices.
+    With `limit`, a random sample of that many images.
+    """
+    from data_pipeline import make_array_dataset
+    from dataset_cache import load_cache
+    from engine import CACHE_SIZE, DATA_DIR, cache_size_for
+    from splits import ensure_split, split_files, split_path_for
+    
+    data_dir = Path(data_dir) if data_dir else DATA_DIR
+    cache_size = cache_size_for({'img_size': tuple(img_size), 'cache_size': CACHE_SIZE})
+    images, labels, paths, class_indices = load_cache(data_dir, cache_size, verbose=False)
+    if class_names:
+        unknown = [name for name in class_indices if name not in class_names]
+        if unknown:
+            raise ValueError(f"Model was not trained on {', '.join(unknown)} from {data_dir}")
+        to_model = np.array([class_names.index(name) for name in sorted(class_indices, key=class_indices.get)])
+        labels, class_indices = to_model[np.asarray(labels)], {name: i for i, name in enumerate(class_names)}
+    subset_paths, _, _ = split_files(ensure_split(split_path_for(data_dir), data_dir), subset)
+    position = {p: i for i, p in enumerate(paths)}
+    indices = [position[p] for p in subset_paths if p in position]
+    if limit and limit < len(indices):
+        indices = sorted(np.random.RandomState(seed).choice(indices, limit, replace=False))
+    return make_array_dataset(images, labels, indices, len(class_indices), batch_size,
+                              img_size=tuple(img_size))
+
+def representative_dataset(img_size, num_samples=200, data_dir=None):
+    """Calibration generator for full-integer quantization: single training images"""
+    def generate():
+        for batch_x, _ in split_dataset('train', img_size, batch_size=1, limit=num_samples, data_dir=data_dir):
+            yield [batch_x]
+    return generate
+
+def convert_to_int8(model, representative_data, io_type=tf.uint8):
+    """Convert Keras model to a full-integer TFLite model"""
+    
+    print(f"\n🔄 Converting to TFLite (full integer, {io_type.name} input/output)...")
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_data
+    
+    # Fail rather than fall back to float kernels for any op
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = io_type
+    converter.inference_output_type = io_type
+    
+    print("  Calibrating activations on the representative dataset...")
+    return converter.convert()
+
+def quantization_params(tflite_model):
+    """Scale, zero point and dtype of the input and output tensors of a TFLite model"""
+    
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    params = {}
+    for name, details in (('input', interpreter.get_input_details()[0]),
+                          ('output', interpreter.get_output_details()[0])):
+        scale, zero_point = details['quantization']
+        params[name] = {
+            'dtype': np.dtype(details['dtype']).name,
+            'scale': float(scale),
+            'zero_point': int(zero_point),
+        }
+    return params
+
+def evaluate_tflite(tflite_model, dataset):
+    """Accuracy of a TFLite model (bytes) over a dataset of (images, one-hot labels) batches
+    
+    Whole batches go through the interpreter (see test_model.tflite_predictor,
+    which also quantizes float inputs for integer models).
+    """
+    from test_model import tflite_predictor
+    
+    predict = tflite_predictor(tf.lite.Interpreter(model_content=tflite_model))
+    correct = total = 0
+    for batch_x, batch_y in dataset:
+        predictions = predict(batch_x.numpy())
+        correct += int(np.sum(np.argmax(predictions, axis=1) == np.argmax(batch_y.numpy(), axis=1)))
+        total += len(predictions)
+    return correct / total if total else 0.0
+
+def quantize_int8(model, output_path=OUTPUT_MODEL_INT8, io_type=tf.uint8, calibration_samples=200,
+                  data_dir=None, class_names=None):
+    """Write a full-integer model and compare it with the float model on the validation split
+    
+    Calibration and validation images come from data_dir, the dataset the
+    model was trained on, labelled in the order of class_names (see
+    split_dataset). Returns the quantization entry for tflite_metadata.json.
+    """
+    output_path = Path(output_path)
+    img_size = tuple(model.input_shape[1:3])
+    tflite_model = convert_to_int8(model, representative_dataset(img_size, calibration_samples, data_dir),
+                                   io_type)
+    save_tflite_model(tflite_model, output_path)
+    
+    print("\n📏 Checking accuracy on the validation split...")
+    validation = split_dataset('validation', img_size, data_dir=data_dir, class_names=class_names)
+    model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+    float_accuracy = model.evaluate(validation, verbose=0, return_dict=True)['accuracy']
+    int8_accuracy = evaluate_tflite(tflite_model, validation)
+    latency = benchmark_tflite(tflite_model)
+    print(f"  Float Keras model: {float_accuracy:.4f}")
+    print(f"  Full-integer TFLite: {int8_accuracy:.4f} ({int8_accuracy - float_accuracy:+.4f})")
+    print(f"  Latency: {latency:.2f} ms")
+    
+    return {
+        'model_file': output_path.name,
+        'type': 'full_integer',
+        'calibration_samples': calibration_samples,
+        **quantization_params(tflite_model),
+        'val_accuracy': round(int8_accuracy, 4),
+        'float_val_accuracy': round(float(float_accuracy), 4),
+        'latency_ms': round(latency, 3),
+    }
+
+def model_fingerprint(model_path):
+    """SHA-1 of a Keras model file, to tell which model a TFLite export came from"""
+    return hashlib.sha1(Path(model_path).read_bytes()).hexdigest()
+
+def read_sources(model_dir):
+    """TFLite file name -> source model entry, from the tflite_metadata.json in model_dir"""
+    metadata_path = Path(model_dir) / 'tflite_metadata.json'
+    if not metadata_path.exists():
+        return {}
+    with open(metadata_path, 'r') as f:
+        return json.load(f).get('sources', {})
+
+def record_sources(model_path, tflite_paths):
+    """Record in tflite_metadata.json next to the TFLite files that they were exported from model_path"""
+    model_path = Path(model_path)
+    fingerprint = model_fingerprint(model_path)
+    for tflite_path in map(Path, tflite_paths):
+        metadata_path = tflite_path.parent / 'tflite_metadata.json'
+        metadata = {}
+        if metadata_path.exists():
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+        metadata.setdefault('sources', {})[tflite_path.name] = {'model': str(model_path), 'sha1': fingerprint}
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+def create_model_metadata(quantization=None):
     """Create metadata file for the TFLite model"""
     
     print("\n📝 Creating model metadata...")
@@ -164,6 +350,16 @@ def create_model_metadata():
         }
     }
     
+    if quantization:
+        # Integer models take q = round(x / scale + zero_point) and return
+        # probabilities as (q - zero_point) * scale
+        metadata["quantization"] = quantization
+    
+    # Exports of other scripts keep their sources
+    sources = read_sources(MODEL_DIR)
+    if sources:
+        metadata["sources"] = sources
+    
     metadata_path = MODEL_DIR / 'tflite_metadata.json'
     with open(metadata_path, 'w') as f:
         json.dump(metadata, f, indent=2)
@@ -171,6 +367,14 @@ def create_model_metadata():
     print(f"✓ Metadata saved: {metadata_path}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert the trained ISL model to TensorFlow Lite")
+    parser.add_argument('--int8', action='store_true',
+                        help="Also write a full-integer model calibrated on the training split")
+    parser.add_argument('--io-type', choices=['uint8', 'int8'], default='uint8',
+                        help="Input/output type of the full-integer model")
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    args = parser.parse_args()
+    
     print("="*60)
     print("  TensorFlow Lite Model Converter")
     print("="*60)
@@ -198,8 +402,23 @@ def main():
     save_tflite_model(tflite_model_quantized, OUTPUT_MODEL_QUANTIZED)
     test_tflite_model(OUTPUT_MODEL_QUANTIZED, model)
     
+    # Convert to TFLite (full integer)
+    quantization = None
+    if args.int8:
+        print("\n" + "="*60)
+        print("Converting full-integer TFLite model (int8 kernels)...")
+        print("="*60)
+        # Calibrated and checked on the dataset the model was trained on
+        from test_model import load_labels, model_data_dir
+        labels = load_labels(MODEL_DIR)
+        quantization = quantize_int8(model, io_type=getattr(tf, args.io_type),
+                                     calibration_samples=args.calibration_samples,
+                                     data_dir=model_data_dir(MODEL_DIR),
+                                     class_names=[labels[str(i)] for i in range(len(labels))] if labels else None)
+    
     # Create metadata
-    create_model_metadata()
+    create_model_metadata(quantization)
+    record_sources(INPUT_MODEL, [OUTPUT_MODEL, OUTPUT_MODEL_QUANTIZED] + ([OUTPUT_MODEL_INT8] if args.int8 else []))
     
     # Compare sizes
     print("\n" + "="*60)
@@ -213,6 +432,9 @@ def main():
     print(f"  Original Keras model: {keras_size:.2f} MB")
     print(f"  TFLite model:         {tflite_size:.2f} MB ({(tflite_size/keras_size)*100:.1f}%)")
     print(f"  TFLite quantized:     {tflite_q_size:.2f} MB ({(tflite_q_size/keras_size)*100:.1f}%)")
+    if args.int8:
+        tflite_int8_size = OUTPUT_MODEL_INT8.stat().st_size / (1024 * 1024)
+        print(f"  TFLite full integer:  {tflite_int8_size:.2f} MB ({(tflite_int8_size/keras_size)*100:.1f}%)")
     print(f"\n  Size reduction: {keras_size - tflite_q_size:.2f} MB saved!")
     
     print("\n" + "="*60)
@@ -222,10 +444,13 @@ def main():
     print(f"  1. {OUTPUT_MODEL.name} - Standard TFLite model")
     print(f"  2. {OUTPUT_MODEL_QUANTIZED.name} - Quantized (smaller, faster)")
     print(f"  3. tflite_metadata.json - Model metadata")
+    if args.int8:
+        print(f"  4. {OUTPUT_MODEL_INT8.name} - Full integer (int8 kernels, {args.io_type} input/output)")
     print("\nNext steps:")
-    print("  1. Copy the .tflite file to your mobile app's assets folder")
-    print("  2. Update your React Native app to use the TFLite model")
-    print("  3. Test the model in the mobile app")
+    print("  1. Check the variants on real data: python training/parity.py")
+    print("  2. Copy the .tflite file to your mobile app's assets folder")
+    print("  3. Update your React Native app to use the TFLite model")
+    print("  4. Test the model in the mobile app")
     print("="*60)
 
 if __name__ == "__main__":
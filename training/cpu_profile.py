@@ -0,0 +1,289 @@
+"""
+CPU performance profile for training
+
+On hosts without a GPU, picks the settings that train fastest on this CPU:
+
+    - XLA compilation of the train step (jit_compile)
+    - bfloat16 mixed precision, tried only if the CPU has native bf16
+      (AVX512_BF16 or AMX)
+    - intra/inter-op thread pool sizes, which oneDNN kernels run on
+    - batch size (half, same or double the configured one); only taken if
+      more than BATCH_SIZE_MIN_GAIN faster, since it changes the
+      optimization (the engine scales the learning rate with it)
+
+Thread pools are fixed once TensorFlow starts, so every candidate is timed
+in a short probe subprocess: the training script is re-run with
+ISL_CPU_PROBE set, builds its model, times a few train steps on synthetic
+batches and exits. The search tunes XLA/precision first, then threads, then
+batch size. The winner is cached in data/.cache/cpu_profile_<key>.json (delete
+it to probe again) and applied to the real run.
+
+Because of the re-runs, profiling is opt-in ('cpu_profile': True, or
+--cpu-profile) and skipped when there is no script to re-run (an
+interactive session or python -c).
+
+Call setup() at the start of a training script, before TensorFlow runs any
+op (in particular before building the input pipeline).
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import platform
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_ROOT = PROJECT_ROOT / "data" / ".cache"
+
+PROBE_ENV = 'ISL_CPU_PROBE'
+PROBE_MARKER = 'CPU_PROBE_RESULT '
+PROBE_TIMEOUT = 600
+PROBE_WARMUP_STEPS = 3
+PROBE_STEPS = 10
+
+# Another batch size must beat the configured one's throughput by this much
+BATCH_SIZE_MIN_GAIN = 0.1
+
+BF16_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+
+def cpu_info():
+    """(model name, set of feature flags) from /proc/cpuinfo, empty elsewhere"""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            text = f.read()
+    except OSError:
+        return platform.processor(), set()
+
+    name, flags = platform.processor(), set()
+    for line in text.splitlines():
+        key, _, value = line.partition(':')
+        key = key.strip()
+        if key == 'model name':
+            name = value.strip()
+        elif key == 'flags':
+            flags = set(value.split())
+    return name, flags
+
+
+def physical_cores():
+    """Number of physical cores (logical CPUs when it cannot be determined)"""
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            cores = set()
+            physical_id = None
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+    return os.cpu_count() or 1
+
+
+def supports_bf16(flags):
+    return any(flag in flags for flag in BF16_FLAGS)
+
+
+def default_profile(batch_size):
+    """Settings used when the profile is off (GPU present or disabled)"""
+    return {'enabled': False, 'batch_size': batch_size}
+
+
+def compile_options(profile):
+    """Extra model.compile() arguments for a profile"""
+    if not profile.get('enabled'):
+        return {}
+    return {'jit_compile': profile['jit_compile']}
+
+
+def apply_settings(settings):
+    """Configure thread pools and precision for this process"""
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(settings['intra_op_threads'])
+        tf.config.threading.set_inter_op_parallelism_threads(settings['inter_op_threads'])
+    except RuntimeError:
+        print("⚠ TensorFlow already started; thread settings not applied "
+              "(call cpu_profile.setup() before loading data)")
+    keras.mixed_precision.set_global_policy(settings['mixed_precision'])
+
+
+def run_probe(build_model, img_size, num_classes, settings):
+    """Time train steps with the given settings and print the result (probe subprocess)"""
+    apply_settings(settings)
+    batch_size = settings['batch_size']
+
+    model = build_model(num_classes)
+    model.compile(optimizer='adam', loss='categorical_crossentropy',
+                  jit_compile=settings['jit_compile'])
+
+    rng = np.random.default_rng(0)
+    x = tf.constant(rng.random((batch_size, *img_size, 3), dtype=np.float32))
+    y = tf.one_hot(rng.integers(0, num_classes, batch_size), num_classes)
+
+    for _ in range(PROBE_WARMUP_STEPS):
+        model.train_on_batch(x, y)
+    start = time.perf_counter()
+    for _ in range(PROBE_STEPS):
+        model.train_on_batch(x, y)
+    step_time = (time.perf_counter() - start) / PROBE_STEPS
+
+    print(PROBE_MARKER + json.dumps({'step_time': step_time}), flush=True)
+    sys.exit(0)
+
+
+def probe(settings):
+    """Re-run the current script as a probe; returns the step time or None"""
+    env = dict(os.environ, **{PROBE_ENV: json.dumps(settings), 'TF_CPP_MIN_LOG_LEVEL': '2'})
+    try:
+        result = subprocess.run([sys.executable, *sys.argv], env=env, capture_output=True,
+                                text=True, timeout=PROBE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return None
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(PROBE_MARKER):
+            return json.loads(line[len(PROBE_MARKER):])['step_time']
+    return None
+
+
+def tune(batch_size, flags):
+    """Coordinate search over precision/XLA, threads and batch size"""
+    physical, logical = physical_cores(), os.cpu_count() or 1
+    best = {
+        'batch_size': batch_size,
+        'intra_op_threads': physical,
+        'inter_op_threads': 2 if physical > 1 else 1,
+        'jit_compile': False,
+        'mixed_precision': 'float32',
+    }
+    measured = {}
+
+    def throughput(settings):
+        key = json.dumps(settings, sort_keys=True)
+        if key not in measured:
+            step_time = probe(settings)
+            measured[key] = (step_time, settings['batch_size'] / step_time if step_time else 0.0)
+            status = f"{step_time * 1000:7.1f} ms/step, {measured[key][1]:7.1f} img/s" if step_time else "failed"
+            print(f"   batch {settings['batch_size']:4d}  threads {settings['intra_op_threads']:3d}/"
+                  f"{settings['inter_op_threads']}  xla {str(settings['jit_compile']):5}  "
+                  f"{settings['mixed_precision']:15} {status}")
+        return measured[key][1]
+
+    precisions = ['float32', 'mixed_bfloat16'] if supports_bf16(flags) else ['float32']
+    stages = [
+        [dict(jit_compile=jit, mixed_precision=p) for p in precisions for jit in (False, True)],
+        [dict(intra_op_threads=intra, inter_op_threads=inter)
+         for intra in sorted({physical, logical}) for inter in (1, 2)],
+    ]
+    for stage in stages:
+        candidates = [{**best, **change} for change in stage]
+        best = max(candidates, key=throughput)
+
+    # The batch size is a training hyperparameter: keep it unless another is clearly faster
+    fastest = max(({**best, 'batch_size': b} for b in (max(batch_size // 2, 1), batch_size * 2)),
+                  key=throughput)
+    if throughput(fastest) > (1 + BATCH_SIZE_MIN_GAIN) * throughput(best):
+        best = fastest
+
+    step_time = measured[json.dumps(best, sort_keys=True)][0]
+    if step_time is None:
+        return None
+    return {**best, 'probe_step_time_ms': round(step_time * 1000, 2)}
+
+
+def setup(build_model, img_size, batch_size, num_classes, enabled=True, tag=None):
+    """Pick and apply the CPU profile for this run
+
+    `build_model(num_classes)` must return the model being trained. In a
+    probe subprocess this times it and exits. Returns the profile dict;
+    read 'batch_size' from it and pass compile_options(profile) to compile().
+    `tag` (e.g. the architecture) is added to the cache key.
+    """
+    img_size = tuple(img_size)
+    if os.environ.get(PROBE_ENV):
+        run_probe(build_model, img_size, num_classes, json.loads(os.environ[PROBE_ENV]))
+
+    if not enabled or not num_classes or tf.config.list_physical_devices('GPU'):
+        return default_profile(batch_size)
+    if not Path(sys.argv[0]).is_file():
+        print("⚠ No training script to re-run for the CPU probes (interactive session?); "
+              "using the default settings")
+        return default_profile(batch_size)
+
+    name, flags = cpu_info()
+    key = hashlib.sha1(json.dumps([
+        Path(sys.argv[0]).name, list(img_size), batch_size, num_classes,
+        name, os.cpu_count(), tf.__version__
+    ] + ([tag] if tag else [])).encode()).hexdigest()[:12]
+    cache_path = CACHE_ROOT / f"cpu_profile_{key}.json"
+
+    if cache_path.exists():
+        with open(cache_path, 'r') as f:
+            profile = json.load(f)
+        print(f"⚙️  Using cached CPU profile: {cache_path.name}")
+    else:
+        print(f"\n⚙️  Probing CPU settings ({name or 'unknown CPU'}, {os.cpu_count()} threads, "
+              f"bf16 {'yes' if supports_bf16(flags) else 'no'})...")
+        profile = tune(batch_size, flags)
+        if profile is None:
+            print("⚠ CPU probes failed, using the default settings")
+            return default_profile(batch_size)
+        profile.update({'enabled': True, 'cpu': name, 'bf16_supported': supports_bf16(flags)})
+        CACHE_ROOT.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(profile, f, indent=2)
+        os.replace(tmp_path, cache_path)
+
+    apply_settings(profile)
+    print(f"✓ CPU profile: batch {profile['batch_size']}, threads {profile['intra_op_threads']}/"
+          f"{profile['inter_op_threads']}, XLA {'on' if profile['jit_compile'] else 'off'}, "
+          f"{profile['mixed_precision']} ({profile['probe_step_time_ms']:.1f} ms/step)")
+    return profile
+
+
+def profile_report(profile, timer=None):
+    """The profile as stored in model_config.json
+
+    `timer` (a throughput.ThroughputMonitor) adds the step time measured in
+    training.
+    """
+    report = dict(profile)
+    if timer is not None:
+        report['measured_step_time_ms'] = timer.step_time_ms
+    return report
+
+
+def float32_model(model):
+    """Float32 copy of a mixed-precision model, for saving and TFLite export"""
+    if keras.mixed_precision.global_policy().name == 'float32':
+        return model
+
+    def strip(config):
+        if isinstance(config, dict):
+            return {k: ('float32' if k == 'dtype' and 'mixed' in json.dumps(v) else strip(v))
+                    for k, v in config.items()}
+        if isinstance(config, list):
+            return [strip(v) for v in config]
+        return config
+
+    policy = keras.mixed_precision.global_policy()
+    keras.mixed_precision.set_global_policy('float32')
+    try:
+        copy = model.__class__.from_config(strip(model.get_config()))
+    finally:
+        keras.mixed_precision.set_global_policy(policy)
+    copy.set_weights(model.get_weights())
+    return copy
@@ -0,0 +1,595 @@
+"""
+tf.data input pipeline for ISL training
+
+Drop-in replacement for ImageDataGenerator.flow_from_directory that decodes,
+resizes and augments images in parallel inside the tf.data runtime instead of
+one at a time in Python. Augmentation is applied to whole batches (see
+augmentation.py). Class indices, file ordering and the validation split follow
+flow_from_directory exactly, so labels.json stays the same.
+
+Benchmark both loaders on the dataset:
+    python training/data_pipeline.py --img-size 128 --batch-size 64
+"""
+
+import os
+import time
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+import numpy as np
+import tensorflow as tf
+
+from augmentation import augment_dataset
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+# Same white list as keras.preprocessing.image.DirectoryIterator
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+
+# flow_from_directory resizes with nearest-neighbour by default
+RESIZE_METHOD = 'nearest'
+
+
+def group_validation_mask(keys, validation_split):
+    """Pick whole groups for validation, in order of first appearance
+
+    Each group is added if that brings the validation count closer to
+    int(validation_split * len(keys)), so no group is split across subsets.
+    """
+    cut = int(validation_split * len(keys))
+    positions = defaultdict(list)
+    for i, key in enumerate(keys):
+        positions[key].append(i)
+
+    mask = np.zeros(len(keys), dtype=bool)
+    count = 0
+    for members in positions.values():
+        if abs(count + len(members) - cut) < abs(count - cut):
+            mask[members] = True
+            count += len(members)
+    return mask
+
+
+def list_image_files(data_dir, validation_split=0.0, subset=None, groups=None):
+    """List image files and labels in flow_from_directory order
+
+    Classes are the sorted sub-directory names. Inside each class, files are
+    sorted and the first `validation_split` fraction is the validation subset,
+    exactly like DirectoryIterator. If `groups` maps relative paths to a
+    near-duplicate cluster id (see dedup_index.py), whole clusters are kept
+    in one subset instead.
+    """
+    data_dir = Path(data_dir)
+    class_names = sorted(d.name for d in data_dir.iterdir() if d.is_dir())
+    class_indices = {name: i for i, name in enumerate(class_names)}
+
+    if subset not in ('training', 'validation', None):
+        raise ValueError(f"Invalid subset: {subset!r} (expected 'training' or 'validation')")
+
+    paths = []
+    labels = []
+    for class_name in class_names:
+        class_files = []
+        for root, _, files in sorted(os.walk(data_dir / class_name), key=lambda x: x[0]):
+            for fname in sorted(files):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    class_files.append(os.path.join(root, fname))
+
+        if subset is None:
+            selected = class_files
+        elif groups:
+            keys = [groups.get(os.path.relpath(f, data_dir).replace(os.sep, '/'), f) for f in class_files]
+            is_validation = group_validation_mask(keys, validation_split)
+            selected = [f for f, v in zip(class_files, is_validation) if v == (subset == 'validation')]
+        else:
+            cut = int(validation_split * len(class_files))
+            selected = class_files[:cut] if subset == 'validation' else class_files[cut:]
+
+        paths.extend(selected)
+        labels.extend([class_indices[class_name]] * len(selected))
+
+    return paths, labels, class_indices
+
+
+def decode_image(path, img_size):
+    """Read, decode and resize one image to float32 in [0, 1]"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size, method=RESIZE_METHOD)
+    image.set_shape((*img_size, 3))
+    return tf.cast(image, tf.float32) / 255.0
+
+
+def make_dataset(paths, labels, num_classes, img_size, batch_size,
+                 shuffle=False, augmentation=None, cache=False, seed=None):
+    """Build a batched, prefetched dataset of (image, one-hot label) pairs"""
+    img_size = tuple(img_size)
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), list(labels)))
+
+    # Without a cache, shuffle file names so only the decoded batch is in memory
+    if shuffle and not cache:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    ds = ds.map(
+        lambda path, label: (decode_image(path, img_size), tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE
+    )
+
+    if cache:
+        ds = ds.cache(cache if isinstance(cache, str) else '')
+        if shuffle:
+            ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    ds = augment_dataset(ds.batch(batch_size), augmentation, seed)
+    return ds.prefetch(AUTOTUNE)
+
+
+def make_array_dataset(images, labels, indices, num_classes, batch_size,
+                       shuffle=False, augmentation=None, seed=None, img_size=None,
+                       soft_targets=None):
+    """Build a batched dataset over a pre-decoded uint8 image array
+
+    `images` can be a memory-mapped array (see dataset_cache.py); batches are
+    gathered straight from it, so nothing is decoded during training. If
+    `img_size` differs from the stored size, whole batches are resized.
+    With `soft_targets` (one row per image, e.g. teacher logits) the targets
+    are [one-hot label, soft target row].
+    """
+    img_shape = tuple(images.shape[1:])
+    resize = img_size is not None and tuple(img_size) != img_shape[:2]
+    labels = np.asarray(labels)
+    types = (tf.uint8, tf.int32)
+    if soft_targets is not None:
+        soft_targets = np.asarray(soft_targets, dtype=np.float32)
+        types += (tf.float32,)
+
+    def gather(batch_indices):
+        batch = (images[batch_indices], labels[batch_indices].astype(np.int32))
+        if soft_targets is not None:
+            batch += (soft_targets[batch_indices],)
+        return batch
+
+    def load_batch(batch_indices):
+        batch_x, batch_y, *soft = tf.numpy_function(gather, [batch_indices], types)
+        batch_x.set_shape((None, *img_shape))
+        batch_y.set_shape((None,))
+        if resize:
+            batch_x = tf.image.resize(batch_x, img_size, method=RESIZE_METHOD)
+        batch_y = tf.one_hot(batch_y, num_classes)
+        if soft:
+            soft[0].set_shape((None, soft_targets.shape[1]))
+            batch_y = tf.concat([batch_y, soft[0]], axis=1)
+        return tf.cast(batch_x, tf.float32) / 255.0, batch_y
+
+    ds = tf.data.Dataset.from_tensor_slices(np.asarray(indices, dtype=np.int64))
+    if shuffle:
+        ds = ds.shuffle(len(indices), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(load_batch, num_parallel_calls=AUTOTUNE)
+
+    ds = augment_dataset(ds, augmentation, seed)
+    return ds.prefetch(AUTOTUNE)
+
+
+def split_indices(labels, validation_split, subset, paths=None, groups=None):
+    """Per-class flow_from_directory split over an ordered labels array
+
+    With `groups` (relative path -> cluster id) and the matching `paths`,
+    near-duplicate clusters are kept in one subset as in list_image_files.
+    """
+    labels = np.asarray(labels)
+    selected = []
+    for label in np.unique(labels):
+        class_idx = np.flatnonzero(labels == label)
+        if groups:
+            keys = [groups.get(paths[i], paths[i]) for i in class_idx]
+            is_validation = group_validation_mask(keys, validation_split)
+            selected.append(class_idx[is_validation if subset == 'validation' else ~is_validation])
+            continue
+        cut = int(validation_split * len(class_idx))
+        selected.append(class_idx[:cut] if subset == 'validation' else class_idx[cut:])
+    return np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+
+
+def shard_items(items, shard):
+    """This worker's share of a list for shard = (num_shards, index)
+
+    Takes every num_shards-th item and trims all shards to the same length,
+    so every worker runs the same number of steps per epoch.
+    """
+    if not shard:
+        return items
+    num_shards, index = shard
+    return items[index::num_shards][:len(items) // num_shards]
+
+
+def align_soft_targets(soft_targets, paths):
+    """Rows of soft_targets = (paths, values) in the order of `paths`"""
+    if soft_targets is None:
+        return None
+    soft_paths, values = soft_targets
+    position = {p: i for i, p in enumerate(soft_paths)}
+    missing = [p for p in paths if p not in position]
+    if missing:
+        raise ValueError(f"No soft targets for {len(missing)} images, e.g. {missing[0]}")
+    return np.asarray(values)[[position[p] for p in paths]]
+
+
+def create_cached_datasets(data_dir, img_size, batch_size, validation_split=0.2,
+                           augmentation=None, seed=None, groups=None, cache_size=None, shard=None,
+                           soft_targets=None):
+    """Like create_datasets, but reads from the memory-mapped decode cache
+
+    The cache for img_size (or `cache_size`, resized to img_size per batch)
+    is built or refreshed first if needed. `soft_targets` = (paths, values)
+    are appended to the one-hot labels (see make_array_dataset).
+    """
+    from dataset_cache import load_cache
+
+    images, labels, paths, class_indices = load_cache(data_dir, cache_size or img_size)
+    num_classes = len(class_indices)
+    train_idx = shard_items(split_indices(labels, validation_split, 'training', paths, groups), shard)
+    val_idx = split_indices(labels, validation_split, 'validation', paths, groups)
+    soft_targets = align_soft_targets(soft_targets, paths)
+
+    train_ds = make_array_dataset(images, labels, train_idx, num_classes, batch_size,
+                                  shuffle=True, augmentation=augmentation, seed=seed,
+                                  img_size=img_size, soft_targets=soft_targets)
+    val_ds = make_array_dataset(images, labels, val_idx, num_classes, batch_size,
+                                img_size=img_size, soft_targets=soft_targets)
+
+    info = {
+        'class_indices': class_indices,
+        'num_classes': num_classes,
+        'train_samples': len(train_idx),
+        'val_samples': len(val_idx),
+        'steps_per_epoch': -(-len(train_idx) // batch_size),
+    }
+    return train_ds, val_ds, info
+
+
+TFRECORD_FEATURES = {
+    'image': tf.io.FixedLenFeature([], tf.string),
+    'label': tf.io.FixedLenFeature([], tf.int64),
+    'path': tf.io.FixedLenFeature([], tf.string),
+}
+
+
+def make_tfrecord_dataset(file_pattern, img_size, num_classes, batch_size,
+                          shuffle=False, augmentation=None, seed=None,
+                          compression='GZIP', shuffle_buffer=4096, shard=None):
+    """Stream batches from TFRecord shards written by export_tfrecords.py
+
+    Shards are read with parallel interleave and records are parsed a whole
+    batch at a time. With `shard` = (num_workers, index) this worker reads
+    every num_workers-th file.
+    """
+    img_size = tuple(img_size)
+
+    def parse_batch(serialized):
+        parsed = tf.io.parse_example(serialized, TFRECORD_FEATURES)
+        batch_x = tf.reshape(tf.io.decode_raw(parsed['image'], tf.uint8), (-1, *img_size, 3))
+        batch_y = tf.one_hot(tf.cast(parsed['label'], tf.int32), num_classes)
+        return tf.cast(batch_x, tf.float32) / 255.0, batch_y
+
+    files = tf.data.Dataset.list_files(str(file_pattern), shuffle=shuffle, seed=seed)
+    if shard:
+        num_files = len(tf.io.gfile.glob(str(file_pattern)))
+        if num_files < shard[0]:
+            raise ValueError(f"{num_files} TFRecord shards cannot feed {shard[0]} workers; "
+                             f"export with --shards {shard[0]} or more")
+        files = files.shard(*shard)
+    ds = files.interleave(
+        lambda f: tf.data.TFRecordDataset(f, compression_type=compression),
+        cycle_length=AUTOTUNE,
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not shuffle
+    )
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size).map(parse_batch, num_parallel_calls=AUTOTUNE)
+
+    ds = augment_dataset(ds, augmentation, seed)
+    return ds.prefetch(AUTOTUNE)
+
+
+def create_tfrecord_datasets(record_dir, batch_size, augmentation=None, seed=None,
+                             split_file=None, shard=None):
+    """Like create_datasets, but streams the shards in record_dir
+
+    If `split_file` is given, the export must have been written from it.
+    """
+    import json
+
+    record_dir = Path(record_dir)
+    info_path = record_dir / 'dataset_info.json'
+    if not info_path.exists():
+        raise FileNotFoundError(
+            f"No TFRecord export found in {record_dir}; run export_tfrecords.py first")
+    with open(info_path, 'r') as f:
+        export_info = json.load(f)
+
+    exported_split = export_info.get('split_file')
+    if split_file and (not exported_split or Path(exported_split).resolve() != Path(split_file).resolve()):
+        raise ValueError(
+            f"TFRecords in {record_dir} were not exported from {split_file}; "
+            f"re-run export_tfrecords.py --split-file {split_file}")
+
+    class_indices = export_info['class_indices']
+    num_classes = len(class_indices)
+    img_size = tuple(export_info['img_size'])
+    compression = export_info['compression']
+
+    train_ds = make_tfrecord_dataset(record_dir / 'train-*.tfrecord.gz', img_size, num_classes,
+                                     batch_size, shuffle=True, augmentation=augmentation,
+                                     seed=seed, compression=compression, shard=shard)
+    val_ds = make_tfrecord_dataset(record_dir / 'validation-*.tfrecord.gz', img_size, num_classes,
+                                   batch_size, compression=compression)
+
+    # Per worker when sharded (files hold about the same number of records)
+    train_samples = export_info['samples']['train'] // (shard[0] if shard else 1)
+    info = {
+        'class_indices': class_indices,
+        'num_classes': num_classes,
+        'train_samples': train_samples,
+        'val_samples': export_info['samples']['validation'],
+        'steps_per_epoch': -(-train_samples // batch_size),
+    }
+    if 'test' in export_info['samples']:
+        info['test_samples'] = export_info['samples']['test']
+    return train_ds, val_ds, info
+
+
+def create_split_datasets(pipeline, data_dir, img_size, batch_size, split, fold=None,
+                          augmentation=None, cache=False, seed=None, cache_size=None, shard=None,
+                          soft_targets=None):
+    """Like create_datasets, but takes the subsets from a persistent split
+
+    `split` is a split dict from splits.py; with `fold`, validation is that
+    cross-validation fold. Files are listed once, from the split itself.
+    `soft_targets` need the 'cache' pipeline.
+    """
+    from splits import split_files
+
+    data_dir = Path(data_dir)
+    train_paths, train_labels, class_indices = split_files(split, 'train', fold)
+    val_paths, val_labels, _ = split_files(split, 'validation', fold)
+    train_paths, train_labels = shard_items(train_paths, shard), shard_items(train_labels, shard)
+    num_classes = len(class_indices)
+
+    if pipeline == 'tfdata':
+        train_ds = make_dataset([str(data_dir / p) for p in train_paths], train_labels, num_classes,
+                                img_size, batch_size, shuffle=True, augmentation=augmentation,
+                                cache=cache, seed=seed)
+        val_ds = make_dataset([str(data_dir / p) for p in val_paths], val_labels, num_classes,
+                              img_size, batch_size, cache=cache)
+        train_samples, val_samples = len(train_paths), len(val_paths)
+    elif pipeline == 'cache':
+        from dataset_cache import load_cache
+        images, labels, paths, _ = load_cache(data_dir, cache_size or img_size)
+        position = {p: i for i, p in enumerate(paths)}
+        # Unreadable images are missing from the cache, skip them here too
+        train_idx = [position[p] for p in train_paths if p in position]
+        val_idx = [position[p] for p in val_paths if p in position]
+        soft_targets = align_soft_targets(soft_targets, paths)
+        train_ds = make_array_dataset(images, labels, train_idx, num_classes, batch_size,
+                                      shuffle=True, augmentation=augmentation, seed=seed,
+                                      img_size=img_size, soft_targets=soft_targets)
+        val_ds = make_array_dataset(images, labels, val_idx, num_classes, batch_size,
+                                    img_size=img_size, soft_targets=soft_targets)
+        train_samples, val_samples = len(train_idx), len(val_idx)
+    else:
+        raise ValueError(f"Pipeline {pipeline!r} cannot read a split file directly")
+
+    info = {
+        'class_indices': class_indices,
+        'num_classes': num_classes,
+        'train_samples': train_samples,
+        'val_samples': val_samples,
+        'test_samples': len(split_files(split, 'test')[0]),
+        'steps_per_epoch': -(-train_samples // batch_size),
+    }
+    return train_ds, val_ds, info
+
+
+def create_split_generators(split, data_dir, train_datagen, val_datagen, img_size, batch_size,
+                            fold=None):
+    """ImageDataGenerator flows over the subsets of a persistent split
+
+    Used by DATA_PIPELINE = 'generator' in place of two flow_from_directory
+    scans with subset='training'/'validation'.
+    """
+    import pandas as pd
+    from splits import split_files
+
+    flows = []
+    for subset, datagen, shuffle in (('train', train_datagen, True), ('validation', val_datagen, False)):
+        paths, _, _ = split_files(split, subset, fold)
+        frame = pd.DataFrame({'filename': paths, 'class': [p.split('/', 1)[0] for p in paths]})
+        flows.append(datagen.flow_from_dataframe(
+            frame,
+            directory=str(data_dir),
+            x_col='filename',
+            y_col='class',
+            classes=split['class_names'],
+            target_size=tuple(img_size),
+            batch_size=batch_size,
+            class_mode='categorical',
+            shuffle=shuffle
+        ))
+    return flows[0], flows[1]
+
+
+def create_datasets(data_dir, img_size, batch_size, validation_split=0.2,
+                    augmentation=None, cache=False, seed=None, groups=None, shard=None):
+    """Create training and validation datasets for model.fit
+
+    Returns (train_ds, val_ds, info) where info holds class_indices, sample
+    counts and steps per epoch, mirroring what the generators exposed.
+    With `shard` = (num_workers, index) the training set is this worker's
+    share (see shard_items).
+    """
+    train_paths, train_labels, class_indices = list_image_files(
+        data_dir, validation_split, subset='training', groups=groups)
+    train_paths, train_labels = shard_items(train_paths, shard), shard_items(train_labels, shard)
+    val_paths, val_labels, _ = list_image_files(
+        data_dir, validation_split, subset='validation', groups=groups)
+    num_classes = len(class_indices)
+
+    train_ds = make_dataset(train_paths, train_labels, num_classes, img_size, batch_size,
+                            shuffle=True, augmentation=augmentation, cache=cache, seed=seed)
+    val_ds = make_dataset(val_paths, val_labels, num_classes, img_size, batch_size,
+                          shuffle=False, cache=cache)
+
+    info = {
+        'class_indices': class_indices,
+        'num_classes': num_classes,
+        'train_samples': len(train_paths),
+        'val_samples': len(val_paths),
+        'steps_per_epoch': -(-len(train_paths) // batch_size),
+    }
+    return train_ds, val_ds, info
+
+
+def create_pipeline(pipeline, data_dir, img_size, batch_size, validation_split=0.2,
+                    augmentation=None, cache=False, seed=None, clusters_file=None,
+                    split_file=None, test_split=0.1, fold=None, cache_size=None, shard=None,
+                    soft_targets=None):
+    """Create (train_ds, val_ds, info) for the DATA_PIPELINE named in Config
+
+    'tfdata' decodes image files, 'cache' reads the memory-mapped decode
+    cache and 'tfrecord' streams the shards from export_tfrecords.py. With
+    `cache_size`, 'cache' reads the cache decoded at that size and resizes
+    batches to img_size, so runs at several sizes share one cache.
+
+    `shard` = (num_workers, worker index) gives each worker of a
+    distributed run a disjoint, equal share of the training set; sample
+    counts and steps in info are then per worker.
+    `clusters_file` (from dedup_index.py) pins near-duplicate clusters to a
+    single subset; TFRecord exports take it at export time instead.
+
+    With `split_file` (see splits.py) subsets come from that persistent
+    split, which is created on first use with validation_split, test_split
+    and clusters_file. `fold` selects a cross-validation fold.
+
+    `soft_targets` = (paths, values), e.g. teacher logits for distillation,
+    are appended to the one-hot labels; only 'cache' supports them.
+    """
+    if soft_targets is not None and pipeline != 'cache':
+        raise ValueError(f"Soft targets need the 'cache' pipeline, not {pipeline!r}")
+    if split_file and pipeline == 'tfrecord':
+        from export_tfrecords import tfrecord_dir_for
+        if fold is not None:
+            raise ValueError("TFRecord exports hold one fixed split; use 'tfdata' or 'cache' for folds")
+        return create_tfrecord_datasets(tfrecord_dir_for(data_dir, img_size), batch_size,
+                                        augmentation=augmentation, seed=seed, split_file=split_file,
+                                        shard=shard)
+    if split_file:
+        from splits import ensure_split
+        # A new split is shuffled with the run's seed (the splits.py default without one)
+        params = {} if seed is None else {'seed': seed}
+        split = ensure_split(split_file, data_dir, validation_split=validation_split,
+                             test_split=test_split, clusters_file=clusters_file, **params)
+        return create_split_datasets(pipeline, data_dir, img_size, batch_size, split, fold=fold,
+                                     augmentation=augmentation, cache=cache, seed=seed,
+                                     cache_size=cache_size, shard=shard, soft_targets=soft_targets)
+
+    groups = None
+    if clusters_file:
+        from dedup_index import load_cluster_groups
+        groups = load_cluster_groups(clusters_file)
+
+    if pipeline == 'tfdata':
+        return create_datasets(data_dir, img_size, batch_size, validation_split,
+                               augmentation=augmentation, cache=cache, seed=seed, groups=groups,
+                               shard=shard)
+    if pipeline == 'cache':
+        return create_cached_datasets(data_dir, img_size, batch_size, validation_split,
+                                      augmentation=augmentation, seed=seed, groups=groups,
+                                      cache_size=cache_size, shard=shard, soft_targets=soft_targets)
+    if pipeline == 'tfrecord':
+        from export_tfrecords import tfrecord_dir_for
+        return create_tfrecord_datasets(tfrecord_dir_for(data_dir, img_size), batch_size,
+                                        augmentation=augmentation, seed=seed, shard=shard)
+    raise ValueError(f"Unknown data pipeline: {pipeline!r}")
+
+
+def measure_throughput(batches, num_batches=50, warmup=2):
+    """Iterate over a loader and return images/sec
+
+    Works with tf.data datasets and Keras generators alike; the first
+    `warmup` batches are excluded so thread start-up is not counted.
+    """
+    iterator = iter(batches)
+    for _ in range(warmup):
+        next(iterator)
+
+    images = 0
+    start = time.perf_counter()
+    for _ in range(num_batches):
+        batch_x, _ = next(iterator)
+        images += int(batch_x.shape[0])
+    elapsed = time.perf_counter() - start
+
+    return images / elapsed if elapsed > 0 else 0.0
+
+
+def benchmark_pipelines(data_dir, img_size, batch_size, augmentation=None, num_batches=50):
+    """Compare ImageDataGenerator and tf.data throughput on the same data"""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    print(f"\n⏱  Benchmarking input pipelines ({num_batches} batches of {batch_size})...")
+
+    datagen = ImageDataGenerator(rescale=1./255, fill_mode='nearest', **(augmentation or {}))
+    generator = datagen.flow_from_directory(
+        data_dir,
+        target_size=tuple(img_size),
+        batch_size=batch_size,
+        class_mode='categorical',
+        shuffle=True
+    )
+    generator_ips = measure_throughput(generator, num_batches)
+
+    paths, labels, class_indices = list_image_files(data_dir)
+    dataset = make_dataset(paths, labels, len(class_indices), img_size, batch_size,
+                           shuffle=True, augmentation=augmentation).repeat()
+    tfdata_ips = measure_throughput(dataset, num_batches)
+
+    results = {'generator': generator_ips, 'tfdata': tfdata_ips}
+
+    from dataset_cache import load_cache
+    images, cached_labels, _, _ = load_cache(data_dir, img_size)
+    cached = make_array_dataset(images, cached_labels, np.arange(len(cached_labels)),
+                                len(class_indices), batch_size, shuffle=True,
+                                augmentation=augmentation).repeat()
+    results['cache'] = measure_throughput(cached, num_batches)
+
+    print(f"  ImageDataGenerator: {generator_ips:8.1f} images/sec")
+    for name, label in (('tfdata', 'tf.data:           '), ('cache', 'tf.data + cache:   ')):
+        print(f"  {label} {results[name]:8.1f} images/sec ({results[name] / max(generator_ips, 1e-9):.1f}x)")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ISL input pipelines")
+    parser.add_argument('--data-dir', default=str(Path(__file__).parent.parent / "data" / "ISL"))
+    parser.add_argument('--img-size', type=int, default=128)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--batches', type=int, default=50)
+    parser.add_argument('--no-augment', action='store_true', help="Benchmark decode/resize only")
+    args = parser.parse_args()
+
+    augmentation = None if args.no_augment else {
+        'rotation_range': 20,
+        'width_shift_range': 0.2,
+        'height_shift_range': 0.2,
+        'zoom_range': 0.2,
+        'horizontal_flip': True,
+    }
+    benchmark_pipelines(args.data_dir, (args.img_size, args.img_size), args.batch_size,
+                        augmentation=augmentation, num_batches=args.batches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Pre-decoded, memory-mapped dataset cache
+
+Decodes and resizes every image once into uint8 NumPy shards (one per class)
+stored under data/.cache/<dataset key>/<H>x<W>/ (see
+dataset_manifest.dataset_key), plus a labels array. Training and
+evaluation memory-map the shards, so they start without any JPEG decode cost.
+
+Each class shard carries a fingerprint of its folder (file names, sizes and
+modification times). Adding, removing or modifying a file in a class folder
+rebuilds only that class's shard on the next run.
+
+Usage:
+    python training/dataset_cache.py
+    python training/dataset_cache.py --img-size 128 --data-dir data/indian-sign-language-isl
+"""
+
+import os
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from dataset_manifest import dataset_key, same_dataset
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+CACHE_ROOT = PROJECT_ROOT / "data" / ".cache"
+
+CACHE_VERSION = 1
+
+# Size every training preset reads (engine.CACHE_SIZE); batches are resized
+# to the preset's own size
+CACHE_SIZE = (128, 128)
+INDEX_FILE = 'index.json'
+LABELS_FILE = 'labels.npy'
+
+# Same white list and interpolation as flow_from_directory
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+RESAMPLE = Image.NEAREST
+
+
+class CachedImages:
+    """Read-only view over the per-class memory-mapped shards
+
+    Behaves like one (N, H, W, 3) uint8 array for integer and index-array
+    lookups, without concatenating (and therefore copying) the shards.
+    """
+
+    def __init__(self, shards, img_size):
+        self.shards = shards
+        self.img_size = tuple(img_size)
+        self.offsets = np.cumsum([0] + [len(s) for s in shards])
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def shape(self):
+        return (len(self), *self.img_size, 3)
+
+    def __getitem__(self, index):
+        if np.isscalar(index):
+            index = int(index)
+            shard = int(np.searchsorted(self.offsets, index, side='right')) - 1
+            return self.shards[shard][index - self.offsets[shard]]
+
+        index = np.asarray(index, dtype=np.int64)
+        out = np.empty((len(index), *self.img_size, 3), dtype=np.uint8)
+        shard_ids = np.searchsorted(self.offsets, index, side='right') - 1
+        for shard in np.unique(shard_ids):
+            mask = shard_ids == shard
+            out[mask] = self.shards[shard][index[mask] - self.offsets[shard]]
+        return out
+
+
+def cache_dir_for(data_dir, img_size):
+    """Cache directory for a dataset at a given target size"""
+    return CACHE_ROOT / dataset_key(data_dir) / f"{img_size[0]}x{img_size[1]}"
+
+
+def scan_class(data_dir, class_name):
+    """List a class folder and fingerprint it
+
+    Returns (relative paths, fingerprint). The fingerprint changes whenever a
+    file is added, removed, resized or touched.
+    """
+    data_dir = Path(data_dir)
+    files = []
+    digest = hashlib.sha1()
+    for root, _, names in sorted(os.walk(data_dir / class_name), key=lambda x: x[0]):
+        for fname in sorted(names):
+            if not fname.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, fname)
+            stat = os.stat(path)
+            rel_path = os.path.relpath(path, data_dir).replace(os.sep, '/')
+            files.append(rel_path)
+            digest.update(f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return files, digest.hexdigest()
+
+
+def resize_array(img, img_size):
+    """Resize a decoded RGB PIL image to a uint8 (H, W, 3) array"""
+    # PIL takes (width, height); IMG_SIZE is (height, width)
+    return np.asarray(img.resize((img_size[1], img_size[0]), RESAMPLE), dtype=np.uint8)
+
+
+def decode_resize(path, img_size):
+    """Decode one image to a uint8 (H, W, 3) array, or None if unreadable"""
+    try:
+        with Image.open(path) as img:
+            return resize_array(img.convert('RGB'), img_size)
+    except Exception as e:
+        print(f"  ✗ Skipping unreadable image {path}: {str(e)[:50]}")
+        return None
+
+
+def build_class_shard(data_dir, files, img_size, shard_path, workers):
+    """Decode a class's files into a .npy shard; returns the files kept"""
+    tmp_path = shard_path.with_name(shard_path.name + '.tmp')
+    decoded = np.empty((len(files), *img_size, 3), dtype=np.uint8)
+    kept = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        arrays = pool.map(lambda rel: decode_resize(Path(data_dir) / rel, img_size), files)
+        for rel_path, array in zip(files, arrays):
+            if array is None:
+                continue
+            decoded[len(kept)] = array
+            kept.append(rel_path)
+
+    with open(tmp_path, 'wb') as f:
+        np.save(f, decoded[:len(kept)])
+    os.replace(tmp_path, shard_path)
+    return kept
+
+
+def load_index(cache_dir):
+    """Load a cache index, or None if missing or from another cache version"""
+    index_path = cache_dir / INDEX_FILE
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get('version') != CACHE_VERSION:
+        return None
+    return index
+
+
+def write_index(cache_dir, index):
+    """Write the labels array and index.json for a cache; returns the labels"""
+    class_names = index['class_names']
+    labels = np.concatenate([
+        np.full(index['classes'][name]['count'], i, dtype=np.int32)
+        for i, name in enumerate(class_names)
+    ]) if class_names else np.zeros(0, dtype=np.int32)
+    np.save(cache_dir / LABELS_FILE, labels)
+
+    with open(cache_dir / INDEX_FILE, 'w') as f:
+        json.dump(index, f)
+    return labels
+
+
+def build_cache(data_dir=DATA_DIR, img_size=(64, 64), workers=None, verbose=True):
+    """Create or refresh the cache for data_dir at img_size
+
+    Only classes whose folder fingerprint changed are decoded again.
+    Returns the cache directory.
+    """
+    data_dir = Path(data_dir)
+    img_size = tuple(img_size)
+    cache_dir = cache_dir_for(data_dir, img_size)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    old_index = load_index(cache_dir) or {}
+    if old_index and not same_dataset(old_index['data_dir'], data_dir):
+        # Never overwrite or delete the shards of another dataset
+        raise ValueError(f"Cache {cache_dir} belongs to {old_index['data_dir']}, not {data_dir}")
+    old_classes = old_index.get('classes', {})
+
+    class_names = sorted(d.name for d in data_dir.iterdir() if d.is_dir())
+    classes = {}
+    rebuilt = 0
+
+    for class_name in class_names:
+        files, fingerprint = scan_class(data_dir, class_name)
+        shard_file = f"{class_name}.npy"
+        previous = old_classes.get(class_name)
+
+        if previous and previous['fingerprint'] == fingerprint and (cache_dir / shard_file).exists():
+            classes[class_name] = previous
+            continue
+
+        if verbose:
+            print(f"  Decoding class {class_name} ({len(files)} images)...")
+        kept = build_class_shard(data_dir, files, img_size, cache_dir / shard_file, workers)
+        classes[class_name] = {
+            'fingerprint': fingerprint,
+            'file': shard_file,
+            'count': len(kept),
+            'files': kept,
+        }
+        rebuilt += 1
+
+    # Drop shards of classes that no longer exist
+    for class_name, entry in old_classes.items():
+        if class_name not in classes:
+            (cache_dir / entry['file']).unlink(missing_ok=True)
+
+    index = {
+        'version': CACHE_VERSION,
+        'data_dir': str(data_dir),
+        'img_size': list(img_size),
+        'class_names': class_names,
+        'classes': classes,
+    }
+    # An unchanged cache is left alone; other processes may be reading it
+    if index != old_index or not (cache_dir / LABELS_FILE).exists():
+        write_index(cache_dir, index)
+
+    if verbose:
+        status = f"rebuilt {rebuilt} of {len(class_names)} classes" if rebuilt else "up to date"
+        num_images = sum(entry['count'] for entry in classes.values())
+        print(f"✓ Cache {status}: {cache_dir} ({num_images} images)")
+
+    return cache_dir
+
+
+def load_cache(data_dir=DATA_DIR, img_size=(64, 64), build=True, verbose=True):
+    """Memory-map the cache for data_dir at img_size
+
+    The cache is validated (and rebuilt where stale) first unless build=False.
+    Returns (images, labels, paths, class_indices) where images is a
+    CachedImages view and paths are relative to data_dir.
+    """
+    img_size = tuple(img_size)
+    cache_dir = cache_dir_for(data_dir, img_size)
+    # A cache ingested from an archive (ingest_zip.py) has no image folder
+    if build and Path(data_dir).exists():
+        build_cache(data_dir, img_size, verbose=verbose)
+
+    index = load_index(cache_dir)
+    if index is None:
+        raise FileNotFoundError(f"No dataset cache found in {cache_dir}; run dataset_cache.py first")
+
+    shards = []
+    paths = []
+    for class_name in index['class_names']:
+        entry = index['classes'][class_name]
+        shard_path = cache_dir / entry['file']
+        if entry['count']:
+            shards.append(np.load(shard_path, mmap_mode='r'))
+        else:
+            shards.append(np.zeros((0, *img_size, 3), dtype=np.uint8))
+        paths.extend(entry['files'])
+
+    labels = np.load(cache_dir / LABELS_FILE, mmap_mode='r')
+    class_indices = {name: i for i, name in enumerate(index['class_names'])}
+
+    return CachedImages(shards, img_size), labels, paths, class_indices
+
+
+def cached_file_lists(data_dir):
+    """{class name: relative paths} from the newest cache index of data_dir
+
+    Lets the split and training scripts list a dataset that only exists as
+    a cache ingested from an archive. Returns None if there is no cache.
+    """
+    indexes = sorted(
+        (CACHE_ROOT / dataset_key(data_dir)).glob(f"*/{INDEX_FILE}"),
+        key=lambda p: p.stat().st_mtime
+    )
+    for index_path in reversed(indexes):
+        index = load_index(index_path.parent)
+        if index is not None:
+            return {name: index['classes'][name]['files'] for name in index['class_names']}
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the decoded ISL dataset cache")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--img-size', type=int, nargs='+', default=[CACHE_SIZE[0]],
+                        help=f"Target size(s) (default: {CACHE_SIZE[0]}, read by every preset)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  Building Decoded Dataset Cache")
+    print("="*60)
+
+    for size in args.img_size:
+        print(f"\n📦 Target size {size}x{size}")
+        build_cache(args.data_dir, (size, size), workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
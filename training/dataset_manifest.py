@@ -0,0 +1,245 @@
+"""
+Dataset manifest shared by the training, testing and download scripts
+
+Lists every image once as (class, relative path, bytes, width, height, hash)
+in data/.cache/manifest_<dataset key>.json, where the key (dataset_key) is the
+folder name plus a hash of its location, e.g. ISL-d82338bb for data/ISL.
+Later runs only stat the class directories: a class folder is re-listed when
+its directory mtime changes, which happens whenever a file is added, removed
+or renamed in it. Within a re-listed class, files whose size and mtime are
+unchanged keep their entry.
+
+Use --verify to also stat every file and catch in-place edits.
+
+Usage:
+    python training/dataset_manifest.py
+    python training/dataset_manifest.py --data-dir data/indian-sign-language-isl --verify
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+from pathlib import Path
+
+from PIL import Image
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+CACHE_ROOT = PROJECT_ROOT / "data" / ".cache"
+
+MANIFEST_VERSION = 1
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+
+
+class DatasetManifest:
+    """In-memory view of a dataset manifest"""
+
+    def __init__(self, data_dir, classes):
+        self.data_dir = Path(data_dir)
+        self.classes = classes
+
+    @property
+    def class_names(self):
+        return sorted(self.classes)
+
+    def files(self, class_name):
+        """Manifest entries of one class, in file order"""
+        return self.classes[class_name]['files']
+
+    def count(self, class_name=None):
+        if class_name is not None:
+            return len(self.files(class_name))
+        return sum(len(entry['files']) for entry in self.classes.values())
+
+    def __len__(self):
+        return self.count()
+
+    def entries(self):
+        """Yield (class name, entry) for every image"""
+        for class_name in self.class_names:
+            for entry in self.files(class_name):
+                yield class_name, entry
+
+    def path(self, entry):
+        return self.data_dir / entry['path']
+
+    def sample(self, n, rng=random):
+        """Draw n random (path, class name) pairs: a random class, then a random image
+
+        Each draw is O(1); nothing is listed from disk.
+        """
+        class_names = [name for name in self.class_names if self.files(name)]
+        if not class_names:
+            return []
+        samples = []
+        for _ in range(n):
+            class_name = rng.choice(class_names)
+            entry = rng.choice(self.files(class_name))
+            samples.append((self.path(entry), class_name))
+        return samples
+
+
+def dataset_key(data_dir):
+    """Name of a dataset's state files: its folder name and a short hash of its location
+
+    Datasets with the same folder name in different places (data/ISL and
+    /tmp/x/data/ISL) get separate caches, manifests and splits. Inside the
+    project the location is relative, so keys are the same in every checkout.
+    """
+    path = Path(data_dir).resolve()
+    try:
+        location = path.relative_to(PROJECT_ROOT.resolve()).as_posix()
+    except ValueError:
+        location = path.as_posix()
+    return f"{path.name}-{hashlib.sha1(location.encode()).hexdigest()[:8]}"
+
+
+def same_dataset(stored_dir, data_dir):
+    """True if a data_dir stored in a state file is data_dir
+
+    A relative stored path may be relative to the working directory or to
+    the project.
+    """
+    stored = Path(stored_dir)
+    candidates = [stored] if stored.is_absolute() else [stored, PROJECT_ROOT / stored]
+    return any(path.resolve() == Path(data_dir).resolve() for path in candidates)
+
+
+def manifest_path_for(data_dir):
+    return CACHE_ROOT / f"manifest_{dataset_key(data_dir)}.json"
+
+
+def describe_image(data_dir, rel_path, stat):
+    """Build the manifest entry for one file (reads the header and the bytes once)"""
+    path = Path(data_dir) / rel_path
+    with open(path, 'rb') as f:
+        content = f.read()
+    try:
+        with Image.open(path) as img:
+            width, height = img.size  # Header only, no decode
+    except Exception:
+        width = height = None
+    return {
+        'path': rel_path,
+        'bytes': stat.st_size,
+        'width': width,
+        'height': height,
+        'hash': hashlib.sha1(content).hexdigest(),
+        'mtime': stat.st_mtime_ns,
+    }
+
+
+def scan_class(data_dir, class_name, previous=None):
+    """List one class folder, reusing entries of unchanged files"""
+    data_dir = Path(data_dir)
+    known = {entry['path']: entry for entry in (previous or {}).get('files', [])}
+    files = []
+    dirs = {}
+
+    for root, _, names in sorted(os.walk(data_dir / class_name), key=lambda x: x[0]):
+        dirs[os.path.relpath(root, data_dir).replace(os.sep, '/')] = os.stat(root).st_mtime_ns
+        for fname in sorted(names):
+            if not fname.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            full_path = os.path.join(root, fname)
+            rel_path = os.path.relpath(full_path, data_dir).replace(os.sep, '/')
+            stat = os.stat(full_path)
+            entry = known.get(rel_path)
+            if entry is None or entry['bytes'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns:
+                entry = describe_image(data_dir, rel_path, stat)
+            files.append(entry)
+
+    return {'dirs': dirs, 'files': files}
+
+
+def class_is_stale(data_dir, entry, verify=False):
+    """Whether a class must be re-listed
+
+    Directory mtimes change when entries are added, removed or renamed; with
+    `verify`, every file is also stat'ed to catch in-place modifications.
+    """
+    data_dir = Path(data_dir)
+    for rel_dir, mtime in entry['dirs'].items():
+        try:
+            if os.stat(data_dir / rel_dir).st_mtime_ns != mtime:
+                return True
+        except FileNotFoundError:
+            return True
+
+    if verify:
+        for file_entry in entry['files']:
+            try:
+                stat = os.stat(data_dir / file_entry['path'])
+            except FileNotFoundError:
+                return True
+            if stat.st_size != file_entry['bytes'] or stat.st_mtime_ns != file_entry['mtime']:
+                return True
+    return False
+
+
+def load_manifest(data_dir=DATA_DIR, update=True, verify=False, verbose=False):
+    """Load the manifest for data_dir, refreshing stale classes first
+
+    Returns a DatasetManifest, or None if data_dir does not exist.
+    """
+    data_dir = Path(data_dir)
+    if not data_dir.exists():
+        return None
+
+    manifest_path = manifest_path_for(data_dir)
+    stored = {}
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            payload = json.load(f)
+        # Entries of another directory are never reused
+        if payload.get('version') == MANIFEST_VERSION and same_dataset(payload.get('data_dir', ''), data_dir):
+            stored = payload['classes']
+
+    if not update:
+        return DatasetManifest(data_dir, stored)
+
+    classes = {}
+    changed = []
+    for class_dir in sorted(d for d in data_dir.iterdir() if d.is_dir()):
+        previous = stored.get(class_dir.name)
+        if previous is not None and not class_is_stale(data_dir, previous, verify):
+            classes[class_dir.name] = previous
+            continue
+        classes[class_dir.name] = scan_class(data_dir, class_dir.name, previous)
+        changed.append(class_dir.name)
+
+    if changed or set(classes) != set(stored):
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        # Per-process temp name: concurrent runs may refresh the same manifest
+        tmp_path = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'data_dir': str(data_dir), 'classes': classes}, f)
+        os.replace(tmp_path, manifest_path)
+        if verbose:
+            print(f"✓ Manifest updated ({len(changed)} classes re-listed): {manifest_path}")
+
+    return DatasetManifest(data_dir, classes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or refresh the dataset manifest")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--verify', action='store_true', help="Also stat every file to catch in-place edits")
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.data_dir, verify=args.verify, verbose=True)
+    if manifest is None:
+        print(f"✗ Data directory not found: {args.data_dir}")
+        return
+
+    print(f"\n📊 {args.data_dir}")
+    print(f"   Classes: {len(manifest.class_names)}")
+    for class_name in manifest.class_names:
+        print(f"   - {class_name}: {manifest.count(class_name)} images")
+    print(f"   Total images: {len(manifest)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Perceptual-hash duplicate and near-duplicate index for the dataset
+
+The ISL class folders are frames from short clips, so many images are almost
+identical. This tool computes a 64-bit perceptual hash (pHash) for every image
+in parallel, stores them in an on-disk index and answers Hamming-radius
+queries with a multi-index hash table, so near-duplicate clusters can be
+listed, collapsed, or pinned to a single train/validation subset.
+
+Usage:
+    python training/dedup_index.py build
+    python training/dedup_index.py clusters --radius 4
+    python training/dedup_index.py query data/ISL/A/10.jpg --radius 6
+    python training/dedup_index.py collapse --radius 4 --dry-run
+
+`clusters` writes data/.cache/clusters_<dataset key>_r<radius>.json; point
+Config.DEDUP_CLUSTERS at it to keep every cluster inside one subset.
+"""
+
+import os
+import sys
+import json
+import argparse
+import shutil
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from dataset_manifest import dataset_key
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+CACHE_ROOT = PROJECT_ROOT / "data" / ".cache"
+DUPLICATES_ROOT = PROJECT_ROOT / "data" / "duplicates"
+
+HASH_BITS = 64
+IMAGE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'bmp', 'ppm', 'tif', 'tiff')
+
+# pHash: DCT of a 32x32 grayscale thumbnail, keep the 8x8 low frequencies
+DCT_SIZE = 32
+HASH_SIZE = 8
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, so dct2(x) = D @ x @ D.T"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    d = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    d[0] /= np.sqrt(2.0)
+    return d
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+_BIT_WEIGHTS = np.uint64(1) << np.arange(HASH_BITS - 1, -1, -1, dtype=np.uint64)
+
+
+def phash(path):
+    """64-bit perceptual hash of an image, or None if it cannot be read"""
+    try:
+        with Image.open(path) as img:
+            gray = img.convert('L').resize((DCT_SIZE, DCT_SIZE), Image.BILINEAR)
+            pixels = np.asarray(gray, dtype=np.float64)
+    except Exception:
+        return None
+
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term only encodes brightness, leave it out of the median
+    bits = low > np.median(low[1:])
+    return int(np.bitwise_or.reduce(_BIT_WEIGHTS[bits])) if bits.any() else 0
+
+
+def popcount(values):
+    """Number of set bits of each uint64 value"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, HASH_BITS).sum(axis=1)
+
+
+def index_path_for(data_dir):
+    return CACHE_ROOT / f"phash_{dataset_key(data_dir)}.npz"
+
+
+def clusters_path_for(data_dir, radius):
+    return CACHE_ROOT / f"clusters_{dataset_key(data_dir)}_r{radius}.json"
+
+
+def list_images(data_dir):
+    """Yield (class name, relative path, stat) in class and file order"""
+    data_dir = Path(data_dir)
+    for class_dir in sorted(d for d in data_dir.iterdir() if d.is_dir()):
+        for root, _, names in sorted(os.walk(class_dir), key=lambda x: x[0]):
+            for fname in sorted(names):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, fname)
+                    rel_path = os.path.relpath(path, data_dir).replace(os.sep, '/')
+                    yield class_dir.name, rel_path, os.stat(path)
+
+
+def build_index(data_dir=DATA_DIR, workers=None):
+    """Create or update the hash index; only new or changed files are hashed"""
+    data_dir = Path(data_dir)
+    index_path = index_path_for(data_dir)
+
+    previous = {}
+    if index_path.exists():
+        old = np.load(index_path)
+        for path, h, size, mtime in zip(old['paths'], old['hashes'], old['sizes'], old['mtimes']):
+            previous[str(path)] = (int(h), int(size), int(mtime))
+
+    classes, paths, sizes, mtimes, hashes = [], [], [], [], []
+    pending = []
+    for class_name, rel_path, stat in list_images(data_dir):
+        classes.append(class_name)
+        paths.append(rel_path)
+        sizes.append(stat.st_size)
+        mtimes.append(stat.st_mtime_ns)
+        old = previous.get(rel_path)
+        if old and old[1] == stat.st_size and old[2] == stat.st_mtime_ns:
+            hashes.append(old[0])
+        else:
+            hashes.append(None)
+            pending.append(len(paths) - 1)
+
+    print(f"Images: {len(paths)} ({len(pending)} to hash)")
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(phash, [str(data_dir / paths[i]) for i in pending], chunksize=64)
+            for i, h in zip(pending, results):
+                hashes[i] = h
+
+    valid = [i for i, h in enumerate(hashes) if h is not None]
+    if len(valid) < len(paths):
+        print(f"⚠ Skipped {len(paths) - len(valid)} unreadable images (see clean_dataset.py)")
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        index_path,
+        hashes=np.array([hashes[i] for i in valid], dtype=np.uint64),
+        paths=np.array([paths[i] for i in valid]),
+        classes=np.array([classes[i] for i in valid]),
+        sizes=np.array([sizes[i] for i in valid], dtype=np.int64),
+        mtimes=np.array([mtimes[i] for i in valid], dtype=np.int64),
+    )
+    print(f"✓ Index saved: {index_path}")
+    return index_path
+
+
+def load_index(data_dir=DATA_DIR):
+    """Load (hashes, paths, classes) from the on-disk index"""
+    index_path = index_path_for(data_dir)
+    if not index_path.exists():
+        raise FileNotFoundError(f"No hash index found at {index_path}; run 'dedup_index.py build' first")
+    data = np.load(index_path)
+    return data['hashes'], [str(p) for p in data['paths']], [str(c) for c in data['classes']]
+
+
+class HammingIndex:
+    """Multi-index hashing for Hamming-radius queries
+
+    The 64-bit hash is split into radius + 1 chunks. Two hashes within the
+    radius must agree exactly on at least one chunk (pigeonhole), so only
+    items sharing a chunk bucket are compared bit by bit.
+    """
+
+    def __init__(self, hashes, radius):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.radius = radius
+        num_chunks = min(radius + 1, HASH_BITS)
+        bounds = np.linspace(0, HASH_BITS, num_chunks + 1).astype(int)
+        self.chunks = [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+        self.tables = []
+        for lo, hi in self.chunks:
+            keys = self._chunk(self.hashes, lo, hi)
+            table = defaultdict(list)
+            for i, key in enumerate(keys.tolist()):
+                table[key].append(i)
+            self.tables.append({k: np.array(v) for k, v in table.items()})
+
+    @staticmethod
+    def _chunk(values, lo, hi):
+        mask = np.uint64((1 << (hi - lo)) - 1)
+        return (values >> np.uint64(lo)) & mask
+
+    def query(self, value, radius=None):
+        """Indices of stored hashes within `radius` of value, with distances"""
+        radius = self.radius if radius is None else radius
+        if radius > self.radius:
+            raise ValueError(f"Index was built for radius <= {self.radius}")
+        value = np.uint64(value)
+
+        candidates = []
+        for (lo, hi), table in zip(self.chunks, self.tables):
+            bucket = table.get(int(self._chunk(value, lo, hi)))
+            if bucket is not None:
+                candidates.append(bucket)
+        if not candidates:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        candidates = np.unique(np.concatenate(candidates))
+        distances = popcount(self.hashes[candidates] ^ value)
+        keep = distances <= radius
+        return candidates[keep], distances[keep]
+
+
+def find_clusters(hashes, classes, radius):
+    """Group near-duplicates within each class by leader clustering
+
+    Each unassigned image in file order becomes a leader and absorbs every
+    unassigned image of its class within `radius`. Unlike transitive
+    grouping, this does not chain slowly drifting frames into one giant
+    cluster. Returns (clusters, cross_class_pairs) where clusters is a list
+    of index arrays with more than one member.
+    """
+    index = HammingIndex(hashes, radius)
+    classes = np.asarray(classes)
+    assigned = np.zeros(len(hashes), dtype=bool)
+    clusters = []
+    cross_class = 0
+
+    for i in range(len(hashes)):
+        if assigned[i]:
+            continue
+        neighbours, _ = index.query(hashes[i])
+        same_class = classes[neighbours] == classes[i]
+        cross_class += int((~same_class).sum())
+        members = neighbours[same_class & ~assigned[neighbours]]
+        assigned[members] = True
+        assigned[i] = True
+        if len(members) > 1:
+            clusters.append(np.sort(members))
+
+    return clusters, cross_class
+
+
+def save_clusters(data_dir, radius, clusters, paths):
+    """Write clusters as lists of relative paths (first entry is the leader)"""
+    clusters_path = clusters_path_for(data_dir, radius)
+    payload = {
+        'data_dir': str(data_dir),
+        'radius': radius,
+        'clusters': [[paths[i] for i in members] for members in clusters],
+    }
+    with open(clusters_path, 'w') as f:
+        json.dump(payload, f, indent=1)
+    return clusters_path
+
+
+def load_cluster_groups(clusters_path):
+    """Map relative path -> cluster id from a saved clusters file"""
+    with open(clusters_path, 'r') as f:
+        payload = json.load(f)
+    return {path: cid for cid, members in enumerate(payload['clusters']) for path in members}
+
+
+def cmd_build(args):
+    build_index(args.data_dir, workers=args.workers)
+
+
+def cmd_clusters(args):
+    hashes, paths, classes = load_index(args.data_dir)
+    clusters, cross_class = find_clusters(hashes, classes, args.radius)
+    duplicates = sum(len(c) - 1 for c in clusters)
+
+    print(f"\n📊 Near-duplicate clusters (radius {args.radius}):")
+    print(f"   Images: {len(paths)}")
+    print(f"   Clusters: {len(clusters)}")
+    print(f"   Redundant images: {duplicates} ({duplicates / max(len(paths), 1):.1%})")
+    print(f"   Unique after collapsing: {len(paths) - duplicates}")
+    if cross_class:
+        print(f"   ⚠ {cross_class} near-duplicate pairs span two classes (possible label noise)")
+
+    for members in sorted(clusters, key=len, reverse=True)[:args.show]:
+        names = ', '.join(paths[i] for i in members[:6])
+        more = f" ... (+{len(members) - 6})" if len(members) > 6 else ""
+        print(f"   [{len(members):3d}] {names}{more}")
+
+    clusters_path = save_clusters(args.data_dir, args.radius, clusters, paths)
+    print(f"\n✓ Clusters saved: {clusters_path}")
+
+
+def cmd_query(args):
+    hashes, paths, classes = load_index(args.data_dir)
+    value = phash(args.image)
+    if value is None:
+        print(f"✗ Could not read {args.image}")
+        sys.exit(1)
+
+    matches, distances = HammingIndex(hashes, args.radius).query(value)
+    order = np.argsort(distances, kind='stable')
+    print(f"\n🔎 {len(matches)} images within distance {args.radius} of {args.image}:")
+    for i in order:
+        print(f"   {distances[i]:2d}  {paths[matches[i]]}")
+
+
+def cmd_collapse(args):
+    hashes, paths, classes = load_index(args.data_dir)
+    clusters, _ = find_clusters(hashes, classes, args.radius)
+    redundant = [paths[i] for members in clusters for i in members[1:]]
+
+    quarantine = DUPLICATES_ROOT / Path(args.data_dir).name
+    print(f"\n{len(redundant)} redundant images (keeping one image per cluster)")
+    if args.dry_run:
+        print(f"⚠ Dry run: nothing moved. Without --dry-run they go to {quarantine}")
+        return
+
+    for rel_path in redundant:
+        target = quarantine / rel_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(Path(args.data_dir) / rel_path), str(target))
+    print(f"✓ Moved {len(redundant)} images to {quarantine}")
+    print("  Re-run 'dedup_index.py build' to refresh the index")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash near-duplicate index")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help="Hash new or changed images into the index")
+    p.add_argument('--workers', type=int, default=None)
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser('clusters', help="List near-duplicate clusters and save them")
+    p.add_argument('--radius', type=int, default=4, help="Max Hamming distance (bits)")
+    p.add_argument('--show', type=int, default=10, help="Largest clusters to print")
+    p.set_defaults(func=cmd_clusters)
+
+    p = sub.add_parser('query', help="Find near-duplicates of one image")
+    p.add_argument('image')
+    p.add_argument('--radius', type=int, default=6)
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('collapse', help="Move all but one image of each cluster out of the dataset")
+    p.add_argument('--radius', type=int, default=4)
+    p.add_argument('--dry-run', action='store_true')
+    p.set_defaults(func=cmd_collapse)
+
+    args = parser.parse_args()
+    print("="*60)
+    print("  ISL Near-Duplicate Index")
+    print("="*60)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Knowledge distillation from a large teacher model
+
+Trains a small architecture (e.g. the fast preset's tiny_cnn, which ships
+as isl_model_quantized.tflite) on the teacher's softened outputs as well as
+the labels:
+
+    loss = alpha * T^2 * KL(softmax(teacher / T) || softmax(student / T))
+         + (1 - alpha) * crossentropy(labels, student)
+
+The teacher runs once over the decoded dataset cache: its penultimate
+features are stored by the frozen-backbone feature cache (see
+feature_cache.py) and its logits are the final Dense layer applied to them,
+so later distillation runs only read the cache. The soft targets travel
+with the labels (y = [one-hot, teacher logits]); they are computed on the
+unaugmented images.
+
+Set 'teacher' in the engine config (or pass --teacher) to train in this
+mode; it needs the 'cache' data pipeline. The saved student is a plain
+Keras model without the distillation loss.
+
+Usage:
+    python training/engine.py --preset full --model-dir model/teacher
+    python training/engine.py --preset fast --teacher model/teacher/isl_model.h5
+    python training/distillation.py --teacher model/teacher/isl_model.h5
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EPSILON = 1e-7
+
+
+def teacher_logits(teacher_path, data_dir, cache_size, batch_size=256, verbose=True):
+    """(paths, logits) of the teacher over the decoded dataset cache
+
+    Columns follow the dataset's class order; raises ValueError if the
+    dataset has classes the teacher was not trained on.
+    """
+    from feature_cache import build_features, split_model
+
+    teacher_path = Path(teacher_path)
+    if not teacher_path.exists():
+        raise FileNotFoundError(f"No teacher model found at {teacher_path}")
+    teacher = keras.models.load_model(teacher_path, compile=False)
+    backbone, head = split_model(teacher)
+    features, _, paths, class_indices = build_features(backbone, data_dir, cache_size, batch_size,
+                                                       verbose=verbose)
+    kernel, bias = head.get_weights()
+    logits = features.astype(np.float32) @ kernel + bias
+
+    labels_path = teacher_path.parent / 'labels.json'
+    if labels_path.exists():
+        with open(labels_path, 'r') as f:
+            labels = json.load(f)
+        teacher_classes = {labels[str(i)]: i for i in range(len(labels))}
+        class_names = sorted(class_indices, key=class_indices.get)
+        unknown = [name for name in class_names if name not in teacher_classes]
+        if unknown:
+            raise ValueError(f"Teacher was not trained on: {', '.join(unknown)}")
+        logits = logits[:, [teacher_classes[name] for name in class_names]]
+    elif logits.shape[1] != len(class_indices):
+        raise ValueError(f"Teacher has {logits.shape[1]} classes, the dataset {len(class_indices)}")
+    return paths, logits
+
+
+@keras.utils.register_keras_serializable(package='isl')
+class DistillationLoss(keras.losses.Loss):
+    """Labels plus temperature-softened teacher logits, packed in y_true
+
+    y_true is [one-hot labels, teacher logits]; y_pred is the student's
+    softmax output, whose log recovers its logits up to a constant.
+    """
+
+    def __init__(self, num_classes, temperature=4.0, alpha=0.7, name='distillation', **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.num_classes = num_classes
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def call(self, y_true, y_pred):
+        y_true = tf.cast(y_true, tf.float32)
+        y_pred = tf.cast(y_pred, tf.float32)
+        labels, teacher = y_true[:, :self.num_classes], y_true[:, self.num_classes:]
+        hard = keras.losses.categorical_crossentropy(labels, y_pred)
+
+        student = tf.math.log(tf.clip_by_value(y_pred, EPSILON, 1.0))
+        teacher_log_probs = tf.nn.log_softmax(teacher / self.temperature)
+        student_log_probs = tf.nn.log_softmax(student / self.temperature)
+        soft = tf.reduce_sum(tf.exp(teacher_log_probs) * (teacher_log_probs - student_log_probs), axis=-1)
+        # T^2 keeps the soft gradients on the scale of the hard ones
+        return self.alpha * self.temperature ** 2 * soft + (1 - self.alpha) * hard
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(num_classes=self.num_classes, temperature=self.temperature, alpha=self.alpha)
+        return config
+
+
+def label_metrics(num_classes, top_k=None):
+    """Accuracy metrics on the label part of y_true, named as in normal training"""
+    def accuracy(y_true, y_pred):
+        return keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+
+    metrics = [keras.metrics.MeanMetricWrapper(accuracy, name='accuracy')]
+    if top_k:
+        def top_k_accuracy(y_true, y_pred):
+            return keras.metrics.top_k_categorical_accuracy(y_true[:, :num_classes], y_pred, k=top_k)
+        metrics.append(keras.metrics.MeanMetricWrapper(top_k_accuracy, name=f'top_{top_k}_accuracy'))
+    return metrics
+
+
+def main():
+    from engine import CACHE_SIZE, DATA_DIR
+    from splits import ensure_split, split_files, split_path_for
+
+    parser = argparse.ArgumentParser(description="Cache a teacher model's logits for distillation")
+    parser.add_argument('--teacher', required=True, help="Teacher isl_model.h5")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE[0],
+                        help="Square size of the decode cache")
+    parser.add_argument('--temperature', type=float, default=4.0)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Teacher Logits")
+    print("="*60)
+
+    try:
+        paths, logits = teacher_logits(args.teacher, args.data_dir, (args.cache_size, args.cache_size))
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    # How much the soft targets say beyond the labels, on the validation set
+    split = ensure_split(split_path_for(args.data_dir), args.data_dir)
+    val_paths, val_labels, _ = split_files(split, 'validation')
+    position = {p: i for i, p in enumerate(paths)}
+    rows = [(position[p], label) for p, label in zip(val_paths, val_labels) if p in position]
+    if rows:
+        indices, targets = map(np.asarray, zip(*rows))
+        val_logits = logits[indices]
+        soft = tf.nn.softmax(val_logits / args.temperature).numpy()
+        print(f"\n✓ Teacher validation accuracy: {np.mean(val_logits.argmax(1) == targets):.4f}")
+        print(f"  Mean probability of the label at T={args.temperature}: "
+              f"{soft[np.arange(len(targets)), targets].mean():.3f}")
+
+    print("\nNext step:")
+    print(f"  python training/engine.py --preset fast --teacher {args.teacher}")
+
+
+if __name__ == "__main__":
+    main()
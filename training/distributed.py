@@ -0,0 +1,217 @@
+"""
+Multi-worker data-parallel training
+
+Runs the training engine under tf.distribute.MultiWorkerMirroredStrategy:
+every worker holds a copy of the model, reads its own equal share of the
+training set (data_pipeline.shard_items) and gradients are all-reduced each
+step. The batch size is per worker, so the global batch and the learning
+rate are both scaled by the number of workers (linear scaling rule). Only
+the chief (worker 0) writes checkpoints, the model and labels.json.
+
+Workers find each other through the TF_CONFIG environment variable. On a
+cluster, set it on every machine (tf_config() builds it) and run
+engine.py --distributed. For testing, `launch` starts the workers as local
+processes on free ports, splitting the CPU threads between them; worker 0
+prints to the console and the others log to training/logs/distributed/.
+
+`benchmark` trains one epoch with 1, 2, 4... workers and reports images/sec
+and scaling efficiency. Local workers share one machine's cores, so locally
+it measures the all-reduce overhead; run it across machines for real scaling.
+
+Usage:
+    python training/distributed.py launch --workers 2 -- --preset fast --epochs 5
+    python training/distributed.py benchmark --workers 4 -- --preset fast
+    TF_CONFIG='...' python training/engine.py --distributed
+"""
+
+import os
+import sys
+import json
+import signal
+import socket
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+ENGINE = Path(__file__).parent / "engine.py"
+LOGS_DIR = PROJECT_ROOT / "training" / "logs" / "distributed"
+
+
+def tf_config(workers, index):
+    """TF_CONFIG value for worker `index` of a cluster of "host:port" workers"""
+    return json.dumps({
+        'cluster': {'worker': list(workers)},
+        'task': {'type': 'worker', 'index': index},
+    })
+
+
+def free_ports(count):
+    """Ports the OS reports free on localhost"""
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for s in sockets:
+            s.bind(('localhost', 0))
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def worker_info():
+    """(num_workers, index) of this process from TF_CONFIG; (1, 0) without it"""
+    config = json.loads(os.environ.get('TF_CONFIG') or '{}')
+    workers = config.get('cluster', {}).get('worker', [])
+    if not workers:
+        return 1, 0
+    return len(workers), config.get('task', {}).get('index', 0)
+
+
+def is_chief():
+    """True on worker 0, which alone writes files"""
+    return worker_info()[1] == 0
+
+
+def create_strategy():
+    """MultiWorkerMirroredStrategy for the TF_CONFIG cluster
+
+    Must be created before TensorFlow runs any op.
+    """
+    import tensorflow as tf
+    options = tf.distribute.experimental.CommunicationOptions(
+        implementation=tf.distribute.experimental.CommunicationImplementation.RING)
+    return tf.distribute.MultiWorkerMirroredStrategy(communication_options=options)
+
+
+def prepare_model(model, strategy, element_spec):
+    """Let a compiled Keras 3 model train with fit() on several workers
+
+    Keras 3's fit() all-reduces the first (x, y) batch to build the model,
+    which MultiWorkerMirroredStrategy cannot do for a tuple, and averages
+    the scalar step logs along an axis they do not have. The model is built
+    from the dataset's element spec instead, and the train/test steps return
+    rank-1 logs, which the all-reduce averages into the same value on every
+    worker. Keras 2 (tf.keras) needs neither.
+    """
+    if not hasattr(model, '_maybe_symbolic_build'):
+        return model
+    import tensorflow as tf
+
+    with strategy.scope():
+        model._symbolic_build(data_batch=element_spec)
+    model._maybe_symbolic_build = lambda iterator=None, data_batch=None: None
+
+    def rank1(step):
+        return lambda data: {name: tf.reshape(value, [1]) for name, value in step(data).items()}
+    model.train_step = rank1(model.train_step)
+    model.test_step = rank1(model.test_step)
+    return model
+
+
+def barrier(strategy):
+    """Wait until every worker of the strategy gets here"""
+    import tensorflow as tf
+    strategy.reduce(tf.distribute.ReduceOp.SUM, strategy.run(lambda: tf.constant(1.0)), axis=None)
+
+
+def launch_local(num_workers, engine_args, log_dir=LOGS_DIR):
+    """Run engine.py --distributed as `num_workers` local processes
+
+    Returns the exit code of the first worker that failed, or 0.
+    """
+    workers = [f"localhost:{port}" for port in free_ports(num_workers)]
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    processes, logs = [], []
+    for index in range(num_workers):
+        env = dict(os.environ, TF_CONFIG=tf_config(workers, index),
+                   TF_NUM_INTRAOP_THREADS=str(threads), OMP_NUM_THREADS=str(threads))
+        if index == 0:
+            output = None
+        else:
+            output = open(log_dir / f"worker-{index}.log", 'w')
+            logs.append(output)
+        processes.append(subprocess.Popen(
+            [sys.executable, str(ENGINE), '--distributed', *engine_args],
+            env=env, stdout=output, stderr=subprocess.STDOUT if output else None))
+
+    # A worker stopped alone would leave the others waiting in an all-reduce
+    def forward(signum, frame):
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    previous = {signum: signal.signal(signum, forward) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        codes = [process.wait() for process in processes]
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+        for output in logs:
+            output.close()
+
+    for index, code in enumerate(codes):
+        if code:
+            print(f"✗ Worker {index} exited with code {code}"
+                  + (f" (log: {log_dir / f'worker-{index}.log'})" if index else ""))
+            return code
+    return 0
+
+
+def benchmark(max_workers, engine_args, log_dir=LOGS_DIR):
+    """Images/sec of one training epoch with 1, 2, 4... up to max_workers workers"""
+    counts = sorted({min(2 ** i, max_workers) for i in range(max_workers.bit_length() + 1)})
+    rows = []
+    for num_workers in counts:
+        print(f"\n⏱️  Benchmarking {num_workers} worker(s)...")
+        with tempfile.TemporaryDirectory() as tmp:
+            result_file = Path(tmp) / 'result.json'
+            code = launch_local(num_workers, ['--epochs', '1', *engine_args, '--model-dir', tmp,
+                                              '--result-file', str(result_file)], log_dir)
+            if code:
+                return None
+            with open(result_file, 'r') as f:
+                result = json.load(f)['distributed']
+        rows.append(result)
+
+    base = rows[0]['images_per_second']
+    print("\n" + "="*60)
+    print(f"  {'Workers':>7} {'Global batch':>13} {'Step (ms)':>10} {'Images/sec':>11} {'Scaling':>8}")
+    for row in rows:
+        row['speedup'] = round(row['images_per_second'] / base, 2)
+        row['efficiency'] = round(row['speedup'] / (row['num_workers'] / rows[0]['num_workers']), 2)
+        print(f"  {row['num_workers']:>7} {row['global_batch_size']:>13} {row['step_time_ms']:>10} "
+              f"{row['images_per_second']:>11} {row['efficiency']:>7.0%}")
+    print("="*60)
+
+    report_path = Path(log_dir) / 'benchmark.json'
+    with open(report_path, 'w') as f:
+        json.dump({'engine_args': engine_args, 'cpu_count': os.cpu_count(), 'runs': rows}, f, indent=2)
+    print(f"✓ Benchmark saved: {report_path}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Multi-worker training on local processes",
+        epilog="Arguments after -- are passed to engine.py")
+    parser.add_argument('command', choices=['launch', 'benchmark'])
+    parser.add_argument('--workers', type=int, default=2, help="Number of (maximum) workers")
+    argv = sys.argv[1:]
+    split = argv.index('--') if '--' in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    engine_args = argv[split + 1:]
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.command == 'launch':
+        sys.exit(launch_local(args.workers, engine_args))
+    sys.exit(0 if benchmark(args.workers, engine_args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,24 @@ Download Indian Sign Language datasets from Kaggle
 
 This script downloads and extracts ISL datasets for training.
 Make sure you have set up the Kaggle API first (see KAGGLE_SETUP.md)
+
+With --ingest, the zip is kept and streamed straight into the decoded
+dataset cache instead of being extracted (see ingest_zip.py). Sizes
+default to the 128px cache every training preset reads:
+    python training/download_dataset.py --ingest
 """
 
 import os
 import sys
+import argparse
 import subprocess
 import zipfile
 from pathlib import Path
 
+from dataset_manifest import load_manifest
+from dataset_cache import CACHE_SIZE
+from ingest_zip import ingest_zip
+
 # Get project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
@@ -57,20 +67,25 @@ def check_kaggle_setup():
         print("\nInstall it with: pip install kaggle")
         return False
 
-def download_dataset(kaggle_id, dataset_name):
-    """Download and extract a dataset from Kaggle"""
+def download_dataset(kaggle_id, dataset_name, ingest_sizes=None):
+    """Download and extract a dataset from Kaggle
+    
+    With ingest_sizes, the zip is kept as data/<name>.zip and decoded into
+    the dataset cache at those sizes instead of being extracted.
+    """
     
     dataset_path = DATA_DIR / dataset_name
     
     # Check if dataset already exists
-    if dataset_path.exists() and any(dataset_path.iterdir()):
+    if not ingest_sizes and dataset_path.exists() and any(dataset_path.iterdir()):
         print(f"\n⚠ Dataset '{dataset_name}' already exists")
         overwrite = input("Do you want to re-download it? (y/n): ").lower()
         if overwrite != 'y':
             print(f"Skipping {dataset_name}")
             return True
     
-    dataset_path.mkdir(exist_ok=True)
+    if not ingest_sizes:
+        dataset_path.mkdir(exist_ok=True)
     
     print(f"\n📥 Downloading {dataset_name}...")
     print(f"   Kaggle ID: {kaggle_id}")
@@ -94,6 +109,15 @@ def download_dataset(kaggle_id, dataset_name):
         # Use the most recently downloaded zip
         zip_file = max(zip_files, key=os.path.getctime)
         
+        if ingest_sizes:
+            # Keep the archive: its checksum lets the next ingest skip it
+            archive = DATA_DIR / f"{dataset_name}.zip"
+            if zip_file != archive:
+                zip_file.replace(archive)
+            ingest_zip(archive, dataset_path, [(size, size) for size in ingest_sizes])
+            print(f"✓ Successfully downloaded and ingested {dataset_name}")
+            return True
+        
         print(f"📦 Extracting {zip_file.name}...")
         
         # Extract the dataset
@@ -126,22 +150,30 @@ def show_dataset_info(dataset_path):
     
     print(f"\n📊 Dataset Structure:")
     
-    # Count subdirectories (gesture classes)
-    subdirs = [d for d in dataset_path.iterdir() if d.is_dir()]
-    if subdirs:
-        print(f"   Classes found: {len(subdirs)}")
-        print(f"   Classes: {', '.join([d.name for d in subdirs[:10]])}")
-        if len(subdirs) > 10:
-            print(f"   ... and {len(subdirs) - 10} more")
+    # Gesture classes and image counts come from the dataset manifest,
+    # which is generated here once and reused by training and testing
+    manifest = load_manifest(dataset_path)
+    class_names = manifest.class_names
+    if class_names and len(manifest):
+        print(f"   Classes found: {len(class_names)}")
+        print(f"   Classes: {', '.join(class_names[:10])}")
+        if len(class_names) > 10:
+            print(f"   ... and {len(class_names) - 10} more")
         
-        # Count total files
-        total_files = sum(len(list(d.glob('*.*'))) for d in subdirs)
-        print(f"   Total files: {total_files}")
+        print(f"   Total images: {len(manifest)}")
     else:
         files = list(dataset_path.glob('**/*.*'))
         print(f"   Total files: {len(files)}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Download ISL datasets from Kaggle")
+    parser.add_argument('--ingest', type=int, nargs='*', default=None, metavar='SIZE',
+                        help="Decode the zip into the dataset cache at these sizes instead of "
+                             f"extracting (default: {CACHE_SIZE[0]}, read by every preset)")
+    args = parser.parse_args()
+    if args.ingest == []:
+        args.ingest = [CACHE_SIZE[0]]
+    
     print("=" * 60)
     print("  Indian Sign Language Dataset Downloader")
     print("=" * 60)
@@ -167,11 +199,13 @@ def main():
         # Download both
         success1 = download_dataset(
             DATASETS["1"]["kaggle_id"],
-            DATASETS["1"]["name"]
+            DATASETS["1"]["name"],
+            args.ingest
         )
         success2 = download_dataset(
             DATASETS["2"]["kaggle_id"],
-            DATASETS["2"]["name"]
+            DATASETS["2"]["name"],
+            args.ingest
         )
         
         if success1:
@@ -181,7 +215,7 @@ def main():
     else:
         # Download single dataset
         dataset = DATASETS[choice]
-        success = download_dataset(dataset["kaggle_id"], dataset["name"])
+        success = download_dataset(dataset["kaggle_id"], dataset["name"], args.ingest)
         
         if success:
             show_dataset_info(DATA_DIR / dataset["name"])
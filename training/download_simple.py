@@ -5,6 +5,8 @@ import os
 import sys
 from pathlib import Path
 
+from dataset_manifest import load_manifest
+
 # Add kaggle to path if needed
 try:
     import kaggle
@@ -55,15 +57,15 @@ try:
     print()
     
     # Check what was downloaded
-    if output_dir.exists():
-        subdirs = [d for d in output_dir.iterdir() if d.is_dir()]
-        if subdirs:
-            print(f"📊 Dataset contains {len(subdirs)} gesture classes:")
-            for subdir in subdirs[:10]:
-                num_files = len(list(subdir.glob('*.*')))
-                print(f"   - {subdir.name}: {num_files} files")
-            if len(subdirs) > 10:
-                print(f"   ... and {len(subdirs) - 10} more classes")
+    manifest = load_manifest(output_dir)
+    if manifest is not None:
+        class_names = manifest.class_names
+        if class_names:
+            print(f"📊 Dataset contains {len(class_names)} gesture classes:")
+            for class_name in class_names[:10]:
+                print(f"   - {class_name}: {manifest.count(class_name)} images")
+            if len(class_names) > 10:
+                print(f"   ... and {len(class_names) - 10} more classes")
     
     print()
     print("Next step: Train the model")
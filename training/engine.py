@@ -0,0 +1,1007 @@
+"""
+Training engine for the ISL models
+
+One importable implementation of the training run behind train.py,
+train_quick.py and train_fast.py. A run is described by a config dict built
+from a preset plus overrides:
+
+    full    128x128, batch 64, 30 epochs, 4-block CNN with BatchNorm
+    quick   96x96, batch 128, 20 epochs, 3-block CNN
+    fast    64x64, batch 256, 10 epochs, 2-block CNN
+
+Besides the presets' architectures, 'gap_cnn' and 'separable_cnn'
+(depthwise-separable blocks) end in global average pooling instead of a
+large Flatten -> Dense block, and every architecture takes a 'width'
+multiplier on its filter counts. model_selector.py picks among them for a
+TFLite latency or size budget. Those two can also be trained with
+progressive resizing ('progressive_sizes'): the first epochs run at lower
+resolution with proportionally larger batches.
+
+All presets read the same decoded dataset cache (DATA_PIPELINE 'cache' at
+CACHE_SIZE, resized per batch), so switching presets or sweeping image sizes
+does not decode the dataset again.
+
+From Python:
+    from engine import make_config, train
+    result = train(make_config('fast', epochs=2, model_dir='/tmp/isl'))
+
+With 'distributed' the run is data-parallel across the TF_CONFIG cluster
+(see distributed.py). With 'teacher' the model is distilled from a larger
+trained model (see distillation.py).
+
+Usage:
+    python training/engine.py --preset fast
+    python training/engine.py --preset quick --epochs 5 --result-file result.json
+    python training/engine.py --preset fast --teacher model/teacher/isl_model.h5
+"""
+
+import sys
+import copy
+import contextlib
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau, TensorBoard
+
+import checkpoints
+import cpu_profile
+import distillation
+import distributed
+import throughput
+from data_pipeline import create_pipeline, create_split_generators
+from dataset_cache import CACHE_SIZE, cached_file_lists
+from dataset_manifest import load_manifest
+from splits import ensure_split, list_dataset, split_path_for
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+MODEL_DIR = PROJECT_ROOT / "model"
+LOGS_DIR = PROJECT_ROOT / "training" / "logs"
+SPLIT_FILE = split_path_for(DATA_DIR)
+
+# Settings common to every preset
+DEFAULTS = {
+    'data_dir': DATA_DIR,
+    'model_dir': MODEL_DIR,
+    'logs_dir': LOGS_DIR,
+
+    # Input pipeline: 'cache' (memory-mapped pre-decoded shards, see
+    # dataset_cache.py), 'tfdata' (parallel tf.data), 'tfrecord' (shards from
+    # export_tfrecords.py) or 'generator' (ImageDataGenerator)
+    'data_pipeline': 'cache',
+    'cache_size': CACHE_SIZE,  # Decode cache shared by all presets (dataset_cache.CACHE_SIZE)
+    'cache_dataset': False,  # Keep decoded images in memory after the first epoch (tfdata only)
+    'dedup_clusters': None,  # Clusters file from dedup_index.py to keep near-duplicates in one subset
+    'seed': 42,
+
+    # Persistent train/validation/test split (see splits.py), created on the
+    # first run. None falls back to the per-class split by file order. Unless
+    # overridden, make_config() sets data/splits/<dataset key>.json for data_dir.
+    'split_file': SPLIT_FILE,
+    'validation_split': 0.2,
+    'test_split': 0.1,
+    'fold': None,  # Cross-validation fold to validate on (split file needs --folds)
+
+    'dropout': None,  # (conv block, dense) dropout rates; None keeps the architecture's
+    'width': 1.0,  # Multiplier on the filters/units of every layer but the output
+    'reduce_lr_patience': None,
+    'top_k': None,  # Also report top-k accuracy
+    'tensorboard': False,
+
+    # Without a GPU, probe XLA, bfloat16, thread and batch settings before
+    # training and use the fastest (see cpu_profile.py). Opt-in: the probes
+    # re-run the calling script several times
+    'cpu_profile': False,
+
+    # Full training-state checkpoints every N steps and at each epoch end
+    # (see checkpoints.py); 'resume' continues from the last one
+    'checkpoint_dir': None,  # Default: <model_dir>/checkpoints
+    'checkpoint_steps': 200,
+    'resume': False,
+
+    # Progressive resizing: train the first epochs at these smaller sizes
+    # (e.g. (64, 96) before img_size), the epochs split evenly between the
+    # stages and the batch scaled up with the pixel count. Needs an
+    # architecture that takes any input size (RESIZABLE_ARCHITECTURES).
+    'progressive_sizes': None,
+
+    # MultiWorkerMirroredStrategy across the workers in TF_CONFIG; batch_size
+    # is per worker, the learning rate is scaled by the number of workers
+    'distributed': False,
+
+    # Knowledge distillation (see distillation.py): also train on the
+    # softened outputs of this teacher isl_model.h5 ('cache' pipeline only)
+    'teacher': None,
+    'distill_temperature': 4.0,
+    'distill_alpha': 0.7,  # Weight of the teacher's soft targets in the loss
+}
+
+# Settings that must match for a checkpoint to be resumed
+RESUME_KEYS = ('architecture', 'img_size', 'data_dir', 'data_pipeline', 'cache_size',
+               'split_file', 'fold', 'seed', 'augmentation', 'dropout', 'width', 'teacher',
+               'distill_temperature', 'distill_alpha', 'progressive_sizes')
+
+PRESETS = {
+    # train.py: best quality
+    'full': {
+        'img_size': (128, 128),
+        'batch_size': 64,
+        'epochs': 30,
+        'learning_rate': 0.001,
+        'architecture': 'cnn',
+        'augmentation': {
+            'rotation_range': 20,
+            'width_shift_range': 0.2,
+            'height_shift_range': 0.2,
+            'zoom_range': 0.2,
+            'horizontal_flip': True,
+        },
+        'early_stopping_patience': 10,
+        'reduce_lr_patience': 5,
+        'top_k': 3,
+        'tensorboard': True,
+    },
+    # train_quick.py: smaller images and a simpler model
+    'quick': {
+        'img_size': (96, 96),
+        'batch_size': 128,
+        'epochs': 20,
+        'learning_rate': 0.002,
+        'architecture': 'compact_cnn',
+        'augmentation': {
+            'rotation_range': 15,
+            'width_shift_range': 0.15,
+            'height_shift_range': 0.15,
+            'horizontal_flip': True,
+        },
+        'early_stopping_patience': 5,
+    },
+    # train_fast.py: quick results with decent accuracy
+    'fast': {
+        'img_size': (64, 64),
+        'batch_size': 256,
+        'epochs': 10,
+        'learning_rate': 0.001,
+        'architecture': 'tiny_cnn',
+        'augmentation': {
+            'rotation_range': 10,
+            'width_shift_range': 0.1,
+            'height_shift_range': 0.1,
+        },
+        'early_stopping_patience': 3,
+    },
+}
+
+
+def scaled(filters, width):
+    """Filter count times a width multiplier, at least 8"""
+    return max(8, int(round(filters * width)))
+
+
+def build_cnn(input_shape, num_classes, dropout=(0.25, 0.5), width=1.0):
+    """4-block CNN with BatchNorm (full preset)"""
+    return keras.Sequential([
+        # First convolutional block
+        layers.Conv2D(scaled(32, width), (3, 3), activation='relu', input_shape=input_shape),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(dropout[0]),
+
+        # Second convolutional block
+        layers.Conv2D(scaled(64, width), (3, 3), activation='relu'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(dropout[0]),
+
+        # Third convolutional block
+        layers.Conv2D(scaled(128, width), (3, 3), activation='relu'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(dropout[0]),
+
+        # Fourth convolutional block
+        layers.Conv2D(scaled(256, width), (3, 3), activation='relu'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(dropout[0]),
+
+        # Flatten and dense layers
+        layers.Flatten(),
+        layers.Dense(scaled(512, width), activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(dropout[1]),
+        layers.Dense(scaled(256, width), activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(dropout[1]),
+        # Softmax and loss stay in float32 under mixed precision
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ])
+
+
+def build_compact_cnn(input_shape, num_classes, dropout=(0.25, 0.5), width=1.0):
+    """Simplified 3-block CNN - faster to train (quick preset)"""
+    return keras.Sequential([
+        layers.Conv2D(scaled(32, width), 3, activation='relu', input_shape=input_shape),
+        layers.MaxPooling2D(2),
+        layers.Dropout(dropout[0]),
+
+        layers.Conv2D(scaled(64, width), 3, activation='relu'),
+        layers.MaxPooling2D(2),
+        layers.Dropout(dropout[0]),
+
+        layers.Conv2D(scaled(128, width), 3, activation='relu'),
+        layers.MaxPooling2D(2),
+        layers.Dropout(dropout[0]),
+
+        layers.Flatten(),
+        layers.Dense(scaled(256, width), activation='relu'),
+        layers.Dropout(dropout[1]),
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ])
+
+
+def build_tiny_cnn(input_shape, num_classes, dropout=(0.25, 0.5), width=1.0):
+    """Ultra-lightweight 2-block CNN (fast preset)"""
+    return keras.Sequential([
+        layers.Conv2D(scaled(32, width), 3, activation='relu', input_shape=input_shape),
+        layers.MaxPooling2D(2),
+        layers.Dropout(dropout[0]),
+
+        layers.Conv2D(scaled(64, width), 3, activation='relu'),
+        layers.MaxPooling2D(2),
+        layers.Dropout(dropout[0]),
+
+        layers.Flatten(),
+        layers.Dense(scaled(128, width), activation='relu'),
+        layers.Dropout(dropout[1]),
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ])
+
+
+# Faster-moving BatchNorm statistics for the GAP architectures: their short
+# runs (fast preset, progressive resizing stages with large batches) take too
+# few steps for the default 0.99 to settle, and validate at chance
+BN_MOMENTUM = 0.9
+
+
+def build_gap_cnn(input_shape, num_classes, dropout=(0.1, 0.3), width=1.0):
+    """3-block CNN with BatchNorm and a global-average-pooling head"""
+    model = keras.Sequential([keras.Input(input_shape)])
+    for filters in (32, 64, 128):
+        model.add(layers.Conv2D(scaled(filters, width), 3, padding='same', use_bias=False))
+        model.add(layers.BatchNormalization(momentum=BN_MOMENTUM))
+        model.add(layers.ReLU())
+        model.add(layers.MaxPooling2D(2))
+        model.add(layers.Dropout(dropout[0]))
+
+    # Averaging the last feature map replaces the Flatten -> Dense(512) weights
+    model.add(layers.GlobalAveragePooling2D())
+    model.add(layers.Dropout(dropout[1]))
+    model.add(layers.Dense(num_classes, activation='softmax', dtype='float32'))
+    return model
+
+
+def build_separable_cnn(input_shape, num_classes, dropout=(0.1, 0.3), width=1.0):
+    """MobileNet-style CNN: strided stem, depthwise-separable blocks, global-average-pooling head"""
+    model = keras.Sequential([
+        keras.Input(input_shape),
+        layers.Conv2D(scaled(32, width), 3, strides=2, padding='same', use_bias=False),
+        layers.BatchNormalization(momentum=BN_MOMENTUM),
+        layers.ReLU(),
+    ])
+    # (filters, stride): each separable block costs about 1/9 of a full 3x3 convolution
+    for filters, stride in ((64, 1), (128, 2), (128, 1), (256, 2), (256, 1)):
+        model.add(layers.SeparableConv2D(scaled(filters, width), 3, strides=stride, padding='same',
+                                         use_bias=False))
+        model.add(layers.BatchNormalization(momentum=BN_MOMENTUM))
+        model.add(layers.ReLU())
+    model.add(layers.Dropout(dropout[0]))
+
+    model.add(layers.GlobalAveragePooling2D())
+    model.add(layers.Dropout(dropout[1]))
+    model.add(layers.Dense(num_classes, activation='softmax', dtype='float32'))
+    return model
+
+
+ARCHITECTURES = {
+    'cnn': build_cnn,
+    'compact_cnn': build_compact_cnn,
+    'tiny_cnn': build_tiny_cnn,
+    'gap_cnn': build_gap_cnn,
+    'separable_cnn': build_separable_cnn,
+}
+
+# Architectures without a Flatten layer, whose weights fit any input size
+RESIZABLE_ARCHITECTURES = ('gap_cnn', 'separable_cnn')
+
+# Largest batch of a low-resolution progressive resizing stage
+MAX_STAGE_BATCH_SIZE = 1024
+
+
+def make_config(preset='full', **overrides):
+    """Config dict for a preset, with any keys overridden"""
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset {preset!r}; choose from {', '.join(PRESETS)}")
+    config = copy.deepcopy({**DEFAULTS, **PRESETS[preset], 'preset': preset})
+    unknown = set(overrides) - set(config)
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(sorted(unknown))}")
+    config.update(overrides)
+    if 'split_file' not in overrides:
+        # Each dataset has its own split file
+        config['split_file'] = split_path_for(config['data_dir'])
+    for key in ('data_dir', 'model_dir', 'logs_dir', 'checkpoint_dir', 'split_file', 'teacher'):
+        if config[key] is not None:
+            config[key] = Path(config[key])
+    config['img_size'] = tuple(config['img_size'])
+    return config
+
+
+def build_model(config, num_classes):
+    """Uncompiled model for config['architecture']"""
+    if config['architecture'] not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture: {config['architecture']!r}")
+    options = {'dropout': tuple(config['dropout'])} if config['dropout'] else {}
+    return ARCHITECTURES[config['architecture']]((*config['img_size'], 3), num_classes,
+                                                 width=config['width'], **options)
+
+
+def progressive_stages(config, batch_size):
+    """Training stages as dicts of img_size, batch_size, first_epoch and last_epoch
+
+    A single stage at img_size without progressive resizing. Earlier
+    stages get the batch scaled by the pixel ratio to img_size.
+    """
+    sizes = [tuple(size) if isinstance(size, (list, tuple)) else (size, size)
+             for size in config['progressive_sizes'] or ()]
+    if sizes and config['architecture'] not in RESIZABLE_ARCHITECTURES:
+        raise ValueError(f"Progressive resizing needs one of {', '.join(RESIZABLE_ARCHITECTURES)}, "
+                         f"not {config['architecture']!r}")
+    sizes.append(config['img_size'])
+    if len(sizes) > config['epochs']:
+        raise ValueError(f"{len(sizes)} progressive resizing stages need at least as many epochs")
+
+    target_pixels = config['img_size'][0] * config['img_size'][1]
+    epochs_per_stage = config['epochs'] // len(sizes)
+    stages = []
+    for i, size in enumerate(sizes):
+        final = i == len(sizes) - 1
+        stages.append({
+            'img_size': size,
+            'batch_size': batch_size if final else min(
+                MAX_STAGE_BATCH_SIZE, max(batch_size, batch_size * target_pixels // (size[0] * size[1]))),
+            'first_epoch': i * epochs_per_stage,
+            'last_epoch': config['epochs'] if final else (i + 1) * epochs_per_stage,
+        })
+    return stages
+
+
+def cache_size_for(config):
+    """Decode cache size to read: the shared one, unless the images are larger"""
+    cache_size = tuple(config['cache_size'] or config['img_size'])
+    if any(i > c for i, c in zip(config['img_size'], cache_size)):
+        return config['img_size']
+    return cache_size
+
+
+def check_data_directory(config):
+    """Check if data directory exists and contains data"""
+    data_dir = config['data_dir']
+    if not data_dir.exists():
+        # Images streamed from a zip by ingest_zip.py only exist in the cache
+        if config['data_pipeline'] == 'cache' and cached_file_lists(data_dir):
+            print(f"✓ Using the decoded cache ingested for {data_dir.name}")
+            return True
+        print(f"✗ Data directory not found: {data_dir}")
+        print("\nPlease download the dataset first:")
+        print("  python training/download_dataset.py")
+        return False
+
+    # Check for subdirectories (gesture classes)
+    manifest = load_manifest(data_dir)
+    class_names = manifest.class_names
+    if not class_names:
+        print(f"✗ No gesture classes found in {data_dir}")
+        return False
+
+    print(f"✓ Found {len(class_names)} gesture classes ({len(manifest)} images)")
+    print(f"  Classes: {', '.join(class_names[:5])}")
+    if len(class_names) > 5:
+        print(f"  ... and {len(class_names) - 5} more")
+
+    return True
+
+
+def load_data(config, batch_size, shard=None):
+    """Create (train_data, val_data, info) for config['data_pipeline']
+
+    `shard` = (num_workers, index) loads this worker's share of the
+    training set (tf.data pipelines only). With config['teacher'] the
+    targets are [one-hot label, teacher logits].
+    """
+    if shard and config['data_pipeline'] == 'generator':
+        raise ValueError("Distributed training needs a tf.data pipeline, not 'generator'")
+    soft_targets = None
+    if config['teacher']:
+        if config['data_pipeline'] != 'cache':
+            raise ValueError(f"Distillation needs the 'cache' pipeline, not {config['data_pipeline']!r}")
+        print(f"\n🎓 Teacher logits from {config['teacher']}...")
+        soft_targets = distillation.teacher_logits(config['teacher'], config['data_dir'],
+                                                   config['cache_size'] or CACHE_SIZE)
+    if config['data_pipeline'] != 'generator':
+        print("\n📊 Creating tf.data pipeline...")
+        train_data, val_data, info = create_pipeline(
+            config['data_pipeline'],
+            config['data_dir'],
+            img_size=config['img_size'],
+            batch_size=batch_size,
+            validation_split=config['validation_split'],
+            augmentation=config['augmentation'],
+            cache=config['cache_dataset'],
+            clusters_file=config['dedup_clusters'],
+            split_file=config['split_file'],
+            test_split=config['test_split'],
+            fold=config['fold'],
+            seed=config['seed'],
+            cache_size=cache_size_for(config) if config['data_pipeline'] == 'cache' else None,
+            shard=shard,
+            soft_targets=soft_targets
+        )
+    else:
+        print("\n📊 Creating data generators...")
+        train_datagen = ImageDataGenerator(
+            validation_split=config['validation_split'],
+            rescale=1./255,
+            fill_mode='nearest',
+            **config['augmentation']
+        )
+        val_datagen = ImageDataGenerator(validation_split=config['validation_split'], rescale=1./255)
+
+        if config['split_file']:
+            # Both subsets come from the split file, no directory scan
+            split = ensure_split(
+                config['split_file'],
+                config['data_dir'],
+                validation_split=config['validation_split'],
+                test_split=config['test_split'],
+                seed=config['seed'],
+                clusters_file=config['dedup_clusters']
+            )
+            train_data, val_data = create_split_generators(
+                split, config['data_dir'], train_datagen, val_datagen,
+                config['img_size'], batch_size, fold=config['fold']
+            )
+        else:
+            train_data, val_data = (
+                datagen.flow_from_directory(
+                    config['data_dir'],
+                    target_size=config['img_size'],
+                    batch_size=batch_size,
+                    class_mode='categorical',
+                    subset=subset,
+                    shuffle=subset == 'training'
+                )
+                for datagen, subset in ((train_datagen, 'training'), (val_datagen, 'validation'))
+            )
+        info = {
+            'class_indices': train_data.class_indices,
+            'num_classes': len(train_data.class_indices),
+            'train_samples': train_data.samples,
+            'val_samples': val_data.samples,
+            'steps_per_epoch': len(train_data),
+        }
+
+    print(f"✓ Training samples: {info['train_samples']}")
+    print(f"✓ Validation samples: {info['val_samples']}")
+    if 'test_samples' in info:
+        print(f"✓ Held-out test samples: {info['test_samples']}")
+    print(f"✓ Number of classes: {info['num_classes']}")
+
+    return train_data, val_data, info
+
+
+def compile_model(model, config, profile, learning_rate=None):
+    """Compile with the config's optimizer settings and the CPU profile"""
+    loss = 'categorical_crossentropy'
+    metrics = ['accuracy']
+    if config['top_k']:
+        k = config['top_k']
+        metrics.append(keras.metrics.TopKCategoricalAccuracy(k=k, name=f'top_{k}_accuracy'))
+    if config['teacher']:
+        num_classes = model.output_shape[-1]
+        loss = distillation.DistillationLoss(num_classes, config['distill_temperature'],
+                                             config['distill_alpha'])
+        metrics = distillation.label_metrics(num_classes, config['top_k'])
+    model.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=learning_rate or config['learning_rate']),
+        loss=loss,
+        metrics=metrics,
+        **cpu_profile.compile_options(profile)
+    )
+    return model
+
+
+def create_callbacks(config, chief=True):
+    """Create training callbacks (the ones writing files only on the chief)"""
+    callbacks = [
+        # Early stopping
+        EarlyStopping(
+            monitor='val_loss',
+            patience=config['early_stopping_patience'],
+            restore_best_weights=True,
+            verbose=1
+        ),
+    ]
+
+    if chief:
+        # Save best model
+        config['model_dir'].mkdir(parents=True, exist_ok=True)
+        callbacks.insert(0, ModelCheckpoint(
+            filepath=config['model_dir'] / 'isl_model_best.h5',
+            monitor='val_accuracy',
+            save_best_only=True,
+            mode='max',
+            verbose=1
+        ))
+
+    if config['reduce_lr_patience']:
+        callbacks.append(ReduceLROnPlateau(
+            monitor='val_loss',
+            factor=0.5,
+            patience=config['reduce_lr_patience'],
+            min_lr=1e-7,
+            verbose=1
+        ))
+
+    if config['tensorboard'] and chief:
+        config['logs_dir'].mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        callbacks.append(TensorBoard(
+            log_dir=config['logs_dir'] / f'run_{timestamp}',
+            histogram_freq=1,
+            write_graph=True
+        ))
+
+    return callbacks
+
+
+def jsonable(value):
+    """Config values with paths and tuples made JSON-friendly"""
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, Path):
+        return str(value)
+    return value
+
+
+def save_model_and_metadata(config, model, class_indices, result):
+    """Save final model, labels, history and model_config.json"""
+
+    print("\n💾 Saving model...")
+    model_dir = config['model_dir']
+
+    # Save final model (float32 weights and compute, even after bfloat16 training).
+    # A distilled model is saved without its loss, so it loads like any other
+    model_path = model_dir / 'isl_model.h5'
+    cpu_profile.float32_model(model).save(model_path, include_optimizer=not config['teacher'])
+    print(f"✓ Model saved: {model_path}")
+
+    # Save class labels
+    labels = {v: k for k, v in class_indices.items()}
+    labels_path = model_dir / 'labels.json'
+    with open(labels_path, 'w') as f:
+        json.dump(labels, f, indent=2)
+    print(f"✓ Labels saved: {labels_path}")
+
+    # Save training history
+    history_path = model_dir / 'training_history.json'
+    history = result['history']
+    if result['stages']:
+        history = {**history, 'stages': result['stages']}
+    with open(history_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"✓ Training history saved: {history_path}")
+
+    # Save per-epoch throughput (see throughput.py)
+    throughput_path = model_dir / 'throughput.json'
+    with open(throughput_path, 'w') as f:
+        json.dump(result['throughput'], f, indent=2)
+    print(f"✓ Throughput saved: {throughput_path}")
+
+    # Save model configuration
+    config_path = model_dir / 'model_config.json'
+    config_dict = {
+        'img_size': config['img_size'],
+        'num_classes': len(labels),
+        'class_names': list(labels.values()),
+        'preset': config['preset'],
+        'architecture': config['architecture'],
+        'width': config['width'],
+        'data_dir': str(config['data_dir']),
+        'trained_on': datetime.now().isoformat(),
+        'epochs_trained': result['epochs_trained'],
+        'training_time_minutes': round(result['training_time_seconds'] / 60, 2),
+        'final_accuracy': result['final_accuracy'],
+        'final_val_accuracy': result['final_val_accuracy'],
+    }
+    if result['cpu_profile']:
+        config_dict['cpu_profile'] = result['cpu_profile']
+    if result['distributed']:
+        config_dict['distributed'] = result['distributed']
+    if result['stages']:
+        config_dict['progressive_resizing'] = result['stages']
+    if config['teacher']:
+        config_dict['distillation'] = {
+            'teacher': str(config['teacher']),
+            'temperature': config['distill_temperature'],
+            'alpha': config['distill_alpha'],
+        }
+    with open(config_path, 'w') as f:
+        json.dump(config_dict, f, indent=2)
+    print(f"✓ Model config saved: {config_path}")
+
+    return model_path
+
+
+def train(config, callbacks=()):
+    """Run one training job described by a config from make_config()
+
+    Returns a JSON-serializable result dict: sample counts, per-epoch
+    history, final and evaluated validation metrics, wall time, the CPU
+    profile used and the saved model path. Raises FileNotFoundError if
+    there is no dataset and checkpoints.TrainingPreempted if stopped by
+    a signal; run again with 'resume': True to continue.
+
+    The CPU profile ('cpu_profile': True) probes by re-running the calling
+    script (see cpu_profile.py), so only enable it in a script that runs
+    one config per process.
+    Distributed runs skip it and must be started in a fresh process on
+    every worker; only the chief saves files ('model_path' is None on the
+    others). Extra Keras `callbacks` (e.g. a pruner setting
+    model.stop_training) run after the built-in ones.
+    """
+    config = make_config(config.get('preset', 'full'), **{k: v for k, v in config.items() if k != 'preset'})
+
+    print("="*60)
+    print(f"  ISL Model Training ({config['preset']} preset)")
+    print("="*60)
+
+    # The cluster must be joined before TensorFlow runs any op
+    strategy = distributed.create_strategy() if config['distributed'] else None
+    num_workers, worker_index = distributed.worker_info() if strategy else (1, 0)
+    chief = worker_index == 0
+    if strategy:
+        print(f"\n🌐 Worker {worker_index} of {num_workers} (MultiWorkerMirroredStrategy)")
+
+    # Check if GPU is available
+    gpus = tf.config.list_physical_devices('GPU')
+    if gpus:
+        print(f"\n✓ GPU available: {len(gpus)} device(s)")
+        for gpu in gpus:
+            print(f"  - {gpu.name}")
+    else:
+        print("\n⚠ No GPU detected - training will use CPU (slower)")
+
+    # Only the chief refreshes the manifest; the other workers check it after the barrier
+    if chief and not check_data_directory(config):
+        raise FileNotFoundError(f"No dataset found in {config['data_dir']}")
+
+    # Pick CPU settings before TensorFlow runs any op
+    profile_enabled = config['cpu_profile'] and not strategy
+    profile = cpu_profile.setup(
+        lambda num_classes: build_model(config, num_classes),
+        config['img_size'],
+        config['batch_size'],
+        len(list_dataset(config['data_dir']) or {}) if profile_enabled else 0,
+        enabled=profile_enabled,
+        tag=config['architecture'] if config['width'] == 1.0 else f"{config['architecture']}x{config['width']}"
+    )
+    batch_size = profile['batch_size']
+
+    checkpoint_dir = config['checkpoint_dir'] or config['model_dir'] / 'checkpoints'
+    settings = jsonable({**{key: config[key] for key in RESUME_KEYS}, 'num_workers': num_workers})
+    state = checkpoints.load_state(checkpoint_dir) if config['resume'] else None
+    if state is not None:
+        if state['settings'] != settings:
+            changed = [key for key in settings if state['settings'].get(key) != settings[key]]
+            raise ValueError(f"Checkpoint in {checkpoint_dir} was saved with different settings: "
+                             f"{', '.join(changed)}")
+        # The data position is counted in batches of the original size
+        batch_size = state['batch_size']
+    else:
+        if config['resume']:
+            print(f"⚠ No checkpoint in {checkpoint_dir}, starting from scratch")
+        if chief:
+            checkpoints.clear(checkpoint_dir)
+
+    # Linear scaling rule: the global batch grows with the workers, and with
+    # a batch size picked by the CPU profile
+    learning_rate = config['learning_rate'] * num_workers * batch_size / config['batch_size']
+
+    print(f"\nSettings:")
+    print(f"  Image Size: {config['img_size']}")
+    print(f"  Batch Size: {batch_size}" + (f" per worker, {batch_size * num_workers} global" if strategy else ""))
+    print(f"  Epochs: {config['epochs']}")
+    print(f"  Model: {config['architecture']}" + (f" (width {config['width']})" if config['width'] != 1.0 else ""))
+    if config['teacher']:
+        print(f"  Teacher: {config['teacher']} (T={config['distill_temperature']}, "
+              f"alpha={config['distill_alpha']})")
+
+    stages = progressive_stages(config, batch_size)
+    if len(stages) > 1:
+        if config['data_pipeline'] == 'generator':
+            raise ValueError("Progressive resizing needs a tf.data pipeline, not 'generator'")
+        print("  Progressive resizing: " + ", ".join(
+            f"{stage['img_size'][0]}px x {stage['last_epoch'] - stage['first_epoch']} epochs "
+            f"(batch {stage['batch_size']})" for stage in stages))
+
+    # Other workers wait for the manifest, split file and decode cache the chief prepares
+    if not chief:
+        distributed.barrier(strategy)
+        if not check_data_directory(config):
+            raise FileNotFoundError(f"No dataset found in {config['data_dir']}")
+    # One pipeline per stage, batched for it; the last one is at img_size
+    stage_data = [
+        load_data({**config, 'img_size': stage['img_size']}, stage['batch_size'],
+                  shard=(num_workers, worker_index) if strategy else None)
+        for stage in stages
+    ]
+    train_data, val_data, info = stage_data[-1]
+    if strategy and chief:
+        distributed.barrier(strategy)
+
+    print("\n🏗️  Building model...")
+    keras.utils.set_random_seed(config['seed'])  # Weight init and dropout
+    scope = strategy.scope() if strategy else contextlib.nullcontext()
+    with scope:
+        # Stages share the weights, so the model takes any input size
+        model_config = {**config, 'img_size': (None, None)} if len(stages) > 1 else config
+        model = compile_model(build_model(model_config, info['num_classes']), config, profile, learning_rate)
+    if strategy:
+        distributed.prepare_model(model, strategy, stage_data[0][0].element_spec)
+    model.summary()
+
+    extra_callbacks = list(callbacks)
+    callbacks = create_callbacks(config, chief)
+    tensorboard = next((c for c in callbacks if isinstance(c, TensorBoard)), None)
+    monitor = throughput.ThroughputMonitor(
+        config['epochs'], log_dir=Path(tensorboard.log_dir) / 'throughput' if tensorboard else None,
+        records=state.get('throughput', []) if state else None
+    )
+    callbacks.append(monitor)
+
+    # Last, so it can put back the other callbacks' saved state. Stage and
+    # throughput records are saved with it, to carry them across a resume
+    stage_times = state.get('stages', []) if state else []
+    checkpoint = checkpoints.TrainingCheckpoint(
+        checkpoint_dir, batch_size, config['checkpoint_steps'], callbacks=callbacks,
+        meta={'settings': settings, 'stages': stage_times, 'throughput': monitor.records},
+        write=chief, handle_signals=not strategy
+    )
+    if state is not None:
+        with scope:
+            checkpoint.restore(model)
+        print(f"\n↻ Resuming from epoch {checkpoint.epoch + 1}, step {checkpoint.step} ({checkpoint_dir})")
+    callbacks += [checkpoint] + extra_callbacks
+    resumed_from = {'epoch': checkpoint.epoch, 'step': checkpoint.step} if state else None
+
+    print("\n🚀 Starting training...")
+    print(f"   Steps per epoch: {info['steps_per_epoch']}")
+    print(f"   Learning rate: {learning_rate}")
+    if 'probe_step_time_ms' in profile:
+        estimate = info['steps_per_epoch'] * config['epochs'] * profile['probe_step_time_ms'] / 60000
+        print(f"   Estimated time: ~{int(estimate)} minutes (without early stopping)")
+
+    if strategy:
+        # Validation batches are split between the workers, metrics all-reduced
+        options = tf.data.Options()
+        options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+        stage_data = [(train, val.with_options(options), stage_info) for train, val, stage_info in stage_data]
+        val_data = stage_data[-1][1]
+
+    def feed(dataset):
+        """Each worker already reads its own shard, in per-worker batches"""
+        if strategy is None:
+            return dataset
+        return strategy.distribute_datasets_from_function(lambda context: dataset)
+
+    for i, (stage, (stage_train, stage_val, stage_info)) in enumerate(zip(stages, stage_data)):
+        if checkpoint.epoch >= stage['last_epoch'] or model.stop_training:
+            continue
+        final = i == len(stages) - 1
+        if len(stages) > 1:
+            print(f"\n📐 Stage {i + 1}/{len(stages)}: {stage['img_size'][0]}x{stage['img_size'][1]}, "
+                  f"batch {stage['batch_size']}, epochs {checkpoint.epoch + 1}-{stage['last_epoch']}")
+        # Early stopping, LR schedule and best-model saving judge the final size only
+        stage_callbacks = callbacks if final else [monitor, checkpoint] + extra_callbacks
+        # Compute is timed on a copy of the model, which a strategy cannot run
+        is_dataset = isinstance(stage_train, tf.data.Dataset)
+        monitor.set_input(stage['batch_size'], stage['img_size'],
+                          stage_train.element_spec if is_dataset and not strategy else None)
+        fit_kwargs = dict(validation_data=stage_val, callbacks=stage_callbacks, verbose=1)
+        steps = stage_info['steps_per_epoch']
+        initial_epoch = checkpoint.epoch
+        started = time.perf_counter()
+        if is_dataset:
+            # One pass of the dataset per epoch, read by a single iterator, so
+            # epoch e always gets the e-th shuffle and augmentation draws
+            checkpoints.fast_forward(stage_train, initial_epoch - stage['first_epoch'])
+            stream = stage_train.repeat()
+            if checkpoint.step:
+                # Finish the interrupted epoch without the batches already trained on
+                model.fit(feed(stream.skip(checkpoint.step)), steps_per_epoch=steps - checkpoint.step,
+                          epochs=initial_epoch + 1, initial_epoch=initial_epoch, **fit_kwargs)
+                initial_epoch += 1
+            if initial_epoch < stage['last_epoch'] and not model.stop_training:
+                model.fit(feed(stream), steps_per_epoch=steps, epochs=stage['last_epoch'],
+                          initial_epoch=initial_epoch, **fit_kwargs)
+        else:
+            # Generators cannot be positioned; redo the interrupted epoch
+            checkpoint.step = 0
+            model.fit(stage_train, epochs=stage['last_epoch'], initial_epoch=initial_epoch, **fit_kwargs)
+
+        if len(stages) > 1:
+            timing = next((t for t in stage_times if t['img_size'] == list(stage['img_size'])), None)
+            if timing is None:
+                timing = {'img_size': list(stage['img_size']), 'batch_size': stage['batch_size'],
+                          'epochs': 0, 'time_seconds': 0.0}
+                stage_times.append(timing)
+            timing['epochs'] = checkpoint.epoch - stage['first_epoch']
+            timing['time_seconds'] = round(timing['time_seconds'] + time.perf_counter() - started, 2)
+    training_time = checkpoint.training_time
+
+    # Evaluate the final (best restored) weights on the validation set
+    print("\n📈 Evaluating model...")
+    evaluation = model.evaluate(val_data, verbose=1, return_dict=True)
+
+    history_dict = checkpoint.history
+    result = {
+        'preset': config['preset'],
+        'config': jsonable(config),
+        'class_indices': info['class_indices'],
+        'num_classes': info['num_classes'],
+        'train_samples': info['train_samples'],
+        'val_samples': info['val_samples'],
+        'batch_size': batch_size,
+        'steps_per_epoch': info['steps_per_epoch'],
+        'epochs_trained': len(history_dict['accuracy']),
+        'history': history_dict,
+        'final_accuracy': history_dict['accuracy'][-1],
+        'final_val_accuracy': history_dict['val_accuracy'][-1],
+        'best_val_accuracy': max(history_dict['val_accuracy']),
+        'evaluation': {k: float(v) for k, v in evaluation.items()},
+        'training_time_seconds': round(training_time, 2),
+        'resumed_from': resumed_from,
+        'cpu_profile': cpu_profile.profile_report(profile, monitor) if profile['enabled'] else None,
+        'throughput': monitor.records,
+        'distributed': None,
+        'stages': stage_times or None,
+    }
+    if strategy:
+        global_batch = batch_size * num_workers
+        result['distributed'] = {
+            'num_workers': num_workers,
+            'global_batch_size': global_batch,
+            'learning_rate': learning_rate,
+            'step_time_ms': monitor.step_time_ms,
+            'images_per_second': (round(1000 * global_batch / monitor.step_time_ms, 1)
+                                  if monitor.step_time_ms else None),
+        }
+
+    print(f"\n{'='*60}")
+    print("Final Evaluation Results:")
+    print(f"{'='*60}")
+    for name, value in result['evaluation'].items():
+        print(f"  {name}: {value:.4f}")
+    print(f"  Training time: {training_time / 60:.1f} minutes")
+    print(f"{'='*60}")
+
+    result['model_path'] = None
+    if chief:
+        if len(stages) > 1:
+            # Saved with the fixed img_size input the app and TFLite expect
+            fixed_model = build_model(config, info['num_classes'])
+            fixed_model.set_weights(model.get_weights())
+            model = fixed_model
+        model_path = save_model_and_metadata(config, model, info['class_indices'], result)
+        result['model_path'] = str(model_path)
+
+        # The run is complete; its checkpoints must not be resumed
+        checkpoints.clear(checkpoint_dir)
+    return result
+
+
+def main(default_preset='full'):
+    parser = argparse.ArgumentParser(description="Train the ISL gesture recognition model")
+    parser.add_argument('--preset', choices=list(PRESETS), default=default_preset)
+    parser.add_argument('--epochs', type=int)
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--img-size', type=int, help="Square input size")
+    parser.add_argument('--learning-rate', type=float)
+    parser.add_argument('--architecture', choices=list(ARCHITECTURES))
+    parser.add_argument('--width', type=float, help="Multiplier on the layer widths")
+    parser.add_argument('--progressive', type=int, nargs='+', metavar='SIZE',
+                        help="Train the first epochs at these smaller square sizes")
+    parser.add_argument('--data-pipeline', choices=['cache', 'tfdata', 'tfrecord', 'generator'])
+    parser.add_argument('--cache-size', type=int, help="Square size of the shared decode cache")
+    parser.add_argument('--data-dir')
+    parser.add_argument('--model-dir')
+    parser.add_argument('--fold', type=int)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--cpu-profile', action='store_true',
+                        help="Probe XLA, bfloat16, thread and batch settings first (re-runs this script)")
+    parser.add_argument('--resume', action='store_true', help="Continue from the last checkpoint")
+    parser.add_argument('--checkpoint-steps', type=int, help="Steps between training-state checkpoints")
+    parser.add_argument('--distributed', action='store_true',
+                        help="Data-parallel across the TF_CONFIG workers (see distributed.py)")
+    parser.add_argument('--teacher', help="Distill from this trained isl_model.h5 (see distillation.py)")
+    parser.add_argument('--distill-temperature', type=float)
+    parser.add_argument('--distill-alpha', type=float, help="Weight of the teacher's soft targets")
+    parser.add_argument('--result-file', help="Write the result dict to this JSON file")
+    args = parser.parse_args()
+
+    overrides = {
+        'epochs': args.epochs,
+        'batch_size': args.batch_size,
+        'img_size': (args.img_size, args.img_size) if args.img_size else None,
+        'learning_rate': args.learning_rate,
+        'architecture': args.architecture,
+        'width': args.width,
+        'progressive_sizes': args.progressive,
+        'data_pipeline': args.data_pipeline,
+        'cache_size': (args.cache_size, args.cache_size) if args.cache_size else None,
+        'data_dir': args.data_dir,
+        'model_dir': args.model_dir,
+        'fold': args.fold,
+        'seed': args.seed,
+        'cpu_profile': args.cpu_profile or None,
+        'resume': args.resume or None,
+        'checkpoint_steps': args.checkpoint_steps,
+        'distributed': args.distributed or None,
+        'teacher': args.teacher,
+        'distill_temperature': args.distill_temperature,
+        'distill_alpha': args.distill_alpha,
+    }
+    config = make_config(args.preset, **{k: v for k, v in overrides.items() if v is not None})
+
+    try:
+        result = train(config)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    except checkpoints.TrainingPreempted as e:
+        print(f"\n\n⚠ Training interrupted: {e}")
+        print(f"   Continue with: python {sys.argv[0]} {' '.join(sys.argv[1:] + ['--resume'] * (not args.resume))}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\n⚠ Training interrupted!")
+        print("   Continue from the last checkpoint with --resume")
+        sys.exit(1)
+
+    if args.result_file and distributed.is_chief():
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"✓ Result saved: {args.result_file}")
+
+    print("\n" + "="*60)
+    print("✓ Training Complete!")
+    print("="*60)
+    print("\nNext steps:")
+    if config['tensorboard']:
+        print("  - Review training logs: tensorboard --logdir training/logs")
+    print("  1. Convert to TFLite: python training/convert_to_tflite.py")
+    print("  2. Test model: python training/test_model.py")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
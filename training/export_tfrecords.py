@@ -0,0 +1,186 @@
+"""
+Export the ISL dataset to sharded, compressed TFRecord files
+
+Writes every image as pre-resized uint8 pixels together with its class label
+and original path into N GZIP-compressed shards per subset:
+
+    data/tfrecords/<dataset key>/<H>x<W>/train-00000-of-00008.tfrecord.gz
+    data/tfrecords/<dataset key>/<H>x<W>/validation-00000-of-00008.tfrecord.gz
+    data/tfrecords/<dataset key>/<H>x<W>/test-00000-of-00008.tfrecord.gz
+    data/tfrecords/<dataset key>/<H>x<W>/dataset_info.json
+
+Training and evaluation then stream a handful of large files with interleaved
+parallel reads instead of opening thousands of small JPEGs, which is what
+dominates on network-mounted and container volumes.
+
+Usage:
+    python training/export_tfrecords.py --img-size 64 --shards 8
+    python training/export_tfrecords.py --data-dir data/indian-sign-language-isl
+"""
+
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from dataset_cache import load_cache
+from dataset_manifest import dataset_key
+from data_pipeline import split_indices
+from dedup_index import load_cluster_groups
+from splits import ensure_split, split_files, split_path_for
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+TFRECORD_ROOT = PROJECT_ROOT / "data" / "tfrecords"
+
+INFO_FILE = 'dataset_info.json'
+COMPRESSION = 'GZIP'
+SUBSETS = ('train', 'validation', 'test')
+
+
+def tfrecord_dir_for(data_dir, img_size):
+    """Output directory for a dataset at a given target size"""
+    return TFRECORD_ROOT / dataset_key(data_dir) / f"{img_size[0]}x{img_size[1]}"
+
+
+def shard_name(subset, shard, num_shards):
+    return f"{subset}-{shard:05d}-of-{num_shards:05d}.tfrecord.gz"
+
+
+def make_example(pixels, label, path):
+    """Serialize one pre-resized image as a tf.train.Example"""
+    height, width, channels = pixels.shape
+    feature = {
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[pixels.tobytes()])),
+        'height': tf.train.Feature(int64_list=tf.train.Int64List(value=[height])),
+        'width': tf.train.Feature(int64_list=tf.train.Int64List(value=[width])),
+        'channels': tf.train.Feature(int64_list=tf.train.Int64List(value=[channels])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)])),
+        'path': tf.train.Feature(bytes_list=tf.train.BytesList(value=[path.encode('utf-8')])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+
+def write_shard(output_path, indices, images, labels, paths):
+    """Write the given sample indices into one compressed shard"""
+    options = tf.io.TFRecordOptions(compression_type=COMPRESSION)
+    with tf.io.TFRecordWriter(str(output_path), options=options) as writer:
+        for i in indices:
+            writer.write(make_example(np.asarray(images[i]), labels[i], paths[i]))
+    return len(indices)
+
+
+def export_tfrecords(data_dir=DATA_DIR, img_size=(64, 64), num_shards=8,
+                     validation_split=0.2, seed=42, output_dir=None, workers=None,
+                     clusters_file=None, split_file=None, no_split=False):
+    """Export data_dir into train/validation TFRecord shards
+
+    Pixels come from the decoded dataset cache (built on demand), so images
+    are decoded at most once. Samples are shuffled across shards so every
+    shard holds a mix of classes. The train/validation/test subsets come
+    from `split_file` (see splits.py; default: data_dir's own split file,
+    as the engine uses). With `no_split` the flow_from_directory split is
+    used instead, and `clusters_file` (from dedup_index.py) keeps
+    near-duplicate clusters in one subset. Returns the output directory.
+    """
+    img_size = tuple(img_size)
+    output_dir = Path(output_dir) if output_dir else tfrecord_dir_for(data_dir, img_size)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    images, labels, paths, class_indices = load_cache(data_dir, img_size)
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(seed)
+
+    if not no_split:
+        split_file = Path(split_file) if split_file else split_path_for(data_dir)
+        split = ensure_split(split_file, data_dir, validation_split=validation_split, seed=seed,
+                             clusters_file=clusters_file)
+        position = {p: i for i, p in enumerate(paths)}
+        subsets = {
+            subset: np.array([position[p] for p in split_files(split, subset)[0] if p in position],
+                             dtype=np.int64)
+            for subset in SUBSETS
+        }
+    else:
+        groups = load_cluster_groups(clusters_file) if clusters_file else None
+        subsets = {
+            'train': split_indices(labels, validation_split, 'training', paths, groups),
+            'validation': split_indices(labels, validation_split, 'validation', paths, groups),
+        }
+
+    # Remove shards from a previous export with a different shard count
+    for old_shard in output_dir.glob('*.tfrecord.gz'):
+        old_shard.unlink()
+
+    counts = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for subset, indices in subsets.items():
+            indices = rng.permutation(indices)
+            shards = np.array_split(indices, num_shards)
+            print(f"\n📝 Writing {subset}: {len(indices)} images → {num_shards} shards")
+            futures = [
+                pool.submit(write_shard, output_dir / shard_name(subset, i, num_shards),
+                            shard, images, labels, paths)
+                for i, shard in enumerate(shards)
+            ]
+            counts[subset] = sum(f.result() for f in futures)
+
+    info = {
+        'data_dir': str(data_dir),
+        'img_size': list(img_size),
+        'class_indices': class_indices,
+        'num_shards': num_shards,
+        'compression': COMPRESSION,
+        'validation_split': validation_split,
+        'clusters_file': str(clusters_file) if clusters_file else None,
+        'split_file': None if no_split else str(split_file),
+        'samples': counts,
+    }
+    with open(output_dir / INFO_FILE, 'w') as f:
+        json.dump(info, f, indent=2)
+
+    total_mb = sum(p.stat().st_size for p in output_dir.glob('*.tfrecord.gz')) / (1024 * 1024)
+    print(f"\n✓ Exported {sum(counts.values())} images to {output_dir} ({total_mb:.1f} MB)")
+
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export ISL images to sharded TFRecords")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--img-size', type=int, default=64)
+    parser.add_argument('--shards', type=int, default=8, help="Shards per subset")
+    parser.add_argument('--validation-split', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--clusters', default=None,
+                        help="Clusters file from dedup_index.py; keeps near-duplicates in one subset")
+    parser.add_argument('--split-file', default=None,
+                        help="Persistent split from splits.py (default: data/splits/<dataset key>.json, "
+                             "as training uses)")
+    parser.add_argument('--no-split', action='store_true',
+                        help="Split by file order instead (no test subset; 'tfrecord' training refuses it)")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  TFRecord Dataset Export")
+    print("="*60)
+
+    export_tfrecords(
+        args.data_dir,
+        (args.img_size, args.img_size),
+        num_shards=args.shards,
+        validation_split=args.validation_split,
+        seed=args.seed,
+        output_dir=args.output_dir,
+        clusters_file=args.clusters,
+        split_file=args.split_file,
+        no_split=args.no_split
+    )
+
+
+if __name__ == "__main__":
+    main()
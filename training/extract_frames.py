@@ -0,0 +1,326 @@
+"""
+Extract training frames from the ISL-CSLTR videos
+
+Decodes every video under the dataset folder in a process pool, samples
+frames at a fixed rate (--fps) and/or when the picture changes enough
+(--motion-threshold), resizes them to the model input size and writes
+compressed frame shards:
+
+    data/frames/<dataset key>/<H>x<W>/frames-00000.npz   frames, clip ids, labels, timestamps
+    data/frames/<dataset key>/<H>x<W>/index.json         label names, clips, settings
+
+The label of a clip is the folder it is in (the sentence, for ISL-CSLTR's
+Videos_Sentence_Level). Videos are read frame by frame and only the sampled,
+resized frames are kept, with a bounded number of videos in flight. Every
+shard holds exactly --shard-size frames (the last one fewer), so a long clip
+spans several shards and memory use does not depend on corpus size.
+
+Usage:
+    python training/extract_frames.py --img-size 64 --fps 5
+    python training/extract_frames.py --motion-threshold 8 --workers 16
+"""
+
+import os
+import json
+import argparse
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import cv2
+
+from dataset_manifest import dataset_key
+
+PROJECT_ROOT = Path(__file__).parent.parent
+VIDEO_DIR = PROJECT_ROOT / "data" / "isl-csltr"
+FRAMES_ROOT = PROJECT_ROOT / "data" / "frames"
+
+INDEX_FILE = 'index.json'
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.mpg', '.mpeg')
+
+# Motion is measured on small grayscale thumbnails
+MOTION_SIZE = (32, 32)
+
+
+def frames_dir_for(video_dir, img_size):
+    """Output directory for a video dataset at a given target size"""
+    return FRAMES_ROOT / dataset_key(video_dir) / f"{img_size[0]}x{img_size[1]}"
+
+
+def list_videos(video_dir):
+    """List (relative path, label) for every video, in sorted walk order
+
+    The label is the video's folder relative to video_dir.
+    """
+    video_dir = Path(video_dir)
+    videos = []
+    for root, _, names in sorted(os.walk(video_dir), key=lambda x: x[0]):
+        for fname in sorted(names):
+            if not fname.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, fname), video_dir).replace(os.sep, '/')
+            label = rel_path.rsplit('/', 1)[0] if '/' in rel_path else '.'
+            videos.append((rel_path, label))
+    return videos
+
+
+def video_fingerprint(video_dir, videos):
+    """Names, sizes and modification times of all videos"""
+    entries = []
+    for rel_path, _ in videos:
+        stat = os.stat(Path(video_dir) / rel_path)
+        entries.append(f"{rel_path}\0{stat.st_size}\0{stat.st_mtime_ns}")
+    return entries
+
+
+def sample_frames(path, img_size, fps=None, motion_threshold=None):
+    """Decode one video and return its sampled frames
+
+    With `fps`, at most that many frames per second are considered; with
+    `motion_threshold`, a frame is kept only if its mean absolute difference
+    (0-255) to the last kept frame exceeds it. Returns (frames uint8
+    (N, H, W, 3) RGB, timestamps in seconds, source fps).
+    """
+    cv2.setNumThreads(1)  # One decoder thread per worker process
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise IOError(f"Cannot open video {path}")
+
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = source_fps / fps if fps else 1.0
+    frames, timestamps = [], []
+    last_thumb = None
+    next_sample = 0.0
+    index = 0
+
+    try:
+        while True:
+            if index + 1e-6 < next_sample:
+                # Skipped frame: advance without converting it
+                if not capture.grab():
+                    break
+                index += 1
+                continue
+
+            ok, frame = capture.read()
+            if not ok:
+                break
+            next_sample += step
+
+            if motion_threshold is not None:
+                thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), MOTION_SIZE,
+                                   interpolation=cv2.INTER_AREA).astype(np.int16)
+                if last_thumb is not None and np.abs(thumb - last_thumb).mean() <= motion_threshold:
+                    index += 1
+                    continue
+                last_thumb = thumb
+
+            # Same nearest-neighbour resize as the image pipeline; cv2 takes (width, height)
+            frame = cv2.resize(frame, (img_size[1], img_size[0]), interpolation=cv2.INTER_NEAREST)
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            timestamps.append(index / source_fps)
+            index += 1
+    finally:
+        capture.release()
+
+    if not frames:
+        return np.zeros((0, *img_size, 3), dtype=np.uint8), np.zeros(0, np.float32), source_fps
+    return np.stack(frames), np.asarray(timestamps, dtype=np.float32), source_fps
+
+
+def _extract(video_dir, rel_path, img_size, fps, motion_threshold):
+    """Process pool task: sample one video, returning None if unreadable"""
+    try:
+        return sample_frames(Path(video_dir) / rel_path, img_size, fps, motion_threshold)
+    except Exception as e:
+        print(f"  ✗ Skipping unreadable video {rel_path}: {str(e)[:50]}")
+        return None
+
+
+class ShardWriter:
+    """Buffers frames and writes them out in fixed-size .npz shards
+
+    A clip larger than the room left in the current shard is split across
+    shards, so no shard (or buffer) grows past shard_size frames.
+    """
+
+    def __init__(self, output_dir, shard_size):
+        self.output_dir = Path(output_dir)
+        self.shard_size = shard_size
+        self.buffer = []
+        self.buffered = 0
+        self.shards = []
+
+    @property
+    def current_shard(self):
+        return len(self.shards)
+
+    def add(self, frames, clip_id, label, timestamps):
+        start = 0
+        while start < len(frames):
+            end = start + min(len(frames) - start, self.shard_size - self.buffered)
+            self.buffer.append((frames[start:end], np.full(end - start, clip_id, np.int32),
+                                np.full(end - start, label, np.int32), timestamps[start:end]))
+            self.buffered += end - start
+            start = end
+            if self.buffered >= self.shard_size:
+                self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        name = f"frames-{len(self.shards):05d}.npz"
+        frames, clip_ids, labels, timestamps = (np.concatenate(parts) for parts in zip(*self.buffer))
+        np.savez_compressed(self.output_dir / name, frames=frames, clip_ids=clip_ids,
+                            labels=labels, timestamps=timestamps)
+        self.shards.append({'file': name, 'frames': len(frames)})
+        self.buffer = []
+        self.buffered = 0
+
+
+def extract_frames(video_dir=VIDEO_DIR, img_size=(64, 64), fps=5.0, motion_threshold=None,
+                   workers=None, shard_size=4096, output_dir=None, force=False):
+    """Extract frames from every video in video_dir into shards
+
+    Skips the work if the videos and settings match the existing index.
+    Returns the output directory.
+    """
+    video_dir = Path(video_dir)
+    img_size = tuple(img_size)
+    output_dir = Path(output_dir) if output_dir else frames_dir_for(video_dir, img_size)
+    workers = workers or os.cpu_count()
+
+    videos = list_videos(video_dir)
+    if not videos:
+        print(f"✗ No videos found in {video_dir}")
+        return output_dir
+
+    settings = {'img_size': list(img_size), 'fps': fps, 'motion_threshold': motion_threshold}
+    fingerprint = video_fingerprint(video_dir, videos)
+    index_path = output_dir / INDEX_FILE
+    if index_path.exists() and not force:
+        with open(index_path, 'r') as f:
+            previous = json.load(f)
+        if (previous.get('settings') == settings and previous.get('fingerprint') == fingerprint
+                and all((output_dir / shard['file']).exists() for shard in previous.get('shards', []))):
+            print(f"✓ Frames up to date: {output_dir}")
+            return output_dir
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Drop the index first: an interrupted run must not leave it pointing at new shards
+    index_path.unlink(missing_ok=True)
+    for old_shard in output_dir.glob('frames-*.npz'):
+        old_shard.unlink()
+
+    label_names = sorted({label for _, label in videos})
+    label_indices = {name: i for i, name in enumerate(label_names)}
+    writer = ShardWriter(output_dir, shard_size)
+    clips = []
+
+    print(f"\n🎬 Extracting frames from {len(videos)} videos ({len(label_names)} labels) "
+          f"with {workers} workers")
+
+    def collect(rel_path, label, future):
+        result = future.result()
+        if result is None:
+            return
+        frames, timestamps, source_fps = result
+        clips.append({
+            'path': rel_path,
+            'label': label,
+            'source_fps': source_fps,
+            'frames': len(frames),
+            'shard': writer.current_shard,  # First shard; long clips continue in the next ones
+        })
+        writer.add(frames, len(clips) - 1, label_indices[label], timestamps)
+        if len(clips) % 50 == 0:
+            print(f"  {len(clips)}/{len(videos)} videos, {sum(c['frames'] for c in clips)} frames")
+
+    # Results are consumed in order with at most 2 videos per worker in flight
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rel_path, label in videos:
+            if len(in_flight) >= workers * 2:
+                collect(*in_flight.popleft())
+            future = pool.submit(_extract, video_dir, rel_path, img_size, fps, motion_threshold)
+            in_flight.append((rel_path, label, future))
+        while in_flight:
+            collect(*in_flight.popleft())
+    writer.flush()
+
+    index = {
+        'video_dir': str(video_dir),
+        'settings': settings,
+        'label_names': label_names,
+        'clips': clips,
+        'shards': writer.shards,
+        'fingerprint': fingerprint,
+    }
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, index_path)
+
+    total = sum(shard['frames'] for shard in writer.shards)
+    total_mb = sum((output_dir / s['file']).stat().st_size for s in writer.shards) / (1024 * 1024)
+    print(f"\n✓ Extracted {total} frames from {len(clips)} videos into "
+          f"{len(writer.shards)} shards ({total_mb:.1f} MB): {output_dir}")
+
+    return output_dir
+
+
+def load_frames(frames_dir):
+    """Load all frame shards written by extract_frames
+
+    Returns (frames, labels, clip_ids, timestamps, index).
+    """
+    frames_dir = Path(frames_dir)
+    with open(frames_dir / INDEX_FILE, 'r') as f:
+        index = json.load(f)
+
+    parts = {'frames': [], 'labels': [], 'clip_ids': [], 'timestamps': []}
+    for shard in index['shards']:
+        with np.load(frames_dir / shard['file']) as data:
+            for key in parts:
+                parts[key].append(data[key])
+
+    if not index['shards']:
+        size = index['settings']['img_size']
+        return (np.zeros((0, *size, 3), np.uint8), np.zeros(0, np.int32),
+                np.zeros(0, np.int32), np.zeros(0, np.float32), index)
+    return (np.concatenate(parts['frames']), np.concatenate(parts['labels']),
+            np.concatenate(parts['clip_ids']), np.concatenate(parts['timestamps']), index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract frame shards from the ISL-CSLTR videos")
+    parser.add_argument('--video-dir', default=str(VIDEO_DIR))
+    parser.add_argument('--img-size', type=int, default=64)
+    parser.add_argument('--fps', type=float, default=5.0, help="Frames sampled per second (0 = every frame)")
+    parser.add_argument('--motion-threshold', type=float, default=None,
+                        help="Keep a frame only if it differs this much (0-255) from the last kept one")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=4096, help="Frames per shard")
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--force', action='store_true', help="Extract again even if up to date")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  Video Frame Extraction")
+    print("="*60)
+
+    extract_frames(
+        args.video_dir,
+        (args.img_size, args.img_size),
+        fps=args.fps or None,
+        motion_threshold=args.motion_threshold,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        output_dir=args.output_dir,
+        force=args.force
+    )
+
+
+if __name__ == "__main__":
+    main()
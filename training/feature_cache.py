@@ -0,0 +1,330 @@
+"""
+Frozen-backbone feature cache and head retraining
+
+Loads a trained isl_model.h5, runs its convolutional trunk (every layer but
+the final softmax Dense) once over the decoded dataset cache and stores the
+penultimate-layer features as float16 shards, one per class, under
+data/.cache/features/<dataset key>/<backbone>/. Only the dense head is then
+trained on those features, so re-fitting it or adding a new class takes
+seconds instead of a full training run.
+
+The backbone directory is named after a hash of the trunk's weights (and
+the input sizes), so retraining the CNN invalidates the cache; only the
+most recently used backbones are kept (a distillation teacher's features,
+see distillation.py, live next to the shipped model's). Within a backbone, a class is recomputed only when
+its decoded shard's fingerprint changes (see dataset_cache.py) - adding a
+letter folder computes features for that letter alone.
+
+The dataset defaults to the one in the model's model_config.json. The new
+head starts from the old head's weights for the classes it already knew. The model is saved with the retrained head as isl_model.h5 plus
+labels.json and model_config.json, ready for convert_to_tflite.py.
+
+Usage:
+    python training/feature_cache.py
+    python training/feature_cache.py --epochs 50 --output-dir model/retrained
+    python training/feature_cache.py --build-only
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+from tensorflow import keras
+from tensorflow.keras import layers
+from tensorflow.keras.callbacks import EarlyStopping
+
+from data_pipeline import make_array_dataset
+from dataset_cache import CACHE_ROOT, cache_dir_for, load_cache, load_index
+from dataset_manifest import dataset_key
+from engine import CACHE_SIZE, DATA_DIR, MODEL_DIR, cache_size_for
+from splits import ensure_split, split_files, split_path_for
+from test_model import model_data_dir
+
+FEATURES_ROOT = CACHE_ROOT / "features"
+FEATURES_VERSION = 1
+INDEX_FILE = 'index.json'
+MAX_BACKBONES = 3
+
+
+def split_model(model):
+    """(backbone, head) of a classifier whose last layer is a Dense softmax"""
+    head = model.layers[-1]
+    if not isinstance(head, layers.Dense):
+        raise ValueError(f"Last layer must be Dense, got {type(head).__name__}")
+    backbone = keras.Model(model.inputs, model.layers[-2].output, name='backbone')
+    return backbone, head
+
+
+def backbone_key(backbone, img_size, cache_size):
+    """Hash of the backbone weights and input sizes, naming its cache directory"""
+    digest = hashlib.sha1(json.dumps([list(img_size), list(cache_size)]).encode())
+    for weight in backbone.weights:
+        digest.update(np.ascontiguousarray(weight.numpy()).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def build_features(backbone, data_dir=DATA_DIR, cache_size=CACHE_SIZE, batch_size=256, verbose=True):
+    """Create or refresh the feature cache of `backbone` for data_dir
+
+    Returns (features, labels, paths, class_indices) in decoded cache order;
+    features is a float16 (N, D) array.
+    """
+    data_dir = Path(data_dir)
+    img_size = tuple(backbone.input_shape[1:3])
+    cache_size = cache_size_for({'img_size': img_size, 'cache_size': cache_size})
+    images, labels, paths, class_indices = load_cache(data_dir, cache_size, verbose=verbose)
+    image_index = load_index(cache_dir_for(data_dir, cache_size))
+
+    key = backbone_key(backbone, img_size, cache_size)
+    features_dir = FEATURES_ROOT / dataset_key(data_dir) / key
+    features_dir.mkdir(parents=True, exist_ok=True)
+    # Drop the least recently used backbones
+    os.utime(features_dir)
+    others = sorted((d for d in features_dir.parent.iterdir() if d != features_dir),
+                    key=lambda d: d.stat().st_mtime, reverse=True)
+    for stale in others[MAX_BACKBONES - 1:]:
+        shutil.rmtree(stale)
+
+    old_index = {}
+    index_path = features_dir / INDEX_FILE
+    if index_path.exists():
+        with open(index_path, 'r') as f:
+            old_index = json.load(f)
+    old_classes = old_index.get('classes', {}) if old_index.get('version') == FEATURES_VERSION else {}
+
+    shards = []
+    classes = {}
+    offset = 0
+    for class_name in image_index['class_names']:
+        entry = image_index['classes'][class_name]
+        shard_path = features_dir / f"{class_name}.npy"
+        previous = old_classes.get(class_name)
+        indices = np.arange(offset, offset + entry['count'])
+        offset += entry['count']
+
+        if previous and previous['fingerprint'] == entry['fingerprint'] and shard_path.exists():
+            shards.append(np.load(shard_path))
+            classes[class_name] = previous
+            continue
+
+        if verbose:
+            print(f"  Extracting features for class {class_name} ({entry['count']} images)...")
+        if entry['count']:
+            ds = make_array_dataset(images, labels, indices, len(class_indices), batch_size,
+                                    img_size=img_size).map(lambda x, y: x)
+            shard = backbone.predict(ds, verbose=0).astype(np.float16)
+        else:
+            shard = np.zeros((0, backbone.output_shape[-1]), dtype=np.float16)
+        tmp_path = shard_path.with_name(shard_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, shard)
+        os.replace(tmp_path, shard_path)
+        shards.append(shard)
+        classes[class_name] = {'fingerprint': entry['fingerprint'], 'count': len(shard)}
+
+    for class_name in set(old_classes) - set(classes):
+        (features_dir / f"{class_name}.npy").unlink(missing_ok=True)
+
+    index = {
+        'version': FEATURES_VERSION,
+        'backbone': key,
+        'img_size': list(img_size),
+        'cache_size': list(cache_size),
+        'feature_dim': int(backbone.output_shape[-1]),
+        'classes': classes,
+    }
+    if index != old_index:
+        with open(index_path, 'w') as f:
+            json.dump(index, f, indent=2)
+
+    features = np.concatenate(shards) if shards else np.zeros((0, index['feature_dim']), np.float16)
+    if verbose:
+        print(f"✓ Features: {features.shape[0]} x {features.shape[1]} ({features_dir})")
+    return features, np.asarray(labels), paths, class_indices
+
+
+def build_head(feature_dim, class_names, old_head=None, old_class_names=()):
+    """Softmax head for class_names, starting from old_head for known classes"""
+    head = layers.Dense(len(class_names), activation='softmax', name='head')
+    head.build((None, feature_dim))
+    if old_head is not None:
+        kernel, bias = head.get_weights()
+        old_kernel, old_bias = old_head.get_weights()
+        old_position = {name: i for i, name in enumerate(old_class_names)}
+        for i, name in enumerate(class_names):
+            if name in old_position:
+                kernel[:, i] = old_kernel[:, old_position[name]]
+                bias[i] = old_bias[old_position[name]]
+        head.set_weights([kernel, bias])
+    return head
+
+
+def train_head(model_path=MODEL_DIR / 'isl_model.h5', data_dir=None, output_dir=None,
+               split_file=None, cache_size=CACHE_SIZE, epochs=30, batch_size=256,
+               learning_rate=0.001, patience=5):
+    """Retrain (or extend) the dense head of a saved model on cached features
+
+    Returns a result dict with the class names, new classes, head history
+    and validation metrics; the model is saved to output_dir (default: the
+    model's own directory). data_dir defaults to the model's dataset (its
+    model_config.json) and split_file to data_dir's own split.
+    """
+    model_path = Path(model_path)
+    output_dir = Path(output_dir or model_path.parent)
+    data_dir = Path(data_dir or model_data_dir(model_path.parent))
+    if not model_path.exists():
+        raise FileNotFoundError(f"No model found at {model_path}; train one first")
+
+    print(f"📦 Loading model: {model_path}")
+    model = keras.models.load_model(model_path, compile=False)
+    backbone, old_head = split_model(model)
+
+    old_class_names = []
+    labels_path = model_path.parent / 'labels.json'
+    if labels_path.exists():
+        with open(labels_path, 'r') as f:
+            labels = json.load(f)
+        old_class_names = [labels[str(i)] for i in range(len(labels))]
+
+    print("\n🧊 Building feature cache...")
+    features, _, paths, _ = build_features(backbone, data_dir, cache_size, batch_size)
+
+    split = ensure_split(split_file or split_path_for(data_dir), data_dir)
+    train_paths, train_labels, class_indices = split_files(split, 'train')
+    val_paths, val_labels, _ = split_files(split, 'validation')
+    class_names = sorted(class_indices, key=class_indices.get)
+    new_classes = [name for name in class_names if name not in old_class_names]
+
+    position = {p: i for i, p in enumerate(paths)}
+
+    def subset(subset_paths, subset_labels):
+        # Unreadable images are missing from the cache, skip them here too
+        rows = [(position[p], label) for p, label in zip(subset_paths, subset_labels) if p in position]
+        indices, targets = zip(*rows) if rows else ((), ())
+        x = features[list(indices)].astype(np.float32)
+        return x, keras.utils.to_categorical(targets, len(class_names))
+
+    x_train, y_train = subset(train_paths, train_labels)
+    x_val, y_val = subset(val_paths, val_labels)
+
+    print(f"\n🎯 Training head: {features.shape[1]} features -> {len(class_names)} classes")
+    print(f"   Training samples: {len(x_train)}, validation samples: {len(x_val)}")
+    if new_classes:
+        print(f"   New classes: {', '.join(new_classes)}")
+
+    head = build_head(features.shape[1], class_names, old_head, old_class_names)
+    head_model = keras.Sequential([keras.Input((features.shape[1],)), head])
+    head_model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+                       loss='categorical_crossentropy', metrics=['accuracy'])
+    start = datetime.now()
+    history = head_model.fit(
+        x_train, y_train, validation_data=(x_val, y_val), epochs=epochs, batch_size=batch_size,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)],
+        verbose=2
+    )
+    training_time = (datetime.now() - start).total_seconds()
+    evaluation = head_model.evaluate(x_val, y_val, verbose=0, return_dict=True)
+
+    result = {
+        'data_dir': str(data_dir),
+        'class_names': class_names,
+        'new_classes': new_classes,
+        'train_samples': len(x_train),
+        'val_samples': len(x_val),
+        'epochs_trained': len(history.history['loss']),
+        'history': {k: [float(v) for v in values] for k, values in history.history.items()},
+        'evaluation': {k: float(v) for k, v in evaluation.items()},
+        'training_time_seconds': round(training_time, 2),
+    }
+
+    print(f"\n{'='*60}")
+    print("Head Evaluation Results:")
+    print(f"{'='*60}")
+    for name, value in result['evaluation'].items():
+        print(f"  {name}: {value:.4f}")
+    print(f"  Training time: {training_time:.1f} seconds")
+    print(f"{'='*60}")
+
+    full_model = keras.Model(backbone.inputs, head(backbone.outputs[0]), name=model.name)
+    result['model_path'] = str(save_retrained(full_model, model_path, output_dir, result))
+    return result
+
+
+def save_retrained(model, model_path, output_dir, result):
+    """Save the model, labels.json and an updated model_config.json"""
+    print("\n💾 Saving model...")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    out_path = output_dir / 'isl_model.h5'
+    model.save(out_path)
+    print(f"✓ Model saved: {out_path}")
+
+    labels_path = output_dir / 'labels.json'
+    with open(labels_path, 'w') as f:
+        json.dump({i: name for i, name in enumerate(result['class_names'])}, f, indent=2)
+    print(f"✓ Labels saved: {labels_path}")
+
+    config_dict = {}
+    config_path = model_path.parent / 'model_config.json'
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            config_dict = json.load(f)
+    config_dict.update({
+        'img_size': list(model.input_shape[1:3]),
+        'data_dir': result['data_dir'],
+        'num_classes': len(result['class_names']),
+        'class_names': result['class_names'],
+        'final_val_accuracy': result['evaluation']['accuracy'],
+        'head_retrained_on': datetime.now().isoformat(),
+        'head_training': {k: result[k] for k in ('new_classes', 'epochs_trained', 'training_time_seconds')},
+    })
+    config_path = output_dir / 'model_config.json'
+    with open(config_path, 'w') as f:
+        json.dump(config_dict, f, indent=2)
+    print(f"✓ Model config saved: {config_path}")
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain the model's dense head on cached backbone features")
+    parser.add_argument('--model', default=str(MODEL_DIR / 'isl_model.h5'))
+    parser.add_argument('--data-dir', help="Dataset to retrain on (default: the model's, from model_config.json)")
+    parser.add_argument('--output-dir', help="Where to save the model (default: next to --model)")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE[0],
+                        help="Square size of the decode cache the model was trained from")
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--build-only', action='store_true', help="Only build the feature cache")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Head Retraining (frozen backbone)")
+    print("="*60)
+
+    cache_size = (args.cache_size, args.cache_size)
+    if not Path(args.model).exists():
+        print(f"✗ No model found at {args.model}; train one first")
+        sys.exit(1)
+    if args.build_only:
+        model = keras.models.load_model(args.model, compile=False)
+        build_features(split_model(model)[0], args.data_dir or model_data_dir(Path(args.model).parent),
+                       cache_size, args.batch_size)
+        return
+
+    train_head(args.model, args.data_dir, args.output_dir, cache_size=cache_size,
+               epochs=args.epochs, batch_size=args.batch_size, learning_rate=args.learning_rate)
+
+    print("\nNext steps:")
+    print("  1. Convert to TFLite: python training/convert_to_tflite.py")
+    print("  2. Test model: python training/test_model.py")
+
+
+if __name__ == "__main__":
+    main()
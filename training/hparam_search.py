@@ -0,0 +1,258 @@
+"""
+Parallel hyperparameter search with asynchronous successive halving (ASHA)
+
+Samples configs around a preset (learning rate, image size, batch size,
+architecture, dropout) and trains them concurrently in a process pool sized
+to the machine. Weak trials are pruned early: at every rung epoch
+(min_epochs, min_epochs * eta, ...) a trial goes on only if its val_accuracy
+is in the top 1/eta of the trials that have reached that rung so far.
+Trials that finish are converted to TFLite and their single-image latency
+is measured.
+
+The leaderboard (training/logs/hparam_search/<run>/leaderboard.json) lists
+each trial's best val_accuracy, training time, TFLite latency and size, and
+picks the fastest-to-train and fastest-to-infer configs that reach the
+accuracy floor. Trial logs and models are kept next to it.
+
+Usage:
+    python training/hparam_search.py --trials 12 --max-epochs 9
+    python training/hparam_search.py --preset quick --trials 24 --workers 4 --accuracy-floor 0.97
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import traceback
+import contextlib
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tensorflow import keras
+
+from convert_to_tflite import benchmark_tflite, convert_to_tflite
+from dataset_cache import build_cache
+from engine import PRESETS, check_data_directory, cache_size_for, make_config, train
+from splits import ensure_split
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SEARCH_ROOT = PROJECT_ROOT / "training" / "logs" / "hparam_search"
+
+SEARCH_SPACE = {
+    'learning_rate': [0.0005, 0.001, 0.002, 0.004],
+    'img_size': [(64, 64), (96, 96), (128, 128)],
+    'batch_size': [64, 128, 256],
+    'architecture': ['tiny_cnn', 'compact_cnn', 'cnn'],
+    'dropout': [(0.1, 0.3), (0.25, 0.5), (0.4, 0.6)],
+}
+
+
+def sample_trials(num_trials, seed=42, space=SEARCH_SPACE):
+    """Distinct random configs from the search space"""
+    rng = random.Random(seed)
+    combinations = int(np.prod([len(values) for values in space.values()]))
+    trials, seen = [], set()
+    while len(trials) < min(num_trials, combinations):
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    """Epochs at which trials are compared: min_epochs * eta^k below max_epochs"""
+    rungs = []
+    epoch = min_epochs
+    while epoch < max_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+class ASHAPruner(keras.callbacks.Callback):
+    """Stops training at a rung unless val_accuracy is in the top 1/eta so far
+
+    `records` and `lock` are shared by all trials (a multiprocessing
+    Manager dict and lock); records[rung] lists the scores seen at a rung.
+    """
+
+    def __init__(self, rungs, eta, records, lock, monitor='val_accuracy'):
+        super().__init__()
+        self.rungs = set(rungs)
+        self.eta = eta
+        self.records = records
+        self.lock = lock
+        self.monitor = monitor
+        self.pruned_at = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch += 1
+        score = (logs or {}).get(self.monitor)
+        if epoch not in self.rungs or score is None:
+            return
+        with self.lock:
+            recorded = self.records.get(epoch, []) + [float(score)]
+            self.records[epoch] = recorded
+        cutoff = float(np.percentile(recorded, 100 * (1 - 1 / self.eta)))
+        if score < cutoff:
+            print(f"\n✂️  Pruned at epoch {epoch}: {self.monitor} {score:.4f} < {cutoff:.4f}")
+            self.pruned_at = epoch
+            self.model.stop_training = True
+
+
+def run_trial(trial_id, params, preset, overrides, rungs, eta, search_dir, records, lock):
+    """Train one trial in a pool worker; returns its leaderboard entry"""
+    trial_dir = Path(search_dir) / f"trial-{trial_id:03d}"
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    entry = {'trial': trial_id, 'params': params, 'log': str(trial_dir / 'train.log')}
+
+    with open(trial_dir / 'train.log', 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        config = make_config(preset, **params, **overrides, model_dir=trial_dir,
+                             logs_dir=trial_dir / 'logs', checkpoint_dir=trial_dir / 'checkpoints',
+                             cpu_profile=False, tensorboard=False, checkpoint_steps=None)
+        pruner = ASHAPruner(rungs, eta, records, lock)
+        try:
+            result = train(config, callbacks=[pruner])
+        except Exception as e:
+            traceback.print_exc()
+            return {**entry, 'status': 'failed', 'error': str(e)}
+
+        entry.update({
+            'status': 'pruned' if pruner.pruned_at else 'completed',
+            'epochs_trained': result['epochs_trained'],
+            'best_val_accuracy': result['best_val_accuracy'],
+            'val_accuracy': result['evaluation']['accuracy'],
+            'training_time_seconds': result['training_time_seconds'],
+        })
+        if pruner.pruned_at is None:
+            # Latency of the model as shipped to the app
+            model = keras.models.load_model(result['model_path'], compile=False)
+            tflite_model = convert_to_tflite(model, quantize=True)
+            entry['tflite_latency_ms'] = round(benchmark_tflite(tflite_model), 3)
+            entry['tflite_size_mb'] = round(len(tflite_model) / (1024 * 1024), 2)
+    return entry
+
+
+def write_leaderboard(entries, search_dir, accuracy_floor, settings):
+    """Rank the trials and save leaderboard.json; returns the leaderboard"""
+    entries = sorted(entries, key=lambda e: (e['status'] != 'completed', -e.get('best_val_accuracy', 0)))
+    eligible = [e for e in entries
+                if e['status'] == 'completed' and e['best_val_accuracy'] >= accuracy_floor]
+    leaderboard = {
+        **settings,
+        'accuracy_floor': accuracy_floor,
+        'fastest_to_train': min(eligible, key=lambda e: e['training_time_seconds'])['trial'] if eligible else None,
+        'fastest_to_infer': min(eligible, key=lambda e: e['tflite_latency_ms'])['trial'] if eligible else None,
+        'total_training_time_seconds': round(sum(e.get('training_time_seconds', 0) for e in entries), 2),
+        'trials': entries,
+    }
+    with open(Path(search_dir) / 'leaderboard.json', 'w') as f:
+        json.dump(leaderboard, f, indent=2)
+    return leaderboard
+
+
+def print_leaderboard(leaderboard):
+    print("\n" + "="*60)
+    print("  Leaderboard")
+    print("="*60)
+    print(f"  {'#':>3} {'Status':<9} {'Arch':<11} {'Size':>4} {'Batch':>5} {'LR':>6} "
+          f"{'Ep':>3} {'Val acc':>7} {'Train s':>8} {'TFLite ms':>9}")
+    for e in leaderboard['trials']:
+        p = e['params']
+        latency = f"{e['tflite_latency_ms']:.2f}" if 'tflite_latency_ms' in e else '-'
+        print(f"  {e['trial']:>3} {e['status']:<9} {p['architecture']:<11} {p['img_size'][0]:>4} "
+              f"{p['batch_size']:>5} {p['learning_rate']:>6} {e.get('epochs_trained', 0):>3} "
+              f"{e.get('best_val_accuracy', 0):>7.4f} {e.get('training_time_seconds', 0):>8.1f} {latency:>9}")
+    print("="*60)
+    for key, label in (('fastest_to_train', 'Fastest to train'), ('fastest_to_infer', 'Fastest to infer')):
+        if leaderboard[key] is None:
+            print(f"  {label}: no completed trial reached {leaderboard['accuracy_floor']}")
+        else:
+            print(f"  {label}: trial {leaderboard[key]}")
+    print(f"  Total training time: {leaderboard['total_training_time_seconds'] / 60:.1f} minutes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASHA hyperparameter search for the ISL model")
+    parser.add_argument('--preset', choices=list(PRESETS), default='fast',
+                        help="Preset the sampled settings override")
+    parser.add_argument('--trials', type=int, default=12)
+    parser.add_argument('--max-epochs', type=int, default=9)
+    parser.add_argument('--min-epochs', type=int, default=1, help="First rung")
+    parser.add_argument('--eta', type=int, default=3, help="Keep the top 1/eta at each rung")
+    parser.add_argument('--workers', type=int, help="Concurrent trials (default: half the CPU threads)")
+    parser.add_argument('--accuracy-floor', type=float, default=0.95)
+    parser.add_argument('--data-dir')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Hyperparameter Search (ASHA)")
+    print("="*60)
+
+    overrides = {'epochs': args.max_epochs, 'seed': args.seed}
+    if args.data_dir:
+        overrides['data_dir'] = args.data_dir
+    config = make_config(args.preset, **overrides)
+    if not check_data_directory(config):
+        sys.exit(1)
+
+    # Trials read the split and decode cache concurrently; create them once here
+    if config['split_file']:
+        ensure_split(config['split_file'], config['data_dir'],
+                     validation_split=config['validation_split'], test_split=config['test_split'],
+                     seed=config['seed'], clusters_file=config['dedup_clusters'])
+    if config['data_pipeline'] == 'cache' and config['data_dir'].exists():
+        largest = max(SEARCH_SPACE['img_size'])
+        build_cache(config['data_dir'], cache_size_for({**config, 'img_size': largest}))
+
+    cpu_count = os.cpu_count() or 1
+    workers = args.workers or max(1, min(args.trials, cpu_count // 2))
+    threads = max(1, cpu_count // workers)
+    # Spawned workers inherit these before TensorFlow starts
+    os.environ.update(TF_NUM_INTRAOP_THREADS=str(threads), OMP_NUM_THREADS=str(threads),
+                      TF_CPP_MIN_LOG_LEVEL='2')
+
+    rungs = rung_epochs(args.min_epochs, args.max_epochs, args.eta)
+    trials = sample_trials(args.trials, args.seed)
+    search_dir = SEARCH_ROOT / datetime.now().strftime("%Y%m%d_%H%M%S")
+    search_dir.mkdir(parents=True, exist_ok=True)
+    settings = {'preset': args.preset, 'max_epochs': args.max_epochs, 'rungs': rungs, 'eta': args.eta,
+                'workers': workers, 'threads_per_worker': threads}
+
+    print(f"\n🔎 {len(trials)} trials, {workers} at a time ({threads} thread(s) each)")
+    print(f"   Rungs at epochs {rungs} of {args.max_epochs}, keeping the top 1/{args.eta}")
+    print(f"   Logs: {search_dir}")
+
+    entries = []
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        records, lock = manager.dict(), manager.Lock()
+        futures = [
+            pool.submit(run_trial, i, params, args.preset, overrides, rungs, args.eta,
+                        search_dir, records, lock)
+            for i, params in enumerate(trials)
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            entries.append(entry)
+            detail = (f"val_accuracy {entry['best_val_accuracy']:.4f} after {entry['epochs_trained']} "
+                      f"epochs, {entry['training_time_seconds']:.0f}s"
+                      if entry['status'] != 'failed' else entry['error'][:60])
+            print(f"  [{len(entries)}/{len(trials)}] trial {entry['trial']} {entry['status']}: {detail}")
+            write_leaderboard(entries, search_dir, args.accuracy_floor, settings)
+
+    leaderboard = write_leaderboard(entries, search_dir, args.accuracy_floor, settings)
+    print_leaderboard(leaderboard)
+    print(f"\n✓ Leaderboard saved: {search_dir / 'leaderboard.json'}")
+
+
+if __name__ == "__main__":
+    main()
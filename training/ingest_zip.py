@@ -0,0 +1,299 @@
+"""
+Streaming ingestion of a dataset zip into the decoded dataset cache
+
+Reads a local dataset archive member by member in archive order, decodes and
+resizes the images on a thread pool and writes them straight into the
+dataset_cache.py shards (data/.cache/<dataset key>/<H>x<W>/). Nothing is
+extracted to disk, and one pass fills every requested image size.
+
+The archive's SHA-256 is recorded in each cache index, so an unchanged
+archive is skipped on the next run. When it does change, only classes whose
+members (names, sizes and CRC-32s) changed are decoded again. No network
+access is needed: point it at a zip that is already on disk.
+
+Train from the ingested cache with DATA_PIPELINE = 'cache'; the data
+directory only names the dataset and does not have to exist.
+
+Usage:
+    python training/ingest_zip.py data/indian-sign-language-isl.zip
+    python training/ingest_zip.py /media/usb/isl.zip --data-dir data/ISL --root Indian
+"""
+
+import io
+import os
+import zipfile
+import hashlib
+import argparse
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from dataset_cache import (
+    CACHE_SIZE, CACHE_VERSION, IMAGE_EXTENSIONS, cache_dir_for, load_index, resize_array,
+    write_index
+)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+
+CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_root(names):
+    """Deepest directory shared by all image members that still leaves a class level"""
+    dirs = [name.split('/')[:-1] for name in names]
+    common = os.path.commonprefix(dirs)
+    depth = min(len(common), min(len(d) for d in dirs) - 1)
+    return '/'.join(common[:max(depth, 0)])
+
+
+def list_members(zf, root=None):
+    """Group the archive's image members by class
+
+    Class folders are the first level below `root` (detected when None),
+    like the subfolders of the directory given to flow_from_directory.
+    Returns {class name: [(relative path, ZipInfo)]} in os.walk order.
+    """
+    infos = [
+        info for info in zf.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    if not infos:
+        return {}
+
+    if root is None:
+        root = find_root([info.filename for info in infos])
+    prefix = root.strip('/') + '/' if root.strip('/') else ''
+
+    members = {}
+    for info in infos:
+        if not info.filename.startswith(prefix):
+            continue
+        rel_path = info.filename[len(prefix):]
+        if '/' not in rel_path:
+            continue  # Loose file next to the class folders
+        members.setdefault(rel_path.split('/', 1)[0], []).append((rel_path, info))
+
+    for entries in members.values():
+        entries.sort(key=lambda e: (e[0].rsplit('/', 1)[0], e[0].rsplit('/', 1)[1]))
+    return members
+
+
+def class_fingerprint(entries):
+    """Fingerprint of a class from member names, sizes and CRC-32s"""
+    digest = hashlib.sha1()
+    for rel_path, info in entries:
+        digest.update(f"{rel_path}\0{info.file_size}\0{info.CRC:08x}\n".encode())
+    return digest.hexdigest()
+
+
+def decode_member(data, name, img_sizes):
+    """Decode one member's bytes once and resize it to every target size"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = img.convert('RGB')
+            return [resize_array(img, size) for size in img_sizes]
+    except Exception as e:
+        print(f"  ✗ Skipping unreadable image {name}: {str(e)[:50]}")
+        return None
+
+
+def stream_decode(zf, members, todo, cache_dirs, workers):
+    """Decode the classes in `todo` ({size: [class names]}) into shards
+
+    Members are read sequentially on this thread and decoded on the pool,
+    with a bounded number in flight; decoded pixels go to memory-mapped
+    shard files, so memory use does not grow with the archive.
+    Returns {(size, class name): relative paths kept}.
+    """
+    sizes_for = {}
+    for size, class_names in todo.items():
+        for class_name in class_names:
+            sizes_for.setdefault(class_name, []).append(size)
+
+    shards, ok, position = {}, {}, {}
+    for class_name, sizes in sizes_for.items():
+        entries = members[class_name]
+        position[class_name] = {rel_path: i for i, (rel_path, _) in enumerate(entries)}
+        for size in sizes:
+            tmp_path = cache_dirs[size] / f"{class_name}.npy.tmp"
+            shards[size, class_name] = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=np.uint8, shape=(len(entries), *size, 3))
+            ok[size, class_name] = np.zeros(len(entries), dtype=bool)
+
+    # Archive order means one sequential read through the file
+    queue = sorted(
+        ((info.header_offset, class_name, rel_path, info)
+         for class_name in sizes_for for rel_path, info in members[class_name]),
+        key=lambda item: item[0]
+    )
+
+    def store(class_name, rel_path, arrays):
+        if arrays is None:
+            return
+        i = position[class_name][rel_path]
+        for size, array in zip(sizes_for[class_name], arrays):
+            shards[size, class_name][i] = array
+            ok[size, class_name][i] = True
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _, class_name, rel_path, info in queue:
+            if len(in_flight) >= workers * 4:
+                done_class, done_path, future = in_flight.popleft()
+                store(done_class, done_path, future.result())
+            data = zf.read(info)
+            future = pool.submit(decode_member, data, info.filename, sizes_for[class_name])
+            in_flight.append((class_name, rel_path, future))
+        while in_flight:
+            done_class, done_path, future = in_flight.popleft()
+            store(done_class, done_path, future.result())
+
+    kept = {}
+    for size, class_name in list(shards):
+        shard, mask = shards.pop((size, class_name)), ok[size, class_name]
+        tmp_path = cache_dirs[size] / f"{class_name}.npy.tmp"
+        if mask.all():
+            shard.flush()
+            del shard
+        else:
+            # Drop unreadable images so the shard stays dense
+            compact = np.array(shard[mask])
+            del shard
+            with open(tmp_path, 'wb') as f:
+                np.save(f, compact)
+        os.replace(tmp_path, cache_dirs[size] / f"{class_name}.npy")
+        entries = members[class_name]
+        kept[size, class_name] = [rel_path for (rel_path, _), good in zip(entries, mask) if good]
+    return kept
+
+
+def ingest_zip(zip_path, data_dir=DATA_DIR, img_sizes=(CACHE_SIZE,), root=None,
+               workers=None, force=False):
+    """Stream a dataset zip into the decoded cache of data_dir
+
+    Returns the cache directories, one per image size.
+    """
+    zip_path = Path(zip_path)
+    img_sizes = [tuple(size) for size in img_sizes]
+    workers = workers or os.cpu_count()
+    cache_dirs = {size: cache_dir_for(data_dir, size) for size in img_sizes}
+    indexes = {size: load_index(cache_dirs[size]) or {} for size in img_sizes}
+
+    print(f"🔐 Checksumming {zip_path.name}...")
+    archive = {
+        'name': zip_path.name,
+        'bytes': zip_path.stat().st_size,
+        'sha256': file_sha256(zip_path),
+    }
+
+    def is_current(size):
+        index = indexes[size]
+        return (index.get('archive', {}).get('sha256') == archive['sha256']
+                and all((cache_dirs[size] / entry['file']).exists()
+                        for entry in index['classes'].values()))
+
+    if not force and all(is_current(size) for size in img_sizes):
+        print("✓ Archive unchanged since the last ingest, skipping")
+        return list(cache_dirs.values())
+
+    with zipfile.ZipFile(zip_path) as zf:
+        members = list_members(zf, root)
+        if not members:
+            print(f"✗ No images found in {zip_path.name}")
+            return []
+        class_names = sorted(members)
+        fingerprints = {name: class_fingerprint(members[name]) for name in class_names}
+
+        todo = {}
+        for size in img_sizes:
+            cache_dirs[size].mkdir(parents=True, exist_ok=True)
+            old_classes = indexes[size].get('classes', {})
+            todo[size] = [
+                name for name in class_names
+                if force or name not in old_classes
+                or old_classes[name]['fingerprint'] != fingerprints[name]
+                or not (cache_dirs[size] / old_classes[name]['file']).exists()
+            ]
+
+        total = sum(len(members[name]) for name in set().union(*todo.values()))
+        print(f"📦 Decoding {total} images from {len(class_names)} classes "
+              f"at {', '.join(f'{h}x{w}' for h, w in img_sizes)}")
+        kept = stream_decode(zf, members, todo, cache_dirs, workers)
+
+    for size in img_sizes:
+        old_classes = indexes[size].get('classes', {})
+        classes = {}
+        for name in class_names:
+            if name in todo[size]:
+                classes[name] = {
+                    'fingerprint': fingerprints[name],
+                    'file': f"{name}.npy",
+                    'count': len(kept[size, name]),
+                    'files': kept[size, name],
+                }
+            else:
+                classes[name] = old_classes[name]
+
+        # Drop shards of classes that are no longer in the archive
+        for name, entry in old_classes.items():
+            if name not in classes:
+                (cache_dirs[size] / entry['file']).unlink(missing_ok=True)
+
+        labels = write_index(cache_dirs[size], {
+            'version': CACHE_VERSION,
+            'data_dir': str(data_dir),
+            'img_size': list(size),
+            'class_names': class_names,
+            'classes': classes,
+            'archive': archive,
+        })
+        print(f"✓ {size[0]}x{size[1]}: {len(todo[size])} of {len(class_names)} classes decoded, "
+              f"{len(labels)} images in {cache_dirs[size]}")
+
+    return list(cache_dirs.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a dataset zip into the decoded cache")
+    parser.add_argument('zip', help="Local dataset archive")
+    parser.add_argument('--data-dir', default=str(DATA_DIR),
+                        help="Dataset the cache belongs to (names the cache; need not exist)")
+    parser.add_argument('--img-size', type=int, nargs='+', default=[CACHE_SIZE[0]],
+                        help=f"Target size(s) (default: {CACHE_SIZE[0]}, read by every preset)")
+    parser.add_argument('--root', default=None,
+                        help="Folder inside the archive that holds the class folders (auto-detected)")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Decode everything again")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  Dataset Archive Ingestion")
+    print("="*60)
+
+    ingest_zip(
+        args.zip,
+        args.data_dir,
+        [(size, size) for size in args.img_size],
+        root=args.root,
+        workers=args.workers,
+        force=args.force
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Pick an architecture, width and image size for a TFLite latency or size budget
+
+Every candidate (architecture x width multiplier x input size, see
+ARCHITECTURES in engine.py) is built untrained, converted to the quantized
+TFLite model the app ships and timed on this CPU - which takes seconds, not
+a training run. The candidates within --max-latency-ms / --max-size-mb are
+then trained for a few epochs, the largest (slowest within budget) first,
+up to --max-trials, and the most accurate one is selected. Use at least 2-3
+epochs: BatchNorm statistics of the GAP models are not settled after one.
+
+The report (training/logs/model_selection/<run>/selection.json) lists every
+candidate's parameters, TFLite size and latency, and the validation
+accuracy of the trained ones, followed by the engine command that trains
+the winner in full.
+
+Usage:
+    python training/model_selector.py --max-latency-ms 2
+    python training/model_selector.py --max-size-mb 0.5 --max-trials 4 --epochs 5
+    python training/model_selector.py --max-latency-ms 1 --architectures gap_cnn separable_cnn --widths 0.5 0.75 1
+"""
+
+import io
+import sys
+import json
+import argparse
+import contextlib
+from pathlib import Path
+from datetime import datetime
+from itertools import product
+
+from convert_to_tflite import benchmark_tflite, convert_to_tflite
+from engine import ARCHITECTURES, PRESETS, build_model, check_data_directory, make_config, train
+from splits import list_dataset
+
+PROJECT_ROOT = Path(__file__).parent.parent
+SELECTION_ROOT = PROJECT_ROOT / "training" / "logs" / "model_selection"
+
+DEFAULT_WIDTHS = (0.5, 1.0)
+DEFAULT_IMG_SIZES = (64, 96, 128)
+
+
+def profile_candidate(architecture, width, img_size, num_classes, num_threads=1):
+    """Parameters, quantized TFLite size and latency of an untrained candidate"""
+    config = make_config('fast', architecture=architecture, width=width, img_size=(img_size, img_size))
+    model = build_model(config, num_classes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        tflite_model = convert_to_tflite(model, quantize=True)
+    return {
+        'architecture': architecture,
+        'width': width,
+        'img_size': img_size,
+        'params': int(model.count_params()),
+        'tflite_size_mb': round(len(tflite_model) / (1024 * 1024), 3),
+        'tflite_latency_ms': round(benchmark_tflite(tflite_model, num_threads=num_threads), 3),
+    }
+
+
+def fits(candidate, max_latency_ms=None, max_size_mb=None):
+    """True if the candidate is within the latency and size budgets"""
+    return ((max_latency_ms is None or candidate['tflite_latency_ms'] <= max_latency_ms)
+            and (max_size_mb is None or candidate['tflite_size_mb'] <= max_size_mb))
+
+
+def train_candidate(candidate, preset, epochs, run_dir, data_dir=None):
+    """Short training run of a candidate; returns its best validation accuracy and time"""
+    name = f"{candidate['architecture']}-w{candidate['width']}-{candidate['img_size']}"
+    trial_dir = Path(run_dir) / name
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    overrides = {'data_dir': data_dir} if data_dir else {}
+    config = make_config(preset, architecture=candidate['architecture'], width=candidate['width'],
+                         img_size=(candidate['img_size'], candidate['img_size']), epochs=epochs,
+                         model_dir=trial_dir, logs_dir=trial_dir / 'logs', cpu_profile=False,
+                         tensorboard=False, checkpoint_steps=None, **overrides)
+    with open(trial_dir / 'train.log', 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        result = train(config)
+    return {
+        'best_val_accuracy': result['best_val_accuracy'],
+        'training_time_seconds': result['training_time_seconds'],
+        'model_path': result['model_path'],
+    }
+
+
+def select(max_latency_ms=None, max_size_mb=None, architectures=tuple(ARCHITECTURES), widths=DEFAULT_WIDTHS,
+           img_sizes=DEFAULT_IMG_SIZES, preset='fast', epochs=3, max_trials=6, num_threads=1, data_dir=None):
+    """Benchmark all candidates, train the ones within budget and pick the most accurate
+
+    Returns the selection report (also saved as selection.json); 'selected'
+    is None if no candidate fits.
+    """
+    config = make_config(preset, **({'data_dir': data_dir} if data_dir else {}))
+    if not check_data_directory(config):
+        raise FileNotFoundError(f"No dataset found in {config['data_dir']}")
+    num_classes = len(list_dataset(config['data_dir']) or {})
+
+    grid = list(product(architectures, widths, img_sizes))
+    print(f"\n⏱️  Benchmarking {len(grid)} candidates ({num_threads} thread(s))...")
+    candidates = []
+    for architecture, width, img_size in grid:
+        try:
+            candidate = profile_candidate(architecture, width, img_size, num_classes, num_threads)
+        except ValueError:
+            # Too many valid convolutions and poolings for a small input
+            print(f"  {architecture:<14} w{width:<5} {img_size:>4}px  does not fit the input size")
+            continue
+        candidate['fits'] = fits(candidate, max_latency_ms, max_size_mb)
+        candidates.append(candidate)
+        print(f"  {architecture:<14} w{width:<5} {img_size:>4}px  {candidate['params']:>10,} params  "
+              f"{candidate['tflite_size_mb']:>7.3f} MB  {candidate['tflite_latency_ms']:>7.2f} ms"
+              + ("" if candidate['fits'] else "  (over budget)"))
+
+    # Spend the training budget on the largest models that still fit
+    trials = sorted((c for c in candidates if c['fits']), key=lambda c: -c['tflite_latency_ms'])[:max_trials]
+    run_dir = SELECTION_ROOT / datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"\n🚀 Training {len(trials)} candidate(s) for {epochs} epochs (logs: {run_dir})")
+    for i, candidate in enumerate(trials, 1):
+        candidate.update(train_candidate(candidate, preset, epochs, run_dir, data_dir))
+        print(f"  [{i}/{len(trials)}] {candidate['architecture']} w{candidate['width']} "
+              f"{candidate['img_size']}px: val_accuracy {candidate['best_val_accuracy']:.4f} "
+              f"({candidate['training_time_seconds']:.0f}s)")
+
+    selected = max(trials, key=lambda c: c['best_val_accuracy']) if trials else None
+    report = {
+        'max_latency_ms': max_latency_ms,
+        'max_size_mb': max_size_mb,
+        'preset': preset,
+        'epochs': epochs,
+        'num_threads': num_threads,
+        'selected': selected,
+        'candidates': candidates,
+    }
+    run_dir.mkdir(parents=True, exist_ok=True)
+    with open(run_dir / 'selection.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report saved: {run_dir / 'selection.json'}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Select the most accurate model within a TFLite budget")
+    parser.add_argument('--max-latency-ms', type=float, help="Quantized TFLite latency budget per image")
+    parser.add_argument('--max-size-mb', type=float, help="Quantized TFLite size budget")
+    parser.add_argument('--architectures', nargs='+', choices=list(ARCHITECTURES), default=list(ARCHITECTURES))
+    parser.add_argument('--widths', type=float, nargs='+', default=list(DEFAULT_WIDTHS))
+    parser.add_argument('--img-sizes', type=int, nargs='+', default=list(DEFAULT_IMG_SIZES))
+    parser.add_argument('--preset', choices=list(PRESETS), default='fast',
+                        help="Training settings of the short candidate runs")
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--max-trials', type=int, default=6, help="Candidates to train")
+    parser.add_argument('--threads', type=int, default=1, help="TFLite interpreter threads, as on the device")
+    parser.add_argument('--data-dir')
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Model Selection")
+    print("="*60)
+
+    try:
+        report = select(args.max_latency_ms, args.max_size_mb, args.architectures, args.widths,
+                        args.img_sizes, args.preset, args.epochs, args.max_trials, args.threads,
+                        args.data_dir)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    selected = report['selected']
+    if selected is None:
+        print("\n✗ No candidate fits the budget")
+        sys.exit(1)
+    print("\n" + "="*60)
+    print(f"  Selected: {selected['architecture']} (width {selected['width']}) at "
+          f"{selected['img_size']}x{selected['img_size']}")
+    print(f"  val_accuracy {selected['best_val_accuracy']:.4f} after {args.epochs} epochs, "
+          f"{selected['tflite_latency_ms']:.2f} ms, {selected['tflite_size_mb']:.3f} MB")
+    print("="*60)
+    print("\nTrain it in full:")
+    print(f"  python training/engine.py --preset {args.preset} --architecture {selected['architecture']} "
+          f"--width {selected['width']} --img-size {selected['img_size']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Keras vs TFLite parity on real data
+
+Runs the Keras model and its exported TFLite variants (by default the
+*.tflite files next to it that tflite_metadata.json records as exported from
+this very model: float, dynamic-range quantized, full-integer...) over the
+whole validation split in batches, and compares each variant with the Keras
+model:
+
+    - top-1 agreement, overall and per class (fraction of each class's
+      images where the variant predicts another class than Keras)
+    - max and mean absolute difference of the class probabilities
+    - accuracy against the labels
+    - single-image latency on --threads interpreter threads, as on the device
+
+The report is written to parity_report.json next to the model. The exit
+status is non-zero if any variant agrees with the Keras model on fewer than
+--min-agreement of the images, so a faster quantized model is only adopted
+when it behaves like the float one.
+
+Usage:
+    python training/parity.py
+    python training/parity.py --min-agreement 0.995 --variants model/isl_model_int8.tflite
+    python training/parity.py --model model/isl_model_qat.h5
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from convert_to_tflite import benchmark_tflite, model_fingerprint, read_sources, split_dataset
+from engine import MODEL_DIR
+from test_model import model_data_dir, tflite_predictor
+
+
+def keras_latency_ms(model, runs=50, warmup=5):
+    """Mean single-image inference time (ms) of a Keras model"""
+    image = tf.random.uniform((1, *model.input_shape[1:]))
+    for _ in range(warmup):
+        model(image, training=False)
+    start = time.perf_counter()
+    for _ in range(runs):
+        model(image, training=False)
+    return 1000 * (time.perf_counter() - start) / runs
+
+
+def compare_outputs(reference, probabilities, labels, class_names):
+    """Agreement and probability differences of a variant's outputs with the reference ones"""
+    reference_top1, top1 = reference.argmax(axis=1), probabilities.argmax(axis=1)
+    disagree = reference_top1 != top1
+    delta = np.abs(probabilities - reference)
+    return {
+        'agreement': float(1 - disagree.mean()),
+        'disagreements': int(disagree.sum()),
+        'per_class_disagreement': {
+            name: round(float(disagree[labels == i].mean()), 4) if np.any(labels == i) else None
+            for i, name in enumerate(class_names)
+        },
+        'max_probability_delta': float(delta.max()),
+        'mean_probability_delta': float(delta.mean()),
+        'accuracy': float(np.mean(top1 == labels)),
+    }
+
+
+def exports_of(model_path):
+    """The TFLite files next to a Keras model that were recorded as exported from it"""
+    model_path = Path(model_path)
+    fingerprint = model_fingerprint(model_path)
+    return sorted(model_path.parent / name for name, source in read_sources(model_path.parent).items()
+                  if source['sha1'] == fingerprint and (model_path.parent / name).exists())
+
+
+def check_parity(model_path, variants=None, batch_size=256, num_threads=1, min_agreement=0.99):
+    """Run the Keras model and the TFLite variants over the validation split; returns the report"""
+    model_path = Path(model_path)
+    if not model_path.exists():
+        raise FileNotFoundError(f"No model found at {model_path}; train one first")
+    variants = [Path(v) for v in variants] if variants else exports_of(model_path)
+    missing = [str(v) for v in variants if not v.exists()]
+    if missing:
+        raise FileNotFoundError(f"No TFLite model at {', '.join(missing)}")
+    if not variants:
+        raise FileNotFoundError(f"No TFLite exports of {model_path.name} recorded in "
+                                f"{model_path.parent / 'tflite_metadata.json'}; run convert_to_tflite.py "
+                                f"(or qat.py, pruning.py) or pass --variants")
+    fingerprint = model_fingerprint(model_path)
+    sources = {path: read_sources(path.parent).get(path.name) for path in variants}
+    for path, source in sources.items():
+        if source is None:
+            print(f"⚠️  No recorded source for {path.name}; it may not come from {model_path.name}")
+        elif source['sha1'] != fingerprint:
+            print(f"⚠️  {path.name} was exported from {source['model']}, not {model_path}")
+
+    print(f"📦 Loading model: {model_path}")
+    model = keras.models.load_model(model_path, compile=False)
+    img_size = tuple(model.input_shape[1:3])
+    labels_path = model_path.parent / 'labels.json'
+    class_names = None
+    if labels_path.exists():
+        with open(labels_path, 'r') as f:
+            labels_json = json.load(f)
+        class_names = [labels_json[str(i)] for i in range(len(labels_json))]
+
+    # Decoded once from the model's own dataset, then fed to every model
+    data_dir = model_data_dir(model_path.parent)
+    dataset = split_dataset('validation', img_size, batch_size, data_dir=data_dir, class_names=class_names)
+    batches = [(images.numpy(), onehot.numpy().argmax(axis=1)) for images, onehot in dataset]
+    labels = np.concatenate([batch_labels for _, batch_labels in batches])
+    class_names = class_names or [str(i) for i in range(model.output_shape[-1])]
+    print(f"🔎 {len(labels)} validation images at {img_size[0]}x{img_size[1]}, "
+          f"{len(variants)} TFLite variant(s)")
+
+    reference = np.concatenate([np.asarray(model.predict_on_batch(images)) for images, _ in batches])
+    report = {
+        'model': str(model_path),
+        'data_dir': str(data_dir),
+        'created_on': datetime.now().isoformat(),
+        'num_images': len(labels),
+        'min_agreement': min_agreement,
+        'num_threads': num_threads,
+        'keras': {
+            'accuracy': float(np.mean(reference.argmax(axis=1) == labels)),
+            'latency_ms': round(keras_latency_ms(model), 3),
+        },
+        'variants': {},
+    }
+
+    for path in variants:
+        print(f"  {path.name}...")
+        interpreter = tf.lite.Interpreter(model_path=str(path))
+        predict = tflite_predictor(interpreter)
+        probabilities = np.concatenate([predict(images) for images, _ in batches])
+        entry = compare_outputs(reference, probabilities, labels, class_names)
+        entry['latency_ms'] = round(benchmark_tflite(path, num_threads=num_threads), 3)
+        entry['size_mb'] = round(path.stat().st_size / (1024 * 1024), 3)
+        entry['source_model'] = sources[path]['model'] if sources[path] else None
+        entry['same_source'] = bool(sources[path]) and sources[path]['sha1'] == fingerprint
+        entry['passes'] = entry['agreement'] >= min_agreement
+        report['variants'][path.name] = entry
+
+    report['passes'] = all(entry['passes'] for entry in report['variants'].values())
+    report_path = model_path.parent / 'parity_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report saved: {report_path}")
+    return report
+
+
+def print_report(report):
+    print("\n" + "="*60)
+    print(f"  Parity with the Keras model ({report['num_images']} validation images)")
+    print("="*60)
+    print(f"  {'Variant':<28} {'Agree':>7} {'Max Δp':>7} {'Mean Δp':>8} {'Acc':>7} {'ms':>6}")
+    print(f"  {'Keras':<28} {'-':>7} {'-':>7} {'-':>8} {report['keras']['accuracy']:>7.4f} "
+          f"{report['keras']['latency_ms']:>6.2f}")
+    for name, entry in report['variants'].items():
+        print(f"  {name:<28} {entry['agreement']:>7.4f} {entry['max_probability_delta']:>7.4f} "
+              f"{entry['mean_probability_delta']:>8.5f} {entry['accuracy']:>7.4f} {entry['latency_ms']:>6.2f}"
+              + ('' if entry['passes'] else '  ✗'))
+        worst = {name: rate for name, rate in entry['per_class_disagreement'].items() if rate}
+        if worst:
+            print("      disagrees on: " + ", ".join(
+                f"{name} {rate:.1%}" for name, rate in sorted(worst.items(), key=lambda item: -item[1])[:5]))
+    print("="*60)
+    if report['passes']:
+        print(f"  ✓ Every variant agrees on at least {report['min_agreement']:.1%} of the images")
+    else:
+        failed = [name for name, entry in report['variants'].items() if not entry['passes']]
+        print(f"  ✗ Below {report['min_agreement']:.1%} agreement: {', '.join(failed)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check TFLite variants against the Keras model on real data")
+    parser.add_argument('--model', default=str(MODEL_DIR / 'isl_model.h5'), help="Reference Keras model")
+    parser.add_argument('--variants', nargs='+',
+                        help="TFLite models to check (default: the recorded exports of --model)")
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help="Lowest top-1 agreement with the Keras model that passes")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--threads', type=int, default=1, help="Interpreter threads for the latency")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Keras / TFLite Parity")
+    print("="*60)
+
+    try:
+        report = check_parity(args.model, args.variants, args.batch_size, args.threads, args.min_agreement)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print_report(report)
+    if not report['passes']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Structured pruning with fine-tuning and a smaller TFLite export
+
+Removes whole filters from every Conv2D and SeparableConv2D (its pointwise
+kernel) and whole units from every hidden Dense layer of a trained Sequential
+model, keeping the ones with the largest L1 weight norm, and rebuilds the
+model with the smaller layers (BatchNorm statistics and the following layer's
+input weights are sliced to match). Pruned layers shrink the next layer too:
+fewer filters before Flatten means fewer rows in the large Dense(512) kernel.
+Every architecture in engine.ARCHITECTURES can be pruned.
+
+Sparsity rises step by step (--sparsities, the fraction of filters/units
+removed per layer) with a short fine-tune after each step. Steps continue
+while validation accuracy stays within --accuracy-budget of the original
+model; the last one that does is exported to --output-dir as isl_model.h5,
+isl_model.tflite and isl_model_quantized.tflite, with labels.json,
+model_config.json and pruning_report.json (parameters, file sizes and
+measured TFLite latency before and after every step).
+
+Usage:
+    python training/pruning.py
+    python training/pruning.py --sparsities 0.25 0.5 0.75 --accuracy-budget 0.005
+    python training/pruning.py --model model/isl_model.h5 --output-dir model/pruned --finetune-epochs 3
+"""
+
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from convert_to_tflite import benchmark_tflite, convert_to_tflite, record_sources, save_tflite_model
+from engine import MODEL_DIR, PRESETS, check_data_directory, jsonable, load_data, make_config
+from test_model import model_data_dir
+
+DEFAULT_SPARSITIES = (0.25, 0.5, 0.625, 0.75)
+
+# Layers whose output filters/units can be pruned
+PRUNABLE = (layers.Conv2D, layers.SeparableConv2D, layers.Dense)
+
+# Layers that carry a channel axis through unchanged
+PASSTHROUGH = (layers.MaxPooling2D, layers.AveragePooling2D, layers.GlobalAveragePooling2D,
+               layers.GlobalMaxPooling2D, layers.Dropout, layers.Activation, layers.ReLU,
+               layers.InputLayer)
+
+
+def output_kernel(layer):
+    """Kernel whose last axis is the layer's output filters/units (pointwise for SeparableConv2D)"""
+    return layer.get_weights()[1 if isinstance(layer, layers.SeparableConv2D) else 0]
+
+
+def filter_importance(layer):
+    """L1 norm of each output filter/unit of a Conv2D, SeparableConv2D or Dense kernel"""
+    kernel = output_kernel(layer)
+    return np.abs(kernel).reshape(-1, kernel.shape[-1]).sum(axis=0)
+
+
+def prune_model(model, keep_fraction):
+    """Smaller copy of a Sequential model keeping keep_fraction of each layer's filters
+
+    `keep_fraction` is a float, or a dict of layer name -> number of
+    filters/units to keep. The output layer is never pruned. Returns the
+    new (uncompiled) model.
+    """
+    if not isinstance(model, keras.Sequential):
+        raise ValueError(f"Only Sequential models can be pruned, got {type(model).__name__}")
+    model_layers = [layer for layer in model.layers if not isinstance(layer, layers.InputLayer)]
+    output_layer = model_layers[-1]
+
+    new_layers, new_weights = [], []
+    kept = None  # Indices of the channels reaching the current layer (None: all)
+    for layer in model_layers:
+        config = layer.get_config()
+        weights = layer.get_weights()
+
+        if isinstance(layer, PRUNABLE):
+            if isinstance(layer, layers.SeparableConv2D):
+                depthwise, kernel, *rest = weights
+                if kept is not None:
+                    # Pointwise input index = channel * depth_multiplier + multiplier
+                    multiplier = depthwise.shape[-1]
+                    depthwise = depthwise[..., kept, :]
+                    kernel = kernel[..., (kept[:, None] * multiplier + np.arange(multiplier)).ravel(), :]
+                head = [depthwise]
+            else:
+                (kernel, *rest), head = weights, []
+                if kept is not None:
+                    kernel = kernel[..., kept, :]
+            if layer is output_layer:
+                kept = None
+            else:
+                size = kernel.shape[-1]
+                keep = (keep_fraction.get(layer.name, size) if isinstance(keep_fraction, dict)
+                        else int(np.ceil(size * keep_fraction)))
+                kept = np.sort(np.argsort(filter_importance(layer))[::-1][:max(1, keep)])
+                kernel = kernel[..., kept]
+                rest = [w[kept] for w in rest]
+                config['units' if isinstance(layer, layers.Dense) else 'filters'] = len(kept)
+            weights = [*head, kernel, *rest]
+        elif isinstance(layer, layers.BatchNormalization):
+            if kept is not None:
+                weights = [w[kept] for w in weights]
+        elif isinstance(layer, layers.Flatten):
+            if kept is not None:
+                # channels_last: flat index = position * channels + channel
+                height, width, channels = layer.input.shape[1:]
+                positions = np.arange(height * width)[:, None] * channels
+                kept = (positions + kept[None, :]).ravel()
+        elif weights or not isinstance(layer, PASSTHROUGH):
+            raise ValueError(f"Cannot prune through a {type(layer).__name__} layer; pruning supports "
+                             f"Sequential models built from Conv2D, SeparableConv2D, Dense, "
+                             f"BatchNormalization, Flatten and pooling layers "
+                             f"(every architecture in engine.ARCHITECTURES)")
+
+        new_layers.append(layer.__class__.from_config(config))
+        new_weights.append(weights)
+
+    pruned = keras.Sequential([keras.Input(model.input_shape[1:]), *new_layers], name=model.name)
+    for layer, weights in zip(new_layers, new_weights):
+        layer.set_weights(weights)
+    return pruned
+
+
+def layer_sizes(model):
+    """Filters/units of each Conv2D, SeparableConv2D and Dense layer, by name"""
+    return {layer.name: output_kernel(layer).shape[-1] for layer in model.layers
+            if isinstance(layer, PRUNABLE)}
+
+
+def measure(model, val_data):
+    """Accuracy, parameters, file sizes and TFLite latency of a model"""
+    evaluation = model.evaluate(val_data, verbose=0, return_dict=True)
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        model.save(tmp_dir / 'model.h5', include_optimizer=False)
+        h5_size = (tmp_dir / 'model.h5').stat().st_size
+    finally:
+        shutil.rmtree(tmp_dir)
+    tflite_model = convert_to_tflite(model, quantize=True)
+    return {
+        'val_accuracy': float(evaluation['accuracy']),
+        'params': int(model.count_params()),
+        'h5_size_mb': round(h5_size / (1024 * 1024), 3),
+        'tflite_size_mb': round(len(tflite_model) / (1024 * 1024), 3),
+        'tflite_latency_ms': round(benchmark_tflite(tflite_model), 3),
+    }
+
+
+def compile_for_finetune(model, learning_rate):
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+def prune(model_path, output_dir, sparsities=DEFAULT_SPARSITIES, accuracy_budget=0.01,
+          finetune_epochs=2, learning_rate=0.0005, preset=None, data_dir=None, batch_size=None):
+    """Prune a saved model step by step within an accuracy budget and export it
+
+    Returns the report dict (also saved as pruning_report.json); its
+    'exported' step is None if no step stayed within the budget.
+    """
+    model_path = Path(model_path)
+    output_dir = Path(output_dir)
+    if not model_path.exists():
+        raise FileNotFoundError(f"No model found at {model_path}; train one first")
+
+    model_config = {}
+    config_path = model_path.parent / 'model_config.json'
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            model_config = json.load(f)
+
+    print(f"📦 Loading model: {model_path}")
+    original = keras.models.load_model(model_path, compile=False)
+    # Fine-tune on the model's own dataset unless told otherwise
+    overrides = {'img_size': tuple(original.input_shape[1:3]),
+                 'data_dir': data_dir or model_data_dir(model_path.parent)}
+    if batch_size:
+        overrides['batch_size'] = batch_size
+    config = make_config(preset or model_config.get('preset', 'fast'), **overrides)
+    if not check_data_directory(config):
+        raise FileNotFoundError(f"No dataset found in {config['data_dir']}")
+    train_data, val_data, info = load_data(config, config['batch_size'])
+
+    print("\n📏 Measuring the original model...")
+    baseline = measure(compile_for_finetune(original, learning_rate), val_data)
+    floor = baseline['val_accuracy'] - accuracy_budget
+    print(f"  val_accuracy {baseline['val_accuracy']:.4f} (floor {floor:.4f}), "
+          f"{baseline['params']:,} params, {baseline['tflite_latency_ms']:.2f} ms")
+
+    original_sizes = layer_sizes(original)
+    steps, best, model = [], None, original
+    for sparsity in sparsities:
+        # Sizes are relative to the original model, so each step prunes a bit more
+        targets = {name: max(1, int(np.ceil(size * (1 - sparsity)))) for name, size in original_sizes.items()}
+        print(f"\n✂️  Pruning to sparsity {sparsity:.0%}...")
+        candidate = compile_for_finetune(prune_model(model, targets), learning_rate)
+        candidate.fit(train_data, validation_data=val_data, epochs=finetune_epochs, verbose=2)
+        step = {'sparsity': sparsity, 'layer_sizes': layer_sizes(candidate), **measure(candidate, val_data)}
+        step['within_budget'] = step['val_accuracy'] >= floor
+        steps.append(step)
+        print(f"  val_accuracy {step['val_accuracy']:.4f}, {step['params']:,} params, "
+              f"{step['tflite_latency_ms']:.2f} ms")
+        if not step['within_budget']:
+            print(f"  ✗ Below the accuracy floor; keeping sparsity {best['sparsity']:.0%}" if best
+                  else "  ✗ Below the accuracy floor")
+            break
+        best, model = step, candidate
+
+    report = {
+        'model': str(model_path),
+        'data_dir': str(config['data_dir']),
+        'pruned_on': datetime.now().isoformat(),
+        'method': 'structured L1-norm filter/unit pruning',
+        'accuracy_budget': accuracy_budget,
+        'finetune_epochs': finetune_epochs,
+        'learning_rate': learning_rate,
+        'original': {'layer_sizes': original_sizes, **baseline},
+        'steps': steps,
+        'exported': best['sparsity'] if best else None,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if best:
+        save_pruned(model, model_path, output_dir, {**model_config, 'data_dir': str(config['data_dir'])},
+                    info['class_indices'], best)
+    with open(output_dir / 'pruning_report.json', 'w') as f:
+        json.dump(jsonable(report), f, indent=2)
+    print(f"✓ Report saved: {output_dir / 'pruning_report.json'}")
+    return report
+
+
+def save_pruned(model, model_path, output_dir, model_config, class_indices, step):
+    """Save the pruned model, its TFLite conversions, labels and model_config.json"""
+    print("\n💾 Saving pruned model...")
+    out_path = output_dir / 'isl_model.h5'
+    model.save(out_path, include_optimizer=False)
+    print(f"✓ Model saved: {out_path}")
+    save_tflite_model(convert_to_tflite(model), output_dir / 'isl_model.tflite')
+    save_tflite_model(convert_to_tflite(model, quantize=True), output_dir / 'isl_model_quantized.tflite')
+    record_sources(out_path, [output_dir / 'isl_model.tflite', output_dir / 'isl_model_quantized.tflite'])
+
+    labels_path = output_dir / 'labels.json'
+    with open(labels_path, 'w') as f:
+        json.dump({v: k for k, v in class_indices.items()}, f, indent=2)
+
+    model_config = {**model_config, 'final_val_accuracy': step['val_accuracy'],
+                    'pruned_from': str(model_path), 'pruning_sparsity': step['sparsity']}
+    with open(output_dir / 'model_config.json', 'w') as f:
+        json.dump(model_config, f, indent=2)
+
+
+def print_report(report):
+    print("\n" + "="*60)
+    print("  Pruning Report")
+    print("="*60)
+    print(f"  {'Sparsity':>8} {'Params':>10} {'H5 MB':>7} {'TFLite MB':>9} {'Latency ms':>10} {'Val acc':>7}")
+    rows = [('original', report['original'])] + [(f"{s['sparsity']:.0%}", s) for s in report['steps']]
+    for name, row in rows:
+        mark = '' if row.get('within_budget', True) else '  ✗'
+        print(f"  {name:>8} {row['params']:>10,} {row['h5_size_mb']:>7.2f} {row['tflite_size_mb']:>9.3f} "
+              f"{row['tflite_latency_ms']:>10.2f} {row['val_accuracy']:>7.4f}{mark}")
+    print("="*60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured pruning of the ISL model")
+    parser.add_argument('--model', default=str(MODEL_DIR / 'isl_model.h5'))
+    parser.add_argument('--output-dir', default=str(MODEL_DIR / 'pruned'))
+    parser.add_argument('--sparsities', type=float, nargs='+', default=list(DEFAULT_SPARSITIES),
+                        help="Fraction of filters/units removed per layer, one per step")
+    parser.add_argument('--accuracy-budget', type=float, default=0.01,
+                        help="Largest validation accuracy drop allowed")
+    parser.add_argument('--finetune-epochs', type=int, default=2, help="Fine-tune epochs after each step")
+    parser.add_argument('--learning-rate', type=float, default=0.0005)
+    parser.add_argument('--preset', choices=list(PRESETS),
+                        help="Data settings to fine-tune with (default: the model's)")
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--data-dir', help="Dataset to fine-tune on (default: the model's, from model_config.json)")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Model Pruning")
+    print("="*60)
+
+    try:
+        report = prune(args.model, args.output_dir, sorted(args.sparsities), args.accuracy_budget,
+                       args.finetune_epochs, args.learning_rate, args.preset, args.data_dir,
+                       args.batch_size)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print_report(report)
+    if report['exported'] is None:
+        print(f"\n✗ No pruning step stayed within {args.accuracy_budget} of the original accuracy")
+        sys.exit(1)
+    print(f"\n✓ Pruned model (sparsity {report['exported']:.0%}) saved in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
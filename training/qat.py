@@ -0,0 +1,289 @@
+"""
+Quantization-aware fine-tuning for the full-integer TFLite model
+
+If full-integer post-training quantization (convert_to_tflite.py --int8)
+costs too much accuracy, fine-tune the trained model with 8-bit
+quantization simulated in the forward pass: Conv2D and Dense kernels are
+rounded to their int8 grid (per output channel for Conv2D, per tensor for
+Dense, as the TFLite kernels do) and the input and every Conv2D, Dense and
+BatchNormalization output go through a fake-quantization op with moving
+min/max ranges. Gradients pass straight through the rounding, so the
+weights learn to tolerate it.
+
+The fine-tuned weights, snapped to the int8 grid, are put back into the
+plain architecture (isl_model_qat.h5) and exported with the same
+full-integer converter as post-training quantization
+(isl_model_qat_int8.tflite). The starting model is also quantized without
+fine-tuning, under its own name (isl_model_best_int8.tflite for
+isl_model_best.h5), and qat_report.json lists both side by side -
+validation accuracy of the integer model, accuracy drop, latency and size.
+It recommends the more accurate one that meets --accuracy-floor, or the
+other one if it also passes and is faster by more than the benchmark noise.
+
+Usage:
+    python training/qat.py
+    python training/qat.py --model model/isl_model.h5 --epochs 5 --accuracy-floor 0.97
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from convert_to_tflite import benchmark_tflite, quantize_int8, record_sources
+from engine import MODEL_DIR, PRESETS, check_data_directory, load_data, make_config
+from test_model import load_labels, model_data_dir
+
+# Both integer models share a graph, so their latencies differ only by noise
+# unless one is faster by more than this fraction (median of LATENCY_RUNS)
+LATENCY_RUNS = 5
+LATENCY_NOISE = 0.1
+
+
+def fake_quant_kernel(kernel, per_channel):
+    """Kernel rounded to the symmetric int8 grid, with a straight-through gradient"""
+    if per_channel:
+        limit = tf.stop_gradient(tf.reduce_max(tf.abs(kernel), axis=list(range(len(kernel.shape) - 1))))
+        return tf.quantization.fake_quant_with_min_max_vars_per_channel(
+            kernel, -limit, limit, num_bits=8, narrow_range=True)
+    limit = tf.stop_gradient(tf.reduce_max(tf.abs(kernel)))
+    return tf.quantization.fake_quant_with_min_max_vars(kernel, -limit, limit, num_bits=8, narrow_range=True)
+
+
+class QuantizedConv2D(layers.Conv2D):
+    """Conv2D computing with its kernel rounded to int8, per output channel"""
+
+    def convolution_op(self, inputs, kernel):
+        return super().convolution_op(inputs, fake_quant_kernel(kernel, per_channel=True))
+
+
+class QuantizedDense(layers.Dense):
+    """Dense computing with its kernel rounded to int8"""
+
+    def call(self, inputs):
+        outputs = tf.matmul(inputs, fake_quant_kernel(self.kernel, per_channel=False))
+        if self.use_bias:
+            outputs = tf.nn.bias_add(outputs, self.bias)
+        return self.activation(outputs) if self.activation is not None else outputs
+
+
+class FakeQuant(layers.Layer):
+    """Simulated 8-bit activations over a moving-average min/max range"""
+
+    def __init__(self, momentum=0.99, **kwargs):
+        super().__init__(**kwargs)
+        self.momentum = momentum
+
+    def build(self, input_shape):
+        self.range_min = self.add_weight(name='range_min', shape=(), initializer='zeros', trainable=False)
+        self.range_max = self.add_weight(name='range_max', shape=(), initializer='zeros', trainable=False)
+        self.seen = self.add_weight(name='seen', shape=(), initializer='zeros', trainable=False)
+
+    def call(self, inputs, training=None):
+        if training:
+            # The range always contains 0, which must be exactly representable
+            batch_min = tf.minimum(tf.reduce_min(inputs), 0.0)
+            batch_max = tf.maximum(tf.reduce_max(inputs), 0.0)
+            first = tf.equal(self.seen, 0.0)
+            self.range_min.assign(tf.where(first, batch_min,
+                                           self.momentum * self.range_min + (1 - self.momentum) * batch_min))
+            self.range_max.assign(tf.where(first, batch_max,
+                                           self.momentum * self.range_max + (1 - self.momentum) * batch_max))
+            self.seen.assign(1.0)
+        return tf.quantization.fake_quant_with_min_max_vars(
+            inputs, tf.convert_to_tensor(self.range_min), tf.convert_to_tensor(self.range_max), num_bits=8)
+
+    def get_config(self):
+        return {**super().get_config(), 'momentum': self.momentum}
+
+
+QUANTIZED_LAYERS = {layers.Conv2D: QuantizedConv2D, layers.Dense: QuantizedDense}
+
+
+def quantize_model(model):
+    """Quantization-aware copy of a Sequential model, with the same weights"""
+    if not isinstance(model, keras.Sequential):
+        raise ValueError(f"Only Sequential models are supported, got {type(model).__name__}")
+    qat_layers = [FakeQuant(name='input_quant')]
+    model_layers = [layer for layer in model.layers if not isinstance(layer, layers.InputLayer)]
+    for layer in model_layers:
+        quantized = QUANTIZED_LAYERS.get(type(layer))
+        new_layer = (quantized or type(layer)).from_config(layer.get_config())
+        qat_layers.append(new_layer)
+        if quantized or isinstance(layer, layers.BatchNormalization):
+            qat_layers.append(FakeQuant(name=f'{layer.name}_quant'))
+
+    qat_model = keras.Sequential([keras.Input(model.input_shape[1:]), *qat_layers], name=f'{model.name}_qat')
+    for layer in model_layers:
+        qat_model.get_layer(layer.name).set_weights(layer.get_weights())
+    return qat_model
+
+
+def strip_quantization(qat_model, model):
+    """The original architecture with the fine-tuned weights, kernels snapped to their int8 grid"""
+    stripped = keras.Sequential.from_config(model.get_config())
+    for layer in stripped.layers:
+        qat_layer = qat_model.get_layer(layer.name)
+        weights = qat_layer.get_weights()
+        if isinstance(qat_layer, tuple(QUANTIZED_LAYERS.values())):
+            weights[0] = fake_quant_kernel(tf.constant(weights[0]),
+                                           per_channel=isinstance(qat_layer, layers.Conv2D)).numpy()
+        layer.set_weights(weights)
+    return stripped
+
+
+def finetune(model, train_data, val_data, epochs=3, learning_rate=0.0001):
+    """Quantization-aware fine-tune of a float model; returns the stripped float model"""
+    qat_model = quantize_model(model)
+    qat_model.compile(optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+    qat_model.fit(train_data, validation_data=val_data, epochs=epochs, verbose=2)
+    return strip_quantization(qat_model, model)
+
+
+def recommend(variants, noise=LATENCY_NOISE):
+    """The most accurate passing variant, unless another passing one is clearly faster"""
+    passing = sorted((name for name, entry in variants.items() if entry['passes']),
+                     key=lambda name: -variants[name]['val_accuracy'])
+    if not passing:
+        return None
+    best = passing[0]
+    for name in passing[1:]:
+        if variants[name]['latency_ms'] < (1 - noise) * variants[best]['latency_ms']:
+            best = name
+    return best
+
+
+def compare(model_path, output_dir=MODEL_DIR, epochs=3, learning_rate=0.0001, accuracy_floor=0.95,
+            calibration_samples=200, preset=None, batch_size=None, data_dir=None):
+    """Fine-tune with QAT, export both integer models and write qat_report.json
+
+    data_dir defaults to the dataset in the model's model_config.json.
+    """
+    model_path = Path(model_path)
+    output_dir = Path(output_dir)
+    if not model_path.exists():
+        raise FileNotFoundError(f"No model found at {model_path}; train one first")
+
+    model_config = {}
+    config_path = model_path.parent / 'model_config.json'
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            model_config = json.load(f)
+
+    print(f"📦 Loading model: {model_path}")
+    model = keras.models.load_model(model_path, compile=False)
+    overrides = {'img_size': tuple(model.input_shape[1:3]),
+                 'data_dir': data_dir or model_data_dir(model_path.parent)}
+    if batch_size:
+        overrides['batch_size'] = batch_size
+    config = make_config(preset or model_config.get('preset', 'fast'), **overrides)
+    if not check_data_directory(config):
+        raise FileNotFoundError(f"No dataset found in {config['data_dir']}")
+    train_data, val_data, info = load_data(config, config['batch_size'])
+    labels = load_labels(model_path.parent)
+    class_names = ([labels[str(i)] for i in range(len(labels))] if labels
+                   else sorted(info['class_indices'], key=info['class_indices'].get))
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("\n" + "="*60)
+    print("Post-training quantization (no fine-tuning)")
+    print("="*60)
+    # Not isl_model_int8.tflite, which convert_to_tflite.py exports from isl_model.h5
+    ptq = quantize_int8(model, output_dir / f'{model_path.stem}_int8.tflite',
+                        calibration_samples=calibration_samples, data_dir=config['data_dir'],
+                        class_names=class_names)
+
+    print("\n" + "="*60)
+    print(f"Quantization-aware fine-tuning ({epochs} epochs)")
+    print("="*60)
+    qat_model = finetune(model, train_data, val_data, epochs, learning_rate)
+    qat_path = output_dir / 'isl_model_qat.h5'
+    qat_model.save(qat_path, include_optimizer=False)
+    print(f"✓ Model saved: {qat_path}")
+    qat = quantize_int8(qat_model, output_dir / 'isl_model_qat_int8.tflite',
+                        calibration_samples=calibration_samples, data_dir=config['data_dir'],
+                        class_names=class_names)
+
+    ptq['source_model'], qat['source_model'] = str(model_path), str(qat_path)
+    variants = {'ptq': ptq, 'qat': qat}
+    for entry in variants.values():
+        record_sources(entry['source_model'], [output_dir / entry['model_file']])
+    for entry in variants.values():
+        entry['accuracy_drop'] = round(entry['float_val_accuracy'] - entry['val_accuracy'], 4)
+        tflite_path = output_dir / entry['model_file']
+        entry['latency_ms'] = round(float(np.median(
+            [benchmark_tflite(tflite_path) for _ in range(LATENCY_RUNS)])), 3)
+        entry['size_mb'] = round(tflite_path.stat().st_size / (1024 * 1024), 3)
+        entry['passes'] = entry['val_accuracy'] >= accuracy_floor
+    report = {
+        'model': str(model_path),
+        'data_dir': str(config['data_dir']),
+        'created_on': datetime.now().isoformat(),
+        'accuracy_floor': accuracy_floor,
+        'qat_epochs': epochs,
+        'learning_rate': learning_rate,
+        **variants,
+        'recommended': recommend(variants),
+    }
+    with open(output_dir / 'qat_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report saved: {output_dir / 'qat_report.json'}")
+    return report
+
+
+def print_report(report):
+    print("\n" + "="*60)
+    print("  Full-integer models")
+    print("="*60)
+    print(f"  {'Variant':<8} {'Float acc':>9} {'Int8 acc':>8} {'Drop':>7} {'Latency ms':>10} {'Size MB':>8}")
+    for name in ('ptq', 'qat'):
+        entry = report[name]
+        print(f"  {name.upper():<8} {entry['float_val_accuracy']:>9.4f} {entry['val_accuracy']:>8.4f} "
+              f"{entry['accuracy_drop']:>7.4f} {entry['latency_ms']:>10.2f} {entry['size_mb']:>8.3f}"
+              + ('' if entry['passes'] else '  ✗'))
+    print("="*60)
+    if report['recommended']:
+        print(f"  Recommended: {report['recommended'].upper()} ({report[report['recommended']]['model_file']})")
+    else:
+        print(f"  Neither variant reaches {report['accuracy_floor']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantization-aware fine-tuning of the ISL model")
+    parser.add_argument('--model', default=str(MODEL_DIR / 'isl_model_best.h5'))
+    parser.add_argument('--output-dir', default=str(MODEL_DIR))
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--learning-rate', type=float, default=0.0001)
+    parser.add_argument('--accuracy-floor', type=float, default=0.95)
+    parser.add_argument('--calibration-samples', type=int, default=200)
+    parser.add_argument('--preset', choices=list(PRESETS),
+                        help="Data settings to fine-tune with (default: the model's)")
+    parser.add_argument('--batch-size', type=int)
+    parser.add_argument('--data-dir', help="Dataset to fine-tune on (default: the model's, from model_config.json)")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("  ISL Quantization-Aware Training")
+    print("="*60)
+
+    try:
+        report = compare(args.model, args.output_dir, args.epochs, args.learning_rate, args.accuracy_floor,
+                         args.calibration_samples, args.preset, args.batch_size, args.data_dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print_report(report)
+    if report['recommended'] is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
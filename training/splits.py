@@ -0,0 +1,300 @@
+"""
+Persistent stratified train/validation/test split with k-fold support
+
+Assigns every image once to a subset and stores the assignment in
+data/splits/<dataset key>.json (ISL-d82338bb.json for data/ISL; see
+dataset_manifest.dataset_key). The split is stratified per class, seeded,
+and can be grouped by near-duplicate cluster (see dedup_index.py) so near-
+identical frames never straddle two subsets. Training, evaluation and export
+all read the same file, so benchmark numbers are comparable across runs.
+
+With --folds K, the non-test images are also spread over K folds for
+cross-validation: fold k is the validation set and the other folds train.
+
+Usage:
+    python training/splits.py create --folds 5 --clusters data/.cache/clusters_ISL-d82338bb_r4.json
+    python training/splits.py show
+"""
+
+import json
+import random
+import hashlib
+import argparse
+from pathlib import Path
+from collections import defaultdict
+
+from dataset_manifest import dataset_key, load_manifest, same_dataset
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_DIR = PROJECT_ROOT / "data" / "ISL"
+SPLITS_DIR = PROJECT_ROOT / "data" / "splits"
+
+SPLIT_VERSION = 1
+SUBSETS = ('train', 'validation', 'test')
+
+
+def split_path_for(data_dir):
+    return SPLITS_DIR / f"{dataset_key(data_dir)}.json"
+
+
+def _pick_groups(groups, target):
+    """Greedily take whole groups while that brings the count closer to target"""
+    taken, rest, count = [], [], 0
+    for members in groups:
+        if abs(count + len(members) - target) < abs(count - target):
+            taken.append(members)
+            count += len(members)
+        else:
+            rest.append(members)
+    return taken, rest
+
+
+def _assign_folds(groups, num_folds):
+    """Spread groups over folds, largest first into the smallest fold"""
+    folds = {}
+    sizes = [0] * num_folds
+    for members in sorted(groups, key=len, reverse=True):
+        fold = sizes.index(min(sizes))
+        sizes[fold] += len(members)
+        for path in members:
+            folds[path] = fold
+    return folds
+
+
+def _stable_fraction(seed, path):
+    """Deterministic pseudo-random number in [0, 1) for a path"""
+    digest = hashlib.sha1(f"{seed}:{path}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2**64
+
+
+def list_dataset(data_dir):
+    """{class name: relative paths} of a dataset, or None if there is none
+
+    Reads the manifest, or the decoded cache when the images were ingested
+    straight from an archive (ingest_zip.py) and have no folder on disk.
+    """
+    manifest = load_manifest(data_dir)
+    if manifest is not None:
+        return {name: [entry['path'] for entry in manifest.files(name)]
+                for name in manifest.class_names}
+
+    from dataset_cache import cached_file_lists
+    return cached_file_lists(data_dir)
+
+
+def create_split(data_dir=DATA_DIR, validation_split=0.2, test_split=0.1, seed=42,
+                 clusters_file=None, num_folds=0):
+    """Compute a new split assignment for data_dir
+
+    Returns the split dict (see save_split for the layout).
+    """
+    dataset = list_dataset(data_dir)
+    if dataset is None:
+        raise FileNotFoundError(f"Data directory not found: {data_dir}")
+
+    cluster_of = {}
+    if clusters_file:
+        from dedup_index import load_cluster_groups
+        cluster_of = load_cluster_groups(clusters_file)
+
+    files = {}
+    for class_name, paths in dataset.items():
+        grouped = defaultdict(list)
+        for path in paths:
+            grouped[cluster_of.get(path, path)].append(path)
+
+        # Same class always shuffles the same way for a given seed
+        groups = list(grouped.values())
+        random.Random(f"{seed}:{class_name}").shuffle(groups)
+        total = sum(len(g) for g in groups)
+
+        test_groups, rest = _pick_groups(groups, int(test_split * total))
+        val_groups, train_groups = _pick_groups(rest, int(validation_split * total))
+
+        for subset, subset_groups in (('test', test_groups), ('validation', val_groups),
+                                      ('train', train_groups)):
+            for members in subset_groups:
+                for path in members:
+                    files[path] = [subset, None]
+
+        if num_folds:
+            for path, fold in _assign_folds(val_groups + train_groups, num_folds).items():
+                files[path][1] = fold
+
+    return {
+        'version': SPLIT_VERSION,
+        'data_dir': str(data_dir),
+        'seed': seed,
+        'validation_split': validation_split,
+        'test_split': test_split,
+        'clusters_file': str(clusters_file) if clusters_file else None,
+        'num_folds': num_folds,
+        'class_names': sorted(dataset),
+        'files': files,
+    }
+
+
+def save_split(split, split_file):
+    """Write a split as {relative path: [subset, fold]} plus its parameters"""
+    split_file = Path(split_file)
+    split_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(split_file, 'w') as f:
+        json.dump(split, f, indent=1)
+
+
+def load_split(split_file):
+    with open(split_file, 'r') as f:
+        split = json.load(f)
+    if split.get('version') != SPLIT_VERSION:
+        raise ValueError(f"Unsupported split file version in {split_file}")
+    return split
+
+
+def same_data_dir(split, data_dir):
+    """True if the split was created for data_dir"""
+    return same_dataset(split['data_dir'], data_dir)
+
+
+def refresh_split(split, data_dir):
+    """Drop deleted files and assign new ones without moving existing ones
+
+    New files land in a subset (and fold) chosen from a stable hash of their
+    path, in the configured proportions. Returns True if anything changed.
+    Raises ValueError if the split belongs to another dataset.
+    """
+    if not same_data_dir(split, data_dir):
+        raise ValueError(f"Split file is for {split['data_dir']}, not {data_dir}; "
+                         f"use splits.split_path_for(data_dir)")
+    dataset = list_dataset(data_dir)
+    if dataset is None:
+        return False
+    current = {path for paths in dataset.values() for path in paths}
+    files = split['files']
+    changed = False
+
+    for path in [p for p in files if p not in current]:
+        del files[path]
+        changed = True
+
+    for path in sorted(current - set(files)):
+        u = _stable_fraction(split['seed'], path)
+        if u < split['test_split']:
+            subset = 'test'
+        elif u < split['test_split'] + split['validation_split']:
+            subset = 'validation'
+        else:
+            subset = 'train'
+        fold = None
+        if split['num_folds'] and subset != 'test':
+            fold = int(_stable_fraction(split['seed'] + 1, path) * split['num_folds'])
+        files[path] = [subset, fold]
+        changed = True
+
+    if sorted(dataset) != split['class_names']:
+        split['class_names'] = sorted(dataset)
+        changed = True
+    return changed
+
+
+def ensure_split(split_file, data_dir=DATA_DIR, **params):
+    """Load the split file, creating it (with params) if it does not exist
+
+    An existing file always wins over params so assignments stay stable;
+    new or deleted images are reconciled in place. A file created for
+    another data directory raises ValueError instead of being rewritten.
+    """
+    split_file = Path(split_file)
+    if not split_file.exists():
+        print(f"📋 Creating split file: {split_file}")
+        split = create_split(data_dir, **params)
+        save_split(split, split_file)
+        return split
+
+    split = load_split(split_file)
+    if refresh_split(split, data_dir):
+        save_split(split, split_file)
+    return split
+
+
+def split_files(split, subset, fold=None):
+    """Relative paths, labels and class indices of one subset
+
+    With `fold`, 'validation' is that fold of the non-test images and
+    'train' is every other fold. Paths come back in class and file order.
+    """
+    if subset not in SUBSETS:
+        raise ValueError(f"Invalid subset: {subset!r} (expected one of {SUBSETS})")
+    if fold is not None and not split['num_folds']:
+        raise ValueError("Split file has no folds; recreate it with --folds K")
+
+    class_indices = {name: i for i, name in enumerate(split['class_names'])}
+    paths = []
+    for path, (assigned, assigned_fold) in split['files'].items():
+        if fold is None or subset == 'test':
+            selected = assigned == subset
+        elif subset == 'validation':
+            selected = assigned != 'test' and assigned_fold == fold
+        else:
+            selected = assigned != 'test' and assigned_fold != fold
+        if selected:
+            paths.append(path)
+
+    paths.sort(key=lambda p: (class_indices[p.split('/', 1)[0]], p))
+    labels = [class_indices[p.split('/', 1)[0]] for p in paths]
+    return paths, labels, class_indices
+
+
+def show_split(split):
+    counts = defaultdict(lambda: defaultdict(int))
+    for path, (subset, _) in split['files'].items():
+        counts[path.split('/', 1)[0]][subset] += 1
+
+    print(f"\n📋 Split of {split['data_dir']} (seed {split['seed']}"
+          f"{', grouped by ' + split['clusters_file'] if split['clusters_file'] else ''})")
+    print(f"   {'class':>8} {'train':>7} {'val':>7} {'test':>7}")
+    for class_name in split['class_names']:
+        c = counts[class_name]
+        print(f"   {class_name:>8} {c['train']:7d} {c['validation']:7d} {c['test']:7d}")
+    totals = [sum(c[s] for c in counts.values()) for s in SUBSETS]
+    print(f"   {'total':>8} {totals[0]:7d} {totals[1]:7d} {totals[2]:7d}")
+    if split['num_folds']:
+        print(f"   Folds: {split['num_folds']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or inspect the persistent dataset split")
+    parser.add_argument('--data-dir', default=str(DATA_DIR))
+    parser.add_argument('--split-file', default=None, help="Default: data/splits/<dataset key>.json")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('create', help="Compute a new split (overwrites the split file)")
+    p.add_argument('--validation-split', type=float, default=0.2)
+    p.add_argument('--test-split', type=float, default=0.1)
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--clusters', default=None, help="Clusters file from dedup_index.py")
+    p.add_argument('--folds', type=int, default=0, help="Number of cross-validation folds")
+
+    sub.add_parser('show', help="Print per-class subset counts")
+    args = parser.parse_args()
+
+    split_file = Path(args.split_file) if args.split_file else split_path_for(args.data_dir)
+
+    if args.command == 'create':
+        split = create_split(
+            args.data_dir,
+            validation_split=args.validation_split,
+            test_split=args.test_split,
+            seed=args.seed,
+            clusters_file=args.clusters,
+            num_folds=args.folds
+        )
+        save_split(split, split_file)
+        print(f"✓ Split saved: {split_file}")
+    else:
+        split = ensure_split(split_file, args.data_dir)
+
+    show_split(split)
+
+
+if __name__ == "__main__":
+    main()
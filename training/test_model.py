@@ -2,23 +2,40 @@
 Test the trained model with sample images
 
 This script tests the trained model or TFLite model with images from the dataset.
+
+The evaluate mode runs a whole split subset (the held-out test set by
+default) through the model in large batches, decoding images in parallel at
+the input size from the model metadata, and reports accuracy, top-k
+accuracy, per-class precision/recall, the confusion matrix and images/sec.
+
+Usage:
+    python training/test_model.py [keras|tflite|compare]
+    python training/test_model.py evaluate --model-type tflite --model model/isl_model_quantized.tflite
+    python training/test_model.py evaluate --split validation --batch-size 512 --report report.json
 """
 
 import tensorflow as tf
 import numpy as np
+import os
+import sys
 import json
+import time
+import argparse
 from pathlib import Path
 from PIL import Image
 import random
 
+from data_pipeline import make_dataset
+from dataset_manifest import load_manifest
+from splits import DATA_DIR, ensure_split, load_split, split_files, split_path_for
+
 # Configuration
 PROJECT_ROOT = Path(__file__).parent.parent
 MODEL_DIR = PROJECT_ROOT / "model"
-DATA_DIR = PROJECT_ROOT / "data" / "indian-sign-language-isl"
 
-def load_labels():
+def load_labels(model_dir=MODEL_DIR):
     """Load class labels"""
-    labels_path = MODEL_DIR / 'labels.json'
+    labels_path = model_dir / 'labels.json'
     if not labels_path.exists():
         print("⚠ Labels file not found. Using directory names.")
         return None
@@ -28,9 +45,43 @@ def load_labels():
     
     return labels
 
-def load_keras_model():
+def model_input_size(model_dir=MODEL_DIR):
+    """Input (height, width) from model_config.json or tflite_metadata.json, or None"""
+    config_path = model_dir / 'model_config.json'
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            return tuple(json.load(f)['img_size'])
+    
+    metadata_path = model_dir / 'tflite_metadata.json'
+    if metadata_path.exists():
+        with open(metadata_path, 'r') as f:
+            return tuple(json.load(f)['input_shape'][:2])
+    
+    return None
+
+def model_data_dir(model_dir=MODEL_DIR):
+    """Dataset the model was trained on, from model_config.json, else the default one"""
+    config_path = model_dir / 'model_config.json'
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            data_dir = json.load(f).get('data_dir')
+        if data_dir:
+            return Path(data_dir)
+    return DATA_DIR
+
+def input_size_of(model, model_type, model_dir=MODEL_DIR):
+    """Input (height, width) of a model: its metadata, else its input tensor"""
+    size = model_input_size(model_dir)
+    if size is not None:
+        return size
+    
+    if model_type == 'keras':
+        return tuple(model.input_shape[1:3])
+    return tuple(int(d) for d in model.get_input_details()[0]['shape'][1:3])
+
+def load_keras_model(model_path=None):
     """Load trained Keras model"""
-    model_path = MODEL_DIR / "isl_model.h5"
+    model_path = Path(model_path) if model_path else MODEL_DIR / "isl_model.h5"
     
     if not model_path.exists():
         print(f"✗ Keras model not found: {model_path}")
@@ -41,24 +92,24 @@ def load_keras_model():
     print(f"✓ Model loaded")
     return model
 
-def load_tflite_model():
+def load_tflite_model(tflite_path=None, num_threads=None):
     """Load TFLite model"""
-    tflite_path = MODEL_DIR / "isl_model.tflite"
+    tflite_path = Path(tflite_path) if tflite_path else MODEL_DIR / "isl_model.tflite"
     
     if not tflite_path.exists():
         print(f"✗ TFLite model not found: {tflite_path}")
         return None
     
     print(f"📦 Loading TFLite model...")
-    interpreter = tf.lite.Interpreter(model_path=str(tflite_path))
+    interpreter = tf.lite.Interpreter(model_path=str(tflite_path), num_threads=num_threads)
     interpreter.allocate_tensors()
     print(f"✓ TFLite model loaded")
     return interpreter
 
-def preprocess_image(image_path, target_size=(224, 224)):
-    """Preprocess image for model input"""
+def preprocess_image(image_path, target_size):
+    """Preprocess image for model input (target_size: the model's input size)"""
     img = Image.open(image_path).convert('RGB')
-    img = img.resize(target_size)
+    img = img.resize(target_size[::-1])  # PIL takes (width, height)
     img_array = np.array(img) / 255.0
     img_array = np.expand_dims(img_array, axis=0)
     return img_array
@@ -103,29 +154,32 @@ def predict_tflite(interpreter, image_array, labels):
     
     return results
 
-def get_random_images(n=5):
-    """Get random images from dataset"""
-    if not DATA_DIR.exists():
-        print(f"✗ Data directory not found: {DATA_DIR}")
+def get_random_images(n=5, data_dir=DATA_DIR):
+    """Get random images from dataset
+    
+    If the dataset has a split file (see splits.py), images are drawn from its
+    held-out test subset so they were never seen during training.
+    """
+    split_path = split_path_for(data_dir)
+    if split_path.exists():
+        paths, labels, class_indices = split_files(load_split(split_path), 'test')
+        if paths:
+            print(f"  Sampling from the held-out test split ({len(paths)} images)")
+            class_names = {i: name for name, i in class_indices.items()}
+            picks = random.sample(range(len(paths)), min(n, len(paths)))
+            return [(data_dir / paths[i], class_names[labels[i]]) for i in picks]
+    
+    manifest = load_manifest(data_dir)
+    if manifest is None:
+        print(f"✗ Data directory not found: {data_dir}")
         return []
     
-    # Get all subdirectories (classes)
-    class_dirs = [d for d in DATA_DIR.iterdir() if d.is_dir()]
-    
-    if not class_dirs:
+    if not manifest.class_names:
         print("✗ No class directories found")
         return []
     
-    images = []
-    for _ in range(n):
-        class_dir = random.choice(class_dirs)
-        class_images = list(class_dir.glob('*.jpg')) + list(class_dir.glob('*.png'))
-        
-        if class_images:
-            img_path = random.choice(class_images)
-            images.append((img_path, class_dir.name))
-    
-    return images
+    # Sampled from the manifest, so nothing is re-listed per draw
+    return manifest.sample(n)
 
 def test_model(model_type='keras'):
     """Test model with random images"""
@@ -147,9 +201,11 @@ def test_model(model_type='keras'):
         if model is None:
             return
     
+    img_size = input_size_of(model, model_type)
+    
     # Get random test images
     print(f"\n🎲 Selecting random test images...")
-    test_images = get_random_images(5)
+    test_images = get_random_images(5, model_data_dir())
     
     if not test_images:
         print("✗ No test images found")
@@ -166,7 +222,7 @@ def test_model(model_type='keras'):
         print(f"True Label: {true_label}")
         
         # Preprocess image
-        img_array = preprocess_image(img_path)
+        img_array = preprocess_image(img_path, img_size)
         
         # Make prediction
         if model_type == 'keras':
@@ -205,8 +261,10 @@ def compare_models():
         print("✗ Both models must be available for comparison")
         return
     
+    img_size = input_size_of(keras_model, 'keras')
+    
     # Get test images
-    test_images = get_random_images(3)
+    test_images = get_random_images(3, model_data_dir())
     
     if not test_images:
         print("✗ No test images found")
@@ -219,7 +277,7 @@ def compare_models():
         print(f"{'='*60}")
         
         # Preprocess
-        img_array = preprocess_image(img_path)
+        img_array = preprocess_image(img_path, img_size)
         
         # Keras predictions
         keras_preds = predict_keras(keras_model, img_array, labels)
@@ -241,20 +299,185 @@ def compare_models():
             print(f"  Keras: {keras_preds[0][0]}")
             print(f"  TFLite: {tflite_preds[0][0]}")
 
+def split_dataset(data_dir, subset, img_size, batch_size, labels=None):
+    """Batches of (images, class indices) over a whole split subset, decoded in parallel
+    
+    Class indices follow labels.json when given, else the split's class order.
+    """
+    split = ensure_split(split_path_for(data_dir), data_dir)
+    paths, split_labels, class_indices = split_files(split, subset)
+    if not paths:
+        raise ValueError(f"The split has no {subset!r} images")
+    
+    class_names = sorted(class_indices, key=class_indices.get)
+    if labels:
+        model_indices = {name: int(i) for i, name in labels.items()}
+        unknown = [name for name in class_names if name not in model_indices]
+        if unknown:
+            raise ValueError(f"Model was not trained on: {', '.join(unknown)}")
+        split_labels = [model_indices[class_names[label]] for label in split_labels]
+        class_names = [labels[str(i)] for i in range(len(labels))]
+    
+    # One-hot labels are dropped again; only the decode and batching are wanted
+    dataset = make_dataset([str(Path(data_dir) / p) for p in paths], split_labels, len(class_names),
+                           img_size, batch_size)
+    dataset = dataset.map(lambda images, onehot: (images, tf.argmax(onehot, axis=1)))
+    return dataset, len(paths), class_names
+
+def tflite_predictor(interpreter):
+    """Batched inference function for an interpreter: the input is resized per batch size"""
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    input_dtype = np.dtype(input_details['dtype'])
+    input_scale, input_zero_point = input_details['quantization']
+    output_scale, output_zero_point = output_details['quantization']
+    batch_size = [None]
+    
+    def predict(images):
+        if len(images) != batch_size[0]:
+            interpreter.resize_tensor_input(input_details['index'], [len(images), *input_details['shape'][1:]])
+            interpreter.allocate_tensors()
+            batch_size[0] = len(images)
+        if input_dtype.kind in 'iu':
+            limits = np.iinfo(input_dtype)
+            images = np.clip(np.round(images / input_scale + input_zero_point), limits.min, limits.max)
+        interpreter.set_tensor(input_details['index'], images.astype(input_dtype))
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index'])
+        if np.dtype(output.dtype).kind in 'iu':
+            output = (output.astype(np.float32) - output_zero_point) * output_scale
+        return output
+    
+    return predict
+
+def classification_metrics(true_labels, probabilities, class_names, top_k=3):
+    """Accuracy, top-k accuracy, per-class precision/recall and confusion matrix"""
+    num_classes = len(class_names)
+    predictions = probabilities.argmax(axis=1)
+    confusion = np.bincount(true_labels * num_classes + predictions,
+                            minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+    
+    correct = np.diag(confusion)
+    predicted, actual = confusion.sum(axis=0), confusion.sum(axis=1)
+    precision = np.divide(correct, predicted, out=np.zeros(num_classes), where=predicted > 0)
+    recall = np.divide(correct, actual, out=np.zeros(num_classes), where=actual > 0)
+    
+    # Rank of the true class in every row at once, instead of sorting each row
+    true_scores = probabilities[np.arange(len(true_labels)), true_labels]
+    rank = (probabilities > true_scores[:, None]).sum(axis=1)
+    
+    return {
+        'accuracy': float(np.mean(predictions == true_labels)),
+        f'top_{top_k}_accuracy': float(np.mean(rank < top_k)),
+        'per_class': {
+            name: {'precision': round(float(precision[i]), 4), 'recall': round(float(recall[i]), 4),
+                   'support': int(actual[i])}
+            for i, name in enumerate(class_names)
+        },
+        'confusion_matrix': confusion.tolist(),
+    }
+
+def evaluate_split(model_type='keras', model_path=None, data_dir=None, subset='test',
+                   batch_size=256, top_k=3, num_threads=None):
+    """Run a whole split subset through the model in batches; returns the report"""
+    
+    print("="*60)
+    print(f"  Evaluating {model_type.upper()} Model on the {subset} split")
+    print("="*60)
+    
+    # Metadata and labels are read from the model's directory
+    model_dir = Path(model_path).parent if model_path else MODEL_DIR
+    data_dir = Path(data_dir) if data_dir else model_data_dir(model_dir)
+    labels = load_labels(model_dir)
+    if model_type == 'keras':
+        model = load_keras_model(model_path)
+        if model is None:
+            return None
+        predict = model.predict_on_batch
+    else:
+        model = load_tflite_model(model_path, num_threads or os.cpu_count())
+        if model is None:
+            return None
+        predict = tflite_predictor(model)
+    
+    img_size = input_size_of(model, model_type, model_dir)
+    dataset, num_images, class_names = split_dataset(data_dir, subset, img_size, batch_size, labels)
+    print(f"\n🔎 {num_images} images at {img_size[0]}x{img_size[1]}, batches of {batch_size}")
+    
+    all_labels, all_probabilities = [], []
+    inference_time = 0.0
+    start = time.perf_counter()
+    for images, batch_labels in dataset:
+        batch_start = time.perf_counter()
+        probabilities = np.asarray(predict(images.numpy()))
+        inference_time += time.perf_counter() - batch_start
+        all_probabilities.append(probabilities)
+        all_labels.append(batch_labels.numpy())
+    total_time = time.perf_counter() - start
+    
+    report = {
+        'model_type': model_type,
+        'model': str(model_path) if model_path else None,
+        'split': subset,
+        'img_size': list(img_size),
+        'batch_size': batch_size,
+        'num_images': num_images,
+        **classification_metrics(np.concatenate(all_labels), np.concatenate(all_probabilities),
+                                 class_names, top_k),
+        # End to end (decode included), and the model alone
+        'images_per_second': round(num_images / total_time, 1),
+        'inference_images_per_second': round(num_images / inference_time, 1),
+    }
+    print_evaluation(report, top_k)
+    return report
+
+def print_evaluation(report, top_k=3):
+    print(f"\n{'='*60}")
+    print(f"  Accuracy: {report['accuracy']:.4f}   Top-{top_k}: {report[f'top_{top_k}_accuracy']:.4f}")
+    print(f"  {report['images_per_second']:.0f} images/sec end to end, "
+          f"{report['inference_images_per_second']:.0f} in the model")
+    print(f"{'='*60}")
+    print(f"  {'Class':<10} {'Precision':>9} {'Recall':>7} {'Support':>8}")
+    for name, stats in report['per_class'].items():
+        print(f"  {name:<10} {stats['precision']:>9.4f} {stats['recall']:>7.4f} {stats['support']:>8}")
+    
+    names = list(report['per_class'])
+    print(f"\nConfusion matrix (rows: true, columns: predicted):")
+    print("  " + " " * 6 + "".join(f"{name[:5]:>6}" for name in names))
+    for name, row in zip(names, report['confusion_matrix']):
+        print(f"  {name[:5]:<6}" + "".join(f"{count:>6}" for count in row))
+
 def main():
-    import sys
-    
-    if len(sys.argv) > 1:
-        model_type = sys.argv[1].lower()
-        if model_type == 'compare':
-            compare_models()
-        elif model_type in ['keras', 'tflite']:
-            test_model(model_type)
-        else:
-            print("Usage: python test_model.py [keras|tflite|compare]")
+    parser = argparse.ArgumentParser(description="Test the trained ISL model")
+    parser.add_argument('mode', nargs='?', default='keras', choices=['keras', 'tflite', 'compare', 'evaluate'])
+    parser.add_argument('--model-type', choices=['keras', 'tflite'], default='keras',
+                        help="Model evaluated by the evaluate mode")
+    parser.add_argument('--model', help="Model file (default: model/isl_model.h5 or .tflite)")
+    parser.add_argument('--data-dir', help="Dataset to evaluate on (default: the model's, else data/ISL)")
+    parser.add_argument('--split', choices=['train', 'validation', 'test'], default='test')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--threads', type=int, help="TFLite interpreter threads (default: all CPUs)")
+    parser.add_argument('--report', help="Write the evaluation report to this JSON file")
+    args = parser.parse_args()
+    
+    if args.mode == 'compare':
+        compare_models()
+    elif args.mode in ['keras', 'tflite']:
+        test_model(args.mode)
     else:
-        # Default: test Keras model
-        test_model('keras')
+        try:
+            report = evaluate_split(args.model_type, args.model, args.data_dir, args.split,
+                                    args.batch_size, args.top_k, args.threads)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        if report is None:
+            sys.exit(1)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n✓ Report saved: {args.report}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+"""
+Training throughput: images/sec, step time and where it goes
+
+ThroughputMonitor is a Keras callback that measures, for every epoch:
+
+    - images/sec and the mean wall time of a train step
+    - compute: the same train step timed on a batch already in memory (on a
+      copy of the model, before the first epoch at each input shape)
+    - input wait: the rest of the step, spent waiting for the input pipeline
+      (and in the other callbacks)
+    - epoch and validation time
+
+It prints one line per epoch, with the ETA of the remaining epochs at the
+measured rate, and writes the numbers as TensorBoard scalars (in a
+'throughput' directory of the run). The engine saves the per-epoch records
+as throughput.json next to training_history.json. A large input wait means
+the data pipeline, not the model, limits training on this host (see the
+'data_pipeline' setting); a small one means only a faster model or CPU
+profile (cpu_profile.py) helps.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+PROBE_WARMUP_STEPS = 2
+PROBE_STEPS = 5
+
+
+def synthetic_batch(element_spec, batch_size, img_size, seed=0):
+    """Random tensors shaped and typed like a dataset's (images, labels) batches
+
+    The pipelines leave the image height and width unknown in element_spec;
+    they are img_size.
+    """
+    rng = np.random.default_rng(seed)
+    images, labels = element_spec
+    batch = []
+    for spec, shape in ((images, (*img_size, images.shape[-1])), (labels, labels.shape[1:])):
+        values = rng.random((batch_size, *shape))
+        if spec.dtype.is_integer:
+            values *= 255
+        batch.append(tf.cast(values, spec.dtype))
+    return tuple(batch)
+
+
+def compute_step_time(model, element_spec, batch_size, img_size, steps=PROBE_STEPS,
+                      warmup=PROBE_WARMUP_STEPS):
+    """Mean train step time (seconds) of a copy of the model on a batch held in memory"""
+    clone = keras.models.clone_model(model)
+    clone.compile(optimizer=keras.optimizers.deserialize(keras.optimizers.serialize(model.optimizer)),
+                  loss=model.loss, jit_compile=model.jit_compile)
+    x, y = synthetic_batch(element_spec, batch_size, img_size)
+    for _ in range(warmup):
+        clone.train_on_batch(x, y)
+    start = time.perf_counter()
+    for _ in range(steps):
+        clone.train_on_batch(x, y)
+    return (time.perf_counter() - start) / steps
+
+
+class ThroughputMonitor(keras.callbacks.Callback):
+    """Per-epoch images/sec, step time split into input wait and compute, epoch and validation time
+
+    Call set_input() before each fit() with the batch size, image size and
+    the batches' element_spec (None for a generator, or to skip the compute
+    probe). The first `skip` steps of every fit() are left out, since they
+    include tracing and compilation. `records` continues the list of a
+    resumed run.
+    """
+
+    def __init__(self, epochs, log_dir=None, records=None, skip=2):
+        super().__init__()
+        self.epochs = epochs
+        self.log_dir = Path(log_dir) if log_dir else None
+        self.records = records if records is not None else []
+        self.skip = skip
+        self.batch_size = None
+        self.img_size = None
+        self.element_spec = None
+        self.compute_ms = {}
+        self.total = 0.0
+        self.count = 0
+        self._writer = None
+
+    def set_input(self, batch_size, img_size, element_spec=None):
+        self.batch_size = batch_size
+        self.img_size = tuple(img_size)
+        self.element_spec = element_spec
+
+    @property
+    def _input_key(self):
+        return (self.batch_size, self.img_size, str(self.element_spec))
+
+    @property
+    def step_time_ms(self):
+        """Mean step wall time over the whole run"""
+        return round(1000 * self.total / self.count, 2) if self.count else None
+
+    def on_train_begin(self, logs=None):
+        self._seen = 0
+        if self.element_spec is None:
+            return
+        if self._input_key not in self.compute_ms:
+            step_time = compute_step_time(self.model, self.element_spec, self.batch_size, self.img_size)
+            self.compute_ms[self._input_key] = round(1000 * step_time, 2)
+            print(f"⏱️  Compute: {1000 * step_time:.1f} ms/step on a batch in memory")
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._last_end = None
+        self._steps = 0
+        self._step_total = 0.0
+        self._validation_time = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self._last_end is None:
+            self._last_end = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        # From the end of the previous step: includes the wait for the next batch
+        now = time.perf_counter()
+        step_time = now - self._last_end
+        self._last_end = now
+        self._seen += 1
+        if self._seen > self.skip:
+            self._steps += 1
+            self._step_total += step_time
+            self.count += 1
+            self.total += step_time
+
+    def on_test_begin(self, logs=None):
+        self._validation_start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self._validation_time += time.perf_counter() - self._validation_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_time = time.perf_counter() - self._epoch_start
+        step_ms = 1000 * self._step_total / self._steps if self._steps else None
+        compute_ms = self.compute_ms.get(self._input_key)
+        record = {
+            'epoch': epoch + 1,
+            'batch_size': self.batch_size,
+            'img_size': list(self.img_size),
+            'images_per_second': round(1000 * self.batch_size / step_ms, 1) if step_ms else None,
+            'step_time_ms': round(step_ms, 2) if step_ms else None,
+            'compute_ms': compute_ms,
+            'input_wait_ms': round(max(0.0, step_ms - compute_ms), 2) if step_ms and compute_ms else None,
+            'epoch_time_seconds': round(epoch_time, 2),
+            'validation_time_seconds': round(self._validation_time, 2),
+        }
+        self.records.append(record)
+
+        remaining = self.epochs - (epoch + 1)
+        line = f"\n⏱️  Epoch {epoch + 1}: {epoch_time:.1f}s (validation {self._validation_time:.1f}s)"
+        if step_ms:
+            line += f", {record['images_per_second']:.0f} img/s, {step_ms:.0f} ms/step"
+            if record['input_wait_ms'] is not None:
+                line += f" (input wait {record['input_wait_ms']:.0f} ms, compute {compute_ms:.0f} ms)"
+        if remaining > 0:
+            line += f", ETA ~{remaining * epoch_time / 60:.1f} min for {remaining} more epoch(s)"
+        print(line)
+        self._write_scalars(record)
+
+    def _write_scalars(self, record):
+        if self.log_dir is None:
+            return
+        if self._writer is None:
+            self._writer = tf.summary.create_file_writer(str(self.log_dir))
+        with self._writer.as_default():
+            for name, value in record.items():
+                if name != 'epoch' and isinstance(value, (int, float)):
+                    tf.summary.scalar(f"throughput/{name}", value, step=record['epoch'])
+        self._writer.flush()